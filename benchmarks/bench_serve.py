@@ -0,0 +1,140 @@
+"""
+Latency benchmark for the rankings server (src/serve.py).
+
+Writes a synthetic output dataset, starts the server in its own process and
+hits it from many concurrent keep-alive clients with a mix of latest, dated,
+filtered and If-None-Match requests, then reports p50/p99 latency and
+throughput.
+
+Usage:
+    python benchmarks/bench_serve.py [--dates 30] [--scale 1] [--clients 32] [--requests 200]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import http.client
+import multiprocessing
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+
+def build_dataset(root, dates, scale):
+    """Run build_final_data over synthetic files for `dates` trading days and write their fragments"""
+    import combine_code
+    from benchmarks.synthetic import make_bhavcopy_zip, make_secban_csv, make_volatility_csv
+    from src.dataset_writer import write_fragments
+
+    day, written = datetime(2025, 1, 1), []
+    while len(written) < dates:
+        day += timedelta(days=1)
+        if day.weekday() >= 5:
+            continue
+        bhavcopy = combine_code.transform_data(combine_code.parse_file('bhavcopy', make_bhavcopy_zip(day, scale)),
+                                               'Bhavcopy')
+        volatility = combine_code.transform_data(combine_code.parse_file('volatility', make_volatility_csv(day, scale)),
+                                                 'Volatility')
+        secban = combine_code.transform_data(combine_code.parse_file('secban', make_secban_csv(day, scale)), 'Secban')
+        final_data = combine_code.build_final_data(bhavcopy, volatility, secban, day)
+        write_fragments(final_data, root)
+        written.append((day.strftime('%Y-%m-%d'), final_data['Symbol'].astype(str).tolist()))
+    return written
+
+
+def serve_process(root, port, ready):
+    from src.serve import start_server
+
+    config.DATASET_PATH = root
+    start_server(port=port)
+    ready.set()
+    while True:
+        time.sleep(3600)
+
+
+def client(args):
+    """One keep-alive client: returns (latencies in seconds, 304 count, error count)"""
+    port, requests, written, seed = args
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies, not_modified, errors = [], 0, 0
+    etags = {}
+    for _ in range(requests):
+        request_date, symbols = rng.choice(written)
+        path = rng.choice([
+            '/rankings/latest',
+            f'/rankings/{request_date}',
+            f'/rankings/latest?symbol={rng.choice(symbols)}',
+            '/rankings/latest?label=High,Very%20High',
+            f'/rankings/{request_date}?format=arrow'
+        ])
+        headers = {'If-None-Match': etags[path]} if path in etags and rng.random() < 0.5 else {}
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status == 304:
+            not_modified += 1
+        elif response.status == 200:
+            etags[path] = response.getheader('ETag')
+        else:
+            errors += 1
+    connection.close()
+    return latencies, not_modified, errors
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the rankings server under concurrent clients')
+    parser.add_argument('--dates', type=int, default=30, help='Trading days in the synthetic dataset')
+    parser.add_argument('--scale', type=float, default=1, help='Multiple of one day of F&O volume')
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per client')
+    parser.add_argument('--port', type=int, default=18765)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fo_serve_bench_')
+    config.ROLLING_STATE_PATH = os.path.join(workdir, 'state', 'rolling_state.npz')
+    config.METRICS_PATH = os.path.join(workdir, 'metrics')
+    root = os.path.join(workdir, 'dataset')
+    try:
+        written = build_dataset(root, args.dates, args.scale)
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=serve_process, args=(root, args.port, ready), daemon=True)
+        server.start()
+        ready.wait(60)
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.map(client, [(args.port, args.requests, written, seed) for seed in range(args.clients)])
+        wall = time.perf_counter() - start
+        server.terminate()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = [latency for result in results for latency in result[0]]
+    not_modified = sum(result[1] for result in results)
+    errors = sum(result[2] for result in results)
+    print(f"{len(latencies)} requests from {args.clients} clients over {args.dates} dates "
+          f"({not_modified} x 304, {errors} errors) in {wall:.2f}s: {len(latencies) / wall:.0f} req/s")
+    for q in (50, 90, 99):
+        print(f"  p{q:<3} {percentile(latencies, q) * 1000:8.2f} ms")
+    print(f"  max  {max(latencies) * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
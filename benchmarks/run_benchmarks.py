@@ -0,0 +1,326 @@
+"""
+Offline benchmark harness for the F&O pipeline stages.
+
+Generates synthetic NSE files at 1x, 10x and 100x daily volume, times
+parse, transform_data, calculate_percentiles, join_and_save_data and
+insert_fo_data for each compute engine (config.COMPUTE_ENGINE), checks that
+the engines produce the same final data, and stores the results under
+benchmarks/results/ so runs can be compared between commits.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 1 10 100] [--repeat 3] [--engines pandas arrow]
+    python benchmarks/run_benchmarks.py --compare results/OLD.json results/NEW.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+class NullCursor:
+    """
+    Accepts statements and discards them, so insert_fo_data runs offline.
+    stored is what the delta upsert's SELECT of existing row hashes returns;
+    rows inserted into fo_market_analysis are appended to written when it is a list.
+    """
+    rowcount = 0
+
+    def __init__(self, stored=(), written=None):
+        self.stored = stored
+        self.written = written
+
+    def execute(self, query, params=None):
+        pass
+
+    def executemany(self, query, seq_params):
+        self.rowcount = len(seq_params)
+        if self.written is not None and query.lstrip().startswith('INSERT INTO fo_market_analysis'):
+            self.written.extend(seq_params)
+
+    def fetchall(self):
+        return list(self.stored)
+
+    def close(self):
+        pass
+
+
+class NullPool:
+    def __init__(self, stored=(), written=None):
+        self.stored = stored
+        self.written = written
+
+    @contextmanager
+    def transaction(self):
+        yield NullCursor(self.stored, self.written)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(RESULTS_DIR), text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def best_of(repeat, func):
+    """Run func repeat times; return (min seconds, last result)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_rss_bytes(engine, zip_path):
+    """
+    Peak RSS added by parsing and transforming one bhavcopy zip with the given
+    engine, measured in a fresh interpreter so earlier runs don't mask it.
+    """
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--peak-rss', engine, zip_path],
+                                     text=True)
+    return int(output.strip().splitlines()[-1])
+
+
+def current_rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def measure_peak_rss(engine, zip_path):
+    """Sample RSS every millisecond while the bhavcopy is parsed and transformed (Linux only)"""
+    import threading
+    import combine_code
+    import src.arrow_engine, src.bhavcopy_reader  # noqa: F401
+
+    from benchmarks.synthetic import make_bhavcopy_zip
+
+    config.COMPUTE_ENGINE = engine
+    # Page in the engine's code once (a resident daemon or backfill pays this only at start)
+    combine_code.transform_data(combine_code.parse_file('bhavcopy', make_bhavcopy_zip(scale=0.01)), 'Bhavcopy')
+    with open(zip_path, 'rb') as f:
+        content = f.read()
+    baseline = peak = current_rss()
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.wait(0.001):
+            peak = max(peak, current_rss())
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        bhavcopy = combine_code.parse_file('bhavcopy', content)
+        combine_code.transform_data(bhavcopy, 'Bhavcopy')
+    finally:
+        done.set()
+        sampler.join()
+    print(max(peak, current_rss()) - baseline)
+
+
+def check_parity(expected, actual):
+    """True when two engines' final data match (Processed_Timestamp is the wall clock and is ignored)"""
+    import pandas as pd
+
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    try:
+        pd.testing.assert_frame_equal(expected.drop(columns='Processed_Timestamp').reset_index(drop=True),
+                                      actual.drop(columns='Processed_Timestamp').reset_index(drop=True))
+        return True
+    except AssertionError as e:
+        print(f"Parity check failed: {e}")
+        return False
+
+
+def fresh(data):
+    """A copy for transform_data to mutate; Arrow tables are immutable and need none"""
+    return data.copy() if hasattr(data, 'copy') else data
+
+
+def bench_scale(scale, repeat, workdir, engine='pandas'):
+    import combine_code
+    from src import db_utils
+    from benchmarks.synthetic import BASE_ROWS, make_bhavcopy_zip, make_secban_csv, make_volatility_csv
+
+    trade_date = datetime(2025, 3, 5)
+    bhavcopy_zip = make_bhavcopy_zip(trade_date, scale)
+    volatility_csv = make_volatility_csv(trade_date, scale)
+    secban_csv = make_secban_csv(datetime(2025, 3, 6), scale)
+    zip_path = os.path.join(workdir, 'bhavcopy.zip')
+    with open(zip_path, 'wb') as f:
+        f.write(bhavcopy_zip)
+
+    config.COMPUTE_ENGINE = engine
+    timings = {}
+    timings['parse_bhavcopy'], bhavcopy = best_of(repeat, lambda: combine_code.parse_file('bhavcopy', bhavcopy_zip))
+    _, volatility = best_of(1, lambda: combine_code.parse_file('volatility', volatility_csv))
+    _, secban = best_of(1, lambda: combine_code.parse_file('secban', secban_csv))
+
+    timings['transform_bhavcopy'], bhavcopy_filtered = best_of(
+        repeat, lambda: combine_code.transform_data(fresh(bhavcopy), 'Bhavcopy'))
+    timings['transform_volatility'], volatility_filtered = best_of(
+        repeat, lambda: combine_code.transform_data(volatility.copy(), 'Volatility'))
+    timings['transform_secban'], secban_filtered = best_of(
+        repeat, lambda: combine_code.transform_data(secban.copy(), 'Secban'))
+
+    if engine == 'arrow':
+        from src import arrow_engine
+        merged = bhavcopy_filtered.join(volatility_filtered, 'Symbol', join_type='inner')
+        timings['calculate_percentiles'], _ = best_of(repeat, lambda: arrow_engine.calculate_percentiles(merged))
+    else:
+        merged = bhavcopy_filtered.merge(volatility_filtered, on='Symbol')
+        timings['calculate_percentiles'], _ = best_of(repeat, lambda: combine_code.calculate_percentiles(merged))
+
+    peak_rss = peak_rss_bytes(engine, zip_path)
+
+    def join_and_save():
+        # Fresh output directories each time so every run pays the same write cost
+        for name in ('dataset', 'csv', 'parquet', 'state', 'metrics'):
+            shutil.rmtree(os.path.join(workdir, name), ignore_errors=True)
+        return combine_code.join_and_save_data(bhavcopy_filtered, volatility_filtered,
+                                               secban_filtered, trade_date)
+    timings['join_and_save_data'], final_data = best_of(repeat, join_and_save)
+
+    original_get_pool = db_utils.get_pool
+    written = []
+    db_utils.get_pool = lambda *args, **kwargs: NullPool(written=written)
+    try:
+        timings['insert_fo_data'], _ = best_of(
+            repeat, lambda: db_utils.insert_fo_data(final_data, {'database': 'benchmark'}))
+
+        # Reloading the same date: every (symbol, request_date, row_hash) is already stored
+        stored = [(row[0], row[1], row[-1]) for row in written[-len(final_data):]]
+        db_utils.get_pool = lambda *args, **kwargs: NullPool(stored=stored)
+        timings['insert_fo_data_unchanged'], _ = best_of(
+            repeat, lambda: db_utils.insert_fo_data(final_data, {'database': 'benchmark'}))
+    finally:
+        db_utils.get_pool = original_get_pool
+
+    result = {
+        'scale': scale,
+        'engine': engine,
+        'bhavcopy_rows': int(scale * BASE_ROWS),
+        'bhavcopy_zip_bytes': len(bhavcopy_zip),
+        'filtered_rows': len(bhavcopy_filtered),
+        'final_rows': len(final_data) if final_data is not None else 0,
+        'parse_transform_peak_rss_bytes': peak_rss,
+        'seconds': {name: round(seconds, 6) for name, seconds in timings.items()}
+    }
+    return result, final_data
+
+
+def run(scales, repeat, engines=('pandas',)):
+    workdir = tempfile.mkdtemp(prefix='fo_bench_')
+    # Keep every artefact inside the scratch directory
+    config.DATASET_PATH = os.path.join(workdir, 'dataset')
+    config.OUTPUT_PATH = os.path.join(workdir, 'csv')
+    config.Parquet_OUTPUT_PATH = os.path.join(workdir, 'parquet')
+    config.ROLLING_STATE_PATH = os.path.join(workdir, 'state', 'rolling_state.npz')
+    config.METRICS_PATH = os.path.join(workdir, 'metrics')
+    config.DB_INSERT_METHOD = 'executemany'
+    config.DB_ENABLED = False  # join_and_save_data skips the DB; insert_fo_data is timed separately
+    results = []
+    try:
+        for scale in scales:
+            finals = {}
+            for engine in engines:
+                result, finals[engine] = bench_scale(scale, repeat, workdir, engine)
+                if engine != engines[0]:
+                    # Every engine must reproduce the first engine's output
+                    result['parity'] = check_parity(finals[engines[0]], finals[engine])
+                results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def print_report(report):
+    print(f"revision {report['revision']}  ({report['timestamp']})")
+    for result in report['results']:
+        parity = {True: ', matches', False: ', MISMATCH'}.get(result.get('parity'), '')
+        print(f"\n{result['scale']}x {result.get('engine', 'pandas')}: {result['bhavcopy_rows']} bhavcopy rows, "
+              f"{result['final_rows']} final rows{parity}")
+        if 'parse_transform_peak_rss_bytes' in result:
+            print(f"  {'parse+transform peak':<24} {result['parse_transform_peak_rss_bytes'] / 2 ** 20:10.2f} MiB")
+        for name, seconds in result['seconds'].items():
+            print(f"  {name:<24} {seconds * 1000:10.2f} ms")
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_by_key = {(r['scale'], r.get('engine', 'pandas')): r for r in old['results']}
+    print(f"{old['revision']} -> {new['revision']}")
+    for result in new['results']:
+        engine = result.get('engine', 'pandas')
+        base = old_by_key.get((result['scale'], engine))
+        if base is None:
+            continue
+        print(f"\n{result['scale']}x {engine}")
+        for name, seconds in result['seconds'].items():
+            before = base['seconds'].get(name)
+            if before:
+                print(f"  {name:<24} {before * 1000:10.2f} -> {seconds * 1000:10.2f} ms "
+                      f"({(seconds - before) / before * 100:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pipeline stages on synthetic NSE files')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100],
+                        help='Multiples of one day of F&O volume')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage (best is kept)')
+    parser.add_argument('--engines', nargs='+', choices=['pandas', 'arrow'], default=['pandas', 'arrow'],
+                        help='Compute engines to run; the first is the reference for the parity check')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='Compare two stored result files instead of running')
+    parser.add_argument('--peak-rss', nargs=2, metavar=('ENGINE', 'ZIP'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.peak_rss:
+        measure_peak_rss(*args.peak_rss)
+        return
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args.scales, args.repeat, args.engines)
+    print_report(report)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{report['revision']}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {path}")
+
+    mismatches = [f"{r['scale']}x {r['engine']}" for r in report['results'] if r.get('parity') is False]
+    if mismatches:
+        sys.exit(f"Engine output differs from {args.engines[0]}: {', '.join(mismatches)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Synthetic NSE files for offline benchmarks: UDiFF F&O bhavcopy zips,
+FOVOLT volatility CSVs and F&O security-ban CSVs.
+"""
+import io
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.expiry_calendar import get_monthly_expiry
+
+BHAVCOPY_COLUMNS = [
+    'TradDt', 'BizDt', 'Sgmt', 'Src', 'FinInstrmTp', 'FinInstrmId', 'ISIN', 'TckrSymb', 'SctySrs',
+    'XpryDt', 'FininstrmActlXpryDt', 'StrkPric', 'OptnTp', 'FinInstrmNm', 'OpnPric', 'HghPric',
+    'LwPric', 'ClsPric', 'LastPric', 'PrvsClsgPric', 'UndrlygPric', 'SttlmPric', 'OpnIntrst',
+    'ChngInOpnIntrst', 'TtlTradgVol', 'TtlTrfVal', 'TtlNbOfTxsExctd', 'SsnId', 'NewBrdLotQty',
+    'Rmks', 'Rsvd1', 'Rsvd2', 'Rsvd3', 'Rsvd4'
+]
+
+# Share of rows per instrument type in a typical F&O bhavcopy
+DEFAULT_INSTRUMENT_MIX = {'STO': 0.86, 'IDO': 0.11, 'STF': 0.025, 'IDF': 0.005}
+
+# Rows and underlyings in one real trading day at scale 1x
+BASE_ROWS = 40000
+BASE_SYMBOLS = 200
+
+VOLATILITY_COLUMN = 'Applicable Daily Volatility (M) = Max (E or K)'
+
+
+def symbols_for(scale=1):
+    return [f"SYM{i:05d}" for i in range(int(BASE_SYMBOLS * scale))]
+
+
+def expiries_for(trade_date, months=3):
+    """The next `months` monthly expiries on or after trade_date"""
+    expiries = []
+    year, month = trade_date.year, trade_date.month
+    while len(expiries) < months:
+        expiry = get_monthly_expiry(year, month)
+        if expiry.date() >= trade_date.date():
+            expiries.append(expiry)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return expiries
+
+
+def make_bhavcopy_frame(trade_date=None, scale=1, instrument_mix=None, expiry_months=3, seed=0):
+    """A DataFrame with the UDiFF bhavcopy layout and BASE_ROWS * scale rows"""
+    trade_date = trade_date or datetime(2025, 3, 5)
+    instrument_mix = instrument_mix or DEFAULT_INSTRUMENT_MIX
+    rng = np.random.default_rng(seed)
+    rows = int(BASE_ROWS * scale)
+    symbols = np.array(symbols_for(scale))
+
+    instrument_types = np.array(list(instrument_mix))
+    weights = np.array(list(instrument_mix.values()), dtype=float)
+    instrument = instrument_types[rng.choice(len(instrument_types), rows, p=weights / weights.sum())]
+    expiries = np.array([e.strftime('%Y-%m-%d') for e in expiries_for(trade_date, expiry_months)])
+    expiry = expiries[rng.integers(0, len(expiries), rows)]
+    is_option = np.char.endswith(instrument.astype(str), 'O')
+    close = np.round(rng.uniform(50, 5000, rows), 2)
+    trade_str = trade_date.strftime('%Y-%m-%d')
+
+    return pd.DataFrame({
+        'TradDt': trade_str,
+        'BizDt': trade_str,
+        'Sgmt': 'FO',
+        'Src': 'NSE',
+        'FinInstrmTp': instrument,
+        'FinInstrmId': rng.integers(10000, 99999, rows),
+        'ISIN': '',
+        'TckrSymb': symbols[rng.integers(0, len(symbols), rows)],
+        'SctySrs': '',
+        'XpryDt': expiry,
+        'FininstrmActlXpryDt': expiry,
+        'StrkPric': np.where(is_option, np.round(close / 50) * 50, 0),
+        'OptnTp': np.where(is_option, rng.choice(['CE', 'PE'], rows), ''),
+        'FinInstrmNm': '',
+        'OpnPric': close,
+        'HghPric': close,
+        'LwPric': close,
+        'ClsPric': close,
+        'LastPric': close,
+        'PrvsClsgPric': close,
+        'UndrlygPric': close,
+        'SttlmPric': close,
+        'OpnIntrst': rng.integers(0, 5_000_000, rows),
+        'ChngInOpnIntrst': rng.integers(-100_000, 100_000, rows),
+        'TtlTradgVol': rng.integers(0, 50_000, rows),
+        'TtlTrfVal': np.round(rng.uniform(0, 1e8, rows), 2),
+        'TtlNbOfTxsExctd': rng.integers(0, 5000, rows),
+        'SsnId': 'F1',
+        'NewBrdLotQty': 50,
+        'Rmks': '',
+        'Rsvd1': '',
+        'Rsvd2': '',
+        'Rsvd3': '',
+        'Rsvd4': ''
+    }, columns=BHAVCOPY_COLUMNS)
+
+
+def make_bhavcopy_zip(trade_date=None, scale=1, instrument_mix=None, expiry_months=3, seed=0):
+    """Zipped bhavcopy bytes, as served by nsearchives"""
+    trade_date = trade_date or datetime(2025, 3, 5)
+    frame = make_bhavcopy_frame(trade_date, scale, instrument_mix, expiry_months, seed)
+    buffer = io.BytesIO()
+    member = f"BhavCopy_NSE_FO_0_0_0_{trade_date:%Y%m%d}_F_0000.csv"
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(member, frame.to_csv(index=False))
+    return buffer.getvalue()
+
+
+def make_volatility_csv(trade_date=None, scale=1, seed=0):
+    """FOVOLT CSV bytes with one row per underlying"""
+    trade_date = trade_date or datetime(2025, 3, 5)
+    rng = np.random.default_rng(seed + 1)
+    symbols = symbols_for(scale)
+    daily = np.round(rng.gamma(2.0, 0.01, len(symbols)), 4)
+    frame = pd.DataFrame({
+        'Date': trade_date.strftime('%d-%b-%Y'),
+        'Symbol': symbols,
+        'Underlying Close Price (A)': np.round(rng.uniform(50, 5000, len(symbols)), 2),
+        'Current Day Underlying Daily Volatility (E) = Sqrt(0.995*D*D + 0.005*C*C)': daily,
+        'Underlying Annualised Volatility (F) = E*Sqrt(365)': np.round(daily * np.sqrt(365), 4),
+        VOLATILITY_COLUMN: daily,
+        'Applicable Annualised Volatility (N) = Max (F or L)': np.round(daily * np.sqrt(365), 4)
+    })
+    return frame.to_csv(index=False).encode()
+
+
+def make_secban_csv(trade_date=None, scale=1, banned=5, seed=0):
+    """F&O ban list CSV bytes: a title line followed by numbered symbols"""
+    trade_date = trade_date or datetime(2025, 3, 6)
+    rng = np.random.default_rng(seed + 2)
+    symbols = symbols_for(scale)
+    picks = rng.choice(len(symbols), min(int(banned * scale), len(symbols)), replace=False)
+    lines = [f"Securities in Ban For Trade Date {trade_date:%d-%b-%Y}:".upper()]
+    lines += [f"{i + 1},{symbols[p]}" for i, p in enumerate(picks)]
+    return ("\n".join(lines) + "\n").encode()
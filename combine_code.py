@@ -1,65 +1,36 @@
 import os
 import io
-import zipfile
-import requests
 import logging
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import calendar
-import pyarrow
+from datetime import datetime
 import config
-from src.db_utils import insert_fo_data
+from src.instrumentation import finish_run, stage, start_run
 
-# Configure logging
-logging.basicConfig(
-    filename=config.LOG_FILE_PATH,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Heavy dependencies (pandas, numpy, pyarrow, aiohttp, mysql.connector) are
+# imported inside the functions that use them so `--help`, cron wrappers and
+# freshly spawned pool workers only pay for what they run.
 
-def get_last_thursday(year, month):
-    # Get last day of the month
-    if month == 12:
-        next_month = datetime(year + 1, 1, 1)
-    else:
-        next_month = datetime(year, month + 1, 1)
-
-    last_day = next_month - timedelta(days=1)
+def configure_logging():
+    """Send log records to config.LOG_FILE_PATH (no-op if logging is already configured)"""
+    logging.basicConfig(
+        filename=config.LOG_FILE_PATH,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 
-    # Go backwards to find the last Thursday
-    while last_day.weekday() != 3:  # 3 = Thursday
-        last_day -= timedelta(days=1)
-    
-    return last_day
+def get_last_thursday(year, month):
+    """Get the last Thursday of the month (see src.expiry_calendar)"""
+    from src.expiry_calendar import get_last_thursday as last_thursday
+    return last_thursday(year, month)
 
 def get_next_expiry_thursday(today=None):
-    if today is None:
-        today = datetime.today()
-        
-    current_year = today.year
-    current_month = today.month
-    current_day = today.day
-
-    # Find last Thursday of current month
-    last_thursday_this_month = get_last_thursday(current_year, current_month)
-
-    if today.date() > last_thursday_this_month.date():
-        # Move to next month
-        if current_month == 12:
-            next_year = current_year + 1
-            next_month = 1
-        else:
-            next_year = current_year
-            next_month = current_month + 1
-
-        return get_last_thursday(next_year, next_month)
-    else:
-        return last_thursday_this_month
+    """Get the next monthly expiry (see src.expiry_calendar)"""
+    from src.expiry_calendar import get_next_expiry
+    return get_next_expiry(today)
 
 
 def read_csv_file(filename):
+    import pandas as pd
     try:
         df = pd.read_csv(filename)
         logging.info(f"Successfully read file: {filename}")
@@ -69,15 +40,17 @@ def read_csv_file(filename):
         return None
 
 def calculate_percentiles(final_data):
+    import numpy as np
     final_data = final_data.copy()
 
     # Calculate percentiles
-    final_data['Percentile_Volume'] = np.ceil(final_data['Trade_volume'].rank(pct=True) * 100).astype(int)
-    final_data['Percentile_Volatility'] = np.ceil(final_data['Daily_Volatility'].rank(pct=True) * 100).astype(int)
+    final_data['Percentile_Volume'] = np.ceil(final_data['Trade_volume'].rank(pct=True) * 100).astype('int8')
+    final_data['Percentile_Volatility'] = np.ceil(final_data['Daily_Volatility'].rank(pct=True) * 100).astype('int8')
 
+    # Sum in int16: two int8 percentiles can exceed 127
     final_data['Average_Percentile'] = np.ceil(
-        (final_data['Percentile_Volume'] + final_data['Percentile_Volatility']) / 2
-    ).astype(int)
+        (final_data['Percentile_Volume'].astype('int16') + final_data['Percentile_Volatility']) / 2
+    ).astype('int8')
 
     # Define labels
     conditions = [
@@ -95,81 +68,78 @@ def calculate_percentiles(final_data):
     logging.info("Percentiles calculated successfully with rounded values.")
     return final_data
 
-def download_files(target_date=None):
-    """Download files from NSE for a specific date or today"""
-    from src.date_utils import get_valid_dates
-    import io
+def parse_file(file_type, content):
+    """Parse the raw bytes of a downloaded NSE file into a DataFrame"""
+    import pandas as pd
+    if file_type == 'bhavcopy':
+        # For bhavcopy, stream the zipped CSV keeping only the rows and columns we use
+        if config.COMPUTE_ENGINE == 'arrow':
+            from src.arrow_engine import read_bhavcopy
+        else:
+            from src.bhavcopy_reader import read_bhavcopy
+        return read_bhavcopy(content)
+    # For volatility and secban, direct CSV download
+    return pd.read_csv(io.BytesIO(content))
+
+def download_files(target_date=None, raw_files=None):
+    """
+    Download files from NSE for a specific date or today.
+    raw_files ({file_type: bytes}) can be passed in when the bytes were already
+    fetched, e.g. by a multi-date backfill.
+    """
+    from src.async_downloader import fetch_raw_files
     
     if target_date is None:
         target_date = datetime.now()
     
-    # Get valid dates for each file type considering holidays and weekends
-    valid_dates = get_valid_dates(target_date)
     downloaded_files = {}
+
+    if raw_files is None:
+        raw_files = fetch_raw_files([target_date])[target_date.strftime('%Y-%m-%d')]
     
-    # Create a session to maintain cookies
-    session = requests.Session()
-    
-    for file_type, url_template in config.NSE_URLS.items():
-        # Get the appropriate date for this file type
-        file_date = valid_dates[file_type]
-        
-        # Format date according to the specific format required for this file type
-        date_str = file_date.strftime(config.DATE_FORMATS[file_type])
-        url = url_template.format(date=date_str)
-        
-        logging.info(f"Downloading {file_type} file for date {file_date.strftime('%Y-%m-%d')} from: {url}")
+    for file_type in config.NSE_URLS:
+        content = raw_files.get(file_type)
+        if content is None:
+            downloaded_files[file_type] = None
+            continue
+
         try:
-            response = session.get(url, headers=config.URL_HEADERS)
-            response.raise_for_status()
-            
-            if file_type == 'bhavcopy':
-                # For bhavcopy, we need to handle zip file
-                with zipfile.ZipFile(io.BytesIO(response.content)) as zip_file:
-                    # Get the first file in the zip (should be the CSV)
-                    csv_filename = zip_file.namelist()[0]
-                    with zip_file.open(csv_filename) as csv_file:
-                        df = pd.read_csv(csv_file)
-            else:
-                # For volatility and secban, direct CSV download
-                df = pd.read_csv(io.StringIO(response.text))
-            
-            # Save to file
-            output_path = os.path.join(config.INPUT_PATH, f"{file_type}_{date_str}.csv")
-            df.to_csv(output_path, index=False)
-            
+            df = parse_file(file_type, content)
             downloaded_files[file_type] = df
             logging.info(f"Successfully downloaded and read {file_type} file")
             
         except Exception as e:
-            logging.error(f"Error downloading {file_type} file: {e}")
-            if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 404:
-                logging.info(f"File not found for {file_type} on {file_date.strftime('%Y-%m-%d')}, might be a holiday")
+            logging.error(f"Error reading {file_type} file: {e}")
             downloaded_files[file_type] = None
     
     return downloaded_files
 
 def transform_data(data, data_name):
+    import pandas as pd
+    from src.expiry_calendar import monthly_expiry_dates
+    if config.COMPUTE_ENGINE == 'arrow':
+        from src.arrow_engine import transform_data as arrow_transform_data
+        return arrow_transform_data(data, data_name)
     try:
         data.columns = data.columns.str.strip()
 
         if data is not None:
             if data_name == "Bhavcopy":
+                # The parsed bhavcopy also carries rows for analytics specs; apply
+                # the row filters first so only candidate rows are date-parsed
+                data = data.loc[
+                    (data['FinInstrmTp'].astype('string').str.strip() == config.BHAVCOPY_INSTRUMENT_TYPE) &
+                    (data['TtlTradgVol'] >= config.MIN_TRADE_VOLUME)
+                ].copy()
                 data['XpryDt'] = pd.to_datetime(data['XpryDt'], errors='coerce')
                 data.dropna(subset=['XpryDt'], inplace=True)
 
-                # Extract year & month
-                data['Year'] = data['XpryDt'].dt.year
-                data['Month'] = data['XpryDt'].dt.month
-
-                # Get last Thursday for each year-month
-                data['Last_Thursday'] = data.apply(lambda row: get_last_thursday(row['Year'], row['Month']), axis=1)
+                # Look up the monthly expiry for each row's year-month
+                data['Last_Thursday'] = monthly_expiry_dates(data['XpryDt'])
 
                 # Filter only where XpryDt == Last Thursday
                 bhavcopy_data = data.loc[
-                    (data['FinInstrmTp'].str.strip() == 'STF') &
-                    (data['XpryDt'] == data['Last_Thursday']) &
-                    (data['TtlTradgVol'] >= 3000),
+                    data['XpryDt'] == data['Last_Thursday'],
                     ['TckrSymb', 'TtlTradgVol']
                 ].rename(columns={
                     'TckrSymb': 'Symbol',
@@ -199,127 +169,116 @@ def transform_data(data, data_name):
         logging.error(f"Error occurred while transforming data: {e}")
         return None
 
-def join_and_save_data(bhavcopy_df, volatility_df, secban_df, target_date):
-    """Join the dataframes and save the results"""
-    try:
-        if bhavcopy_df is not None and volatility_df is not None:
-            # Merge bhavcopy and volatility data
-            merged_data = pd.merge(bhavcopy_df, volatility_df, on='Symbol', how='inner')
-
-            # Filter out banned securities if secban data exists
-            if secban_df is not None:
-                logging.info("Merging data for secban")
-                final_data = merged_data[~merged_data['Symbol'].isin(secban_df['Symbol'].values)]
-            else:
-                final_data = merged_data
-
-            # Add Percentile Calculations
-            final_data = calculate_percentiles(final_data)
-
-            # Add expiry, processed date, and request date columns
-            expiry_date = get_next_expiry_thursday().strftime("%Y-%m-%d")
-            processed_datetime = datetime.now().strftime('%Y-%m-%d')
-            final_data["Expiry_Date"] = expiry_date
-            final_data["Processed_Timestamp"] = processed_datetime
-            final_data["Request_Date"] = target_date.strftime('%Y-%m-%d')
-            
-            # Remove duplicates based on Symbol and Request_Date
-            final_data = final_data.drop_duplicates(subset=['Symbol', 'Request_Date'], keep='last')
-
-            # Create year-month based directory structure
-            year_month = target_date.strftime('%Y%m')
-            csv_output_dir = os.path.join(config.OUTPUT_PATH, year_month)
-            parquet_output_dir = os.path.join(config.Parquet_OUTPUT_PATH, year_month)
-            
-            # Ensure output paths exist
-            os.makedirs(csv_output_dir, exist_ok=True)
-            os.makedirs(parquet_output_dir, exist_ok=True)
+def build_final_data(bhavcopy_df, volatility_df, secban_df, target_date):
+    """Join the filtered dataframes and add percentile and date columns"""
+    import pandas as pd
+    from src.schema import apply_output_dtypes
+    if config.COMPUTE_ENGINE == 'arrow':
+        from src.arrow_engine import build_final_data as arrow_build_final_data
+        return arrow_build_final_data(bhavcopy_df, volatility_df, secban_df, target_date)
+    if bhavcopy_df is None or volatility_df is None:
+        logging.warning("Error: One or more DataFrames are empty.")
+        return None
 
-            # === CSV Handling ===
-            csv_path = os.path.join(csv_output_dir, "filtered_data_with_percentiles.csv")
-            
-            if os.path.exists(csv_path):
-                # Read existing CSV and append new data
-                existing_df = pd.read_csv(csv_path)
-                # Remove any existing entries for the same symbols and date
-                existing_df = existing_df[~((existing_df['Symbol'].isin(final_data['Symbol'])) & 
-                                          (existing_df['Request_Date'] == final_data['Request_Date'].iloc[0]))]
-                # Append new data
-                combined_df = pd.concat([existing_df, final_data], ignore_index=True)
-                # Sort by request date and symbol
-                combined_df.sort_values(['Request_Date', 'Symbol'], inplace=True)
-                # Save the combined data
-                combined_df.to_csv(csv_path, index=False)
-            else:
-                # Create new file
-                final_data.to_csv(csv_path, index=False)
-            
-            logging.info(f"CSV file updated: {csv_path}")
+    # Merge bhavcopy and volatility data
+    merged_data = pd.merge(bhavcopy_df, volatility_df, on='Symbol', how='inner')
 
-            # === Parquet Handling ===
-            parquet_path = os.path.join(parquet_output_dir, "filtered_data_with_percentiles.parquet")
-            
-            if os.path.exists(parquet_path):
-                # Read existing parquet and append new data
-                existing_df = pd.read_parquet(parquet_path)
-                # Remove any existing entries for the same symbols and date
-                existing_df = existing_df[~((existing_df['Symbol'].isin(final_data['Symbol'])) & 
-                                          (existing_df['Request_Date'] == final_data['Request_Date'].iloc[0]))]
-                # Append new data
-                combined_df = pd.concat([existing_df, final_data], ignore_index=True)
-                # Sort by request date and symbol
-                combined_df.sort_values(['Request_Date', 'Symbol'], inplace=True)
-                # Save the combined data
-                combined_df.to_parquet(parquet_path, index=False)
-            else:
-                # Create new file
-                final_data.to_parquet(parquet_path, index=False)
-            
-            logging.info(f"Parquet file updated: {parquet_path}")
+    # Filter out banned securities if secban data exists
+    if secban_df is not None:
+        logging.info("Merging data for secban")
+        final_data = merged_data[~merged_data['Symbol'].isin(secban_df['Symbol'].values)]
+    else:
+        final_data = merged_data
+
+    # Add Percentile Calculations
+    with stage('percentiles', rows_in=len(final_data)) as span:
+        final_data = calculate_percentiles(final_data)
+        span.rows_out = len(final_data)
+
+    # Add expiry, processed timestamp, and request date columns
+    final_data["Expiry_Date"] = get_next_expiry_thursday(target_date)
+    final_data["Processed_Timestamp"] = datetime.now()
+    final_data["Request_Date"] = datetime(target_date.year, target_date.month, target_date.day)
+
+    # Remove duplicates based on Symbol and Request_Date
+    final_data = final_data.drop_duplicates(subset=['Symbol', 'Request_Date'], keep='last')
+    return apply_output_dtypes(final_data)
+
+def write_file_outputs(final_data, year_month):
+    """
+    Write final data for one month partition with the file sinks in
+    config.OUTPUT_SINKS (Parquet dataset and/or CSV). final_data may hold
+    several request dates, so a backfill writes each month once.
+    """
+    from src.output_sinks import write_outputs
+    from src.serve import publish
+    write_outputs(final_data, year_month)
+    # Warm the rankings cache if this process is serving (--serve)
+    publish(final_data)
+
+def load_to_db(final_data, db_method=None):
+    """Upsert final data into the database; errors propagate to the caller"""
+    from src.db_utils import insert_fo_data
+
+    with stage('db_upsert', rows_in=len(final_data)) as span:
+        insert_fo_data(final_data, config.DB_PARAMS, method=db_method)
+        span.rows_out = len(final_data)
+
+def save_final_data(final_data, year_month, db_method=None):
+    """Write final data to the file outputs and, if enabled, the database"""
+    write_file_outputs(final_data, year_month)
+
+    # Insert into database if configured
+    try:
+        if config.DB_ENABLED:
+            load_to_db(final_data, db_method)
+    except Exception as e:
+        logging.error(f"Error inserting data into database: {e}")
+        # Continue execution even if database insert fails
 
-            # Insert into database if configured
-            try:
-                if hasattr(config, 'DB_PARAMS'):
-                    insert_fo_data(final_data, config.DB_PARAMS)
-            except Exception as e:
-                logging.error(f"Error inserting data into database: {e}")
-                # Continue execution even if database insert fails
+def join_and_save_data(bhavcopy_df, volatility_df, secban_df, target_date):
+    """Join the dataframes and save the results"""
+    from src.rolling_percentiles import add_rolling_percentiles
 
-            return final_data
-        else:
-            logging.warning("Error: One or more DataFrames are empty.")
+    try:
+        final_data = build_final_data(bhavcopy_df, volatility_df, secban_df, target_date)
+        if final_data is None:
             return None
 
+        # Time-series percentiles against each symbol's own recent history
+        with stage('rolling_percentiles', rows_in=len(final_data)) as span:
+            final_data = add_rolling_percentiles(final_data)
+            span.rows_out = len(final_data)
+
+        save_final_data(final_data, target_date.strftime('%Y%m'))
+        return final_data
+
     except Exception as e:
         logging.error(f"Error occurred while joining data: {e}")
         return None
 
-def process_for_date(date_str=None):
-    """Process data for a specific date"""
+def rows(df):
+    return len(df) if df is not None else 0
+
+def process_for_date(date_str=None, force=False):
+    """
+    Process data for a specific date. Stages already recorded as done in the
+    pipeline manifest are skipped; force=True runs every stage again.
+    """
+    from src.pipeline import run_date
+
+    configure_logging()
     if date_str:
         target_date = datetime.strptime(date_str, '%Y-%m-%d')
     else:
         target_date = datetime.now()
     
     logging.info(f"Processing data for date: {target_date.strftime('%Y-%m-%d')}")
-    downloaded_data = download_files(target_date)
-    
-    FO_bhavcopy = downloaded_data.get('bhavcopy')
-    FO_Volatility = downloaded_data.get('volatility')
-    FO_secban = downloaded_data.get('secban')
-    
-    if all(v is None for v in downloaded_data.values()):
-        logging.error("All downloads failed. Exiting.")
-        return
-    
-    # Transform the data
-    FO_bhavcopy_filtered = transform_data(FO_bhavcopy, 'Bhavcopy')
-    FO_Volatility_filtered = transform_data(FO_Volatility, 'Volatility')
-    FO_secban_filtered = transform_data(FO_secban, 'Secban')
-    
-    # Join and save the data
-    final_data = join_and_save_data(FO_bhavcopy_filtered, FO_Volatility_filtered, FO_secban_filtered, target_date)
-    return final_data
+    start_run(target_date.strftime('%Y-%m-%d'))
+    try:
+        return run_date(target_date, force=force)
+    finally:
+        finish_run()
 
 if __name__ == "__main__":
     import argparse
@@ -327,11 +286,69 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process F&O data for a given date')
     parser.add_argument('--date', type=str, required=False,
                         help='Date in YYYY-MM-DD format. If not provided, uses current date')
+    parser.add_argument('--start', type=str, required=False,
+                        help='Backfill start date in YYYY-MM-DD format (requires --end)')
+    parser.add_argument('--end', type=str, required=False,
+                        help='Backfill end date in YYYY-MM-DD format (requires --start)')
+    parser.add_argument('--workers', type=int, required=False,
+                        help='Number of backfill worker processes (default: config.BACKFILL_WORKERS)')
+    parser.add_argument('--compact', type=str, required=False, metavar='YYYYMM',
+                        help='Compact a month of Parquet date fragments into one monthly file')
+    parser.add_argument('--offline', action='store_true',
+                        help='Only use files from the local raw cache, never the network')
+    parser.add_argument('--force', action='store_true',
+                        help='Re-run every stage even if the pipeline manifest marks it done')
+    parser.add_argument('--export-csv', type=str, required=False, metavar='YYYYMM',
+                        help='Export a month of the Parquet dataset to CSV (for Parquet-only runs)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Stay resident and process each trading day as soon as NSE publishes it')
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve the rankings over HTTP from an in-memory cache (with --daemon: alongside it)')
+    parser.add_argument('--port', type=int, required=False,
+                        help='Port for --serve (default: config.SERVE_PORT)')
     
     args = parser.parse_args()
+    configure_logging()
+
+    if args.offline:
+        config.OFFLINE_MODE = True
+
+    if args.daemon:
+        from src.scheduler import run_daemon
+        if args.serve:
+            from src.serve import start_server
+            start_server(port=args.port)
+        run_daemon()
+        raise SystemExit(0)
+
+    if args.serve:
+        from src.serve import run_server
+        run_server(port=args.port)
+        raise SystemExit(0)
+
+    if args.export_csv:
+        from src.output_sinks import export_csv
+        export_csv(args.export_csv)
+        raise SystemExit(0)
+
+    if args.compact:
+        from src.dataset_writer import compact_month
+        compact_month(int(args.compact[:4]), int(args.compact[4:6]))
+        raise SystemExit(0)
+
+    if args.start or args.end:
+        if not (args.start and args.end):
+            parser.error('--start and --end must be used together')
+        from src.backfill import run_backfill
+        results, report = run_backfill(args.start, args.end, workers=args.workers, force=args.force)
+        done = sum(1 for result in results.values() if result is not None)
+        print(f"Backfill {args.start} to {args.end}: {done} of {len(results)} pending trading days processed")
+        if report:
+            print(report)
+        raise SystemExit(0)
     
     # Use current date if no date is provided
     target_date = args.date if args.date else datetime.now().strftime('%Y-%m-%d')
     
     # Process the data
-    process_for_date(target_date)
+    process_for_date(target_date, force=args.force)
@@ -1,22 +1,135 @@
 import os
 
 # Config file for file paths and constants
+#
+# Nothing here touches the filesystem at import time. Every setting can be
+# overridden with an FO_<NAME> environment variable or the same key in a
+# .env file (FO_ENV_FILE, default: .env next to this file). Paths are
+# resolved, and their directories created, the first time they are accessed.
 
-# Base paths
-BASE_PATH = r"/Users/hemantdayma/Documents/FO_OI"
-DATA_PATH = os.path.join(BASE_PATH, "data")
+PROJECT_PATH = os.path.dirname(os.path.abspath(__file__))
+_file_values = None
 
-# Input/Output paths
-INPUT_PATH = os.path.join(DATA_PATH, "Input")
-OUTPUT_PATH = os.path.join(DATA_PATH, "Output")
-Parquet_OUTPUT_PATH = os.path.join(DATA_PATH, "Output_Parquet")
-HOLIDAYS_PATH = os.path.join(DATA_PATH, "holidays")
 
-# Holiday file
-NSE_HOLIDAYS_FILE = os.path.join(HOLIDAYS_PATH, "nse_holidays_2025.csv")
+def _config_file_values():
+    """Key/values from the .env config file, read once on first use"""
+    global _file_values
+    if _file_values is None:
+        path = os.environ.get('FO_ENV_FILE', os.path.join(PROJECT_PATH, '.env'))
+        _file_values = {}
+        if os.path.exists(path):
+            from dotenv import dotenv_values
+            _file_values = dict(dotenv_values(path))
+    return _file_values
 
-# Log file path
-LOG_FILE_PATH = os.path.join(BASE_PATH, "logs", "bhavcopy.log")
+
+def _env(name, default):
+    """Setting value from FO_<name> (environment first, then .env), cast like default"""
+    raw = os.environ.get(f'FO_{name}')
+    if raw is None:
+        raw = _config_file_values().get(f'FO_{name}')
+    if raw is None:
+        return default
+    if isinstance(default, bool):
+        return raw.strip().lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(default, dict):
+        # Inline JSON, or the path of a JSON file
+        import json
+        if raw.lstrip().startswith('{'):
+            return json.loads(raw)
+        with open(os.path.expanduser(raw.strip())) as f:
+            return json.load(f)
+    if isinstance(default, tuple):
+        items = [item.strip() for item in raw.split(',') if item.strip()]
+        cast = type(default[0]) if default else str
+        return tuple(cast(item) for item in items)
+    if default is None:
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return type(default)(raw)
+
+
+# Lazily resolved settings: name -> (resolver, what to create on first access)
+_LAZY = {
+    # Base paths
+    'BASE_PATH': (lambda: PROJECT_PATH, None),
+    'DATA_PATH': (lambda: os.path.join(_get('BASE_PATH'), "data"), None),
+
+    # Input/Output paths
+    'INPUT_PATH': (lambda: os.path.join(_get('DATA_PATH'), "Input"), 'dir'),
+    'OUTPUT_PATH': (lambda: os.path.join(_get('DATA_PATH'), "Output"), 'dir'),
+    'Parquet_OUTPUT_PATH': (lambda: os.path.join(_get('DATA_PATH'), "Output_Parquet"), 'dir'),
+    # Hive-partitioned year/month/request_date
+    'DATASET_PATH': (lambda: os.path.join(_get('DATA_PATH'), "Output_Dataset"), 'dir'),
+    'STATE_PATH': (lambda: os.path.join(_get('DATA_PATH'), "state"), 'dir'),
+    'HOLIDAYS_PATH': (lambda: os.path.join(_get('DATA_PATH'), "holidays"), None),
+
+    # Raw download cache (exact bytes fetched from NSE, plus manifest.json)
+    'RAW_CACHE_PATH': (lambda: os.path.join(_get('INPUT_PATH'), "raw_cache"), 'dir'),
+
+    # Holiday files: every nse_holidays_<year>.csv in HOLIDAYS_PATH is loaded
+    'NSE_HOLIDAYS_FILE': (lambda: os.path.join(_get('HOLIDAYS_PATH'), "nse_holidays_2025.csv"), None),
+
+    # Log file path
+    'LOG_FILE_PATH': (lambda: os.path.join(_get('BASE_PATH'), "logs", "bhavcopy.log"), 'parent'),
+
+    # Per-stage instrumentation output
+    'METRICS_PATH': (lambda: os.path.join(_get('BASE_PATH'), "logs", "metrics"), 'dir'),
+
+    # Rolling percentile state
+    'ROLLING_STATE_PATH': (lambda: os.path.join(_get('STATE_PATH'), "rolling_state.npz"), 'parent'),
+
+    # Per-date stage manifest (SQLite) and Arrow IPC intermediates for resumable runs
+    'PIPELINE_MANIFEST_PATH': (lambda: os.path.join(_get('STATE_PATH'), "pipeline_manifest.sqlite"), 'parent'),
+    'INTERMEDIATE_PATH': (lambda: os.path.join(_get('DATA_PATH'), "intermediate"), 'dir'),
+
+    # One Hive-partitioned dataset per analytics spec: <ANALYTICS_PATH>/<spec name>/
+    'ANALYTICS_PATH': (lambda: os.path.join(_get('DATA_PATH'), "Output_Analytics"), 'dir'),
+
+    # Database configuration
+    'DB_PARAMS': (lambda: {
+        'host': _env('DB_HOST', '127.0.0.1'),
+        'port': _env('DB_PORT', 3306),
+        'user': _env('DB_USER', 'hemant_nse'),
+        'password': _env('DB_PASSWORD', 'Hemant1908'),
+        'database': _env('DB_NAME', 'fo_market_data')
+    }, None),
+}
+
+
+def _get(name):
+    """Module attribute lookup that goes through the lazy resolver"""
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+def __getattr__(name):
+    """Resolve a lazy setting on first access and cache it as a module attribute"""
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    resolve, create = _LAZY[name]
+    value = resolve() if name == 'DB_PARAMS' else _env(name, None) or resolve()
+    if create == 'dir':
+        os.makedirs(value, exist_ok=True)
+    elif create == 'parent':
+        os.makedirs(os.path.dirname(value), exist_ok=True)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+NSE_HOLIDAYS_PATTERN = _env('NSE_HOLIDAYS_PATTERN', "nse_holidays_*.csv")
+RAW_CACHE_MAX_AGE = _env('RAW_CACHE_MAX_AGE', None)  # Seconds before a cached file is re-downloaded; None = never
+OFFLINE_MODE = _env('OFFLINE_MODE', False)  # Serve only from the raw cache, never hit the network
+
+# Per-stage instrumentation
+METRICS_FORMATS = _env('METRICS_FORMATS', ('jsonl', 'prometheus'))  # stages.jsonl and/or fo_pipeline.prom textfile
+PROFILE_STAGES = _env('PROFILE_STAGES', ())  # Stage names (or 'all') to run under cProfile
+TRACEMALLOC_STAGES = _env('TRACEMALLOC_STAGES', ())  # Stage names (or 'all') to track Python allocation peaks for
 
 # Date formats for different URLs
 DATE_FORMATS = {
@@ -66,18 +179,98 @@ API_HEADERS = {
     'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
 }
 
-# Create required directories
-os.makedirs(INPUT_PATH, exist_ok=True)
-os.makedirs(OUTPUT_PATH, exist_ok=True)
-os.makedirs(Parquet_OUTPUT_PATH, exist_ok=True)
-os.makedirs(HOLIDAYS_PATH, exist_ok=True)
-os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
-
-# Database configuration
-DB_PARAMS = {
-    'host': '127.0.0.1',
-    'port': 3306,
-    'user': 'hemant_nse',
-    'password': 'Hemant1908',
-    'database': 'fo_market_data'
+# Database switch: set FO_DB_ENABLED=0 to skip MySQL entirely
+DB_ENABLED = _env('DB_ENABLED', True)
+
+# Backfill settings
+BACKFILL_WORKERS = _env('BACKFILL_WORKERS', max(1, (os.cpu_count() or 2) - 1))
+
+# Download settings
+DOWNLOAD_CONCURRENCY = _env('DOWNLOAD_CONCURRENCY', 8)  # Max in-flight requests across all hosts
+DOWNLOAD_LIMIT_PER_HOST = _env('DOWNLOAD_LIMIT_PER_HOST', 4)  # Pooled connections per host
+DOWNLOAD_TIMEOUT = _env('DOWNLOAD_TIMEOUT', 60)  # Seconds per request
+DOWNLOAD_MAX_RETRIES = _env('DOWNLOAD_MAX_RETRIES', 4)  # Retries for 5xx/429 responses and network errors
+DOWNLOAD_BACKOFF_BASE = _env('DOWNLOAD_BACKOFF_BASE', 1.0)  # Seconds, doubled on each retry
+DOWNLOAD_BACKOFF_MAX = _env('DOWNLOAD_BACKOFF_MAX', 30.0)
+
+# Daemon mode (--daemon): poll NSE from the publish window until each file appears
+SCHEDULER_PUBLISH_START = _env('SCHEDULER_PUBLISH_START', '16:00')  # HH:MM, start polling on trading days
+SCHEDULER_DEADLINE = _env('SCHEDULER_DEADLINE', '23:30')  # HH:MM, give up on files not published by then
+SCHEDULER_POLL_MIN = _env('SCHEDULER_POLL_MIN', 60.0)  # Seconds between polls right after a miss
+SCHEDULER_POLL_MAX = _env('SCHEDULER_POLL_MAX', 900.0)  # Upper bound for the poll interval
+SCHEDULER_BACKOFF_FACTOR = _env('SCHEDULER_BACKOFF_FACTOR', 1.5)  # Poll interval growth per miss
+SCHEDULER_SECBAN_GRACE = _env('SCHEDULER_SECBAN_GRACE', 3600.0)  # Seconds to wait for secban once the rest landed
+
+# Bhavcopy filters
+BHAVCOPY_INSTRUMENT_TYPE = _env('BHAVCOPY_INSTRUMENT_TYPE', 'STF')  # Stock futures
+MIN_TRADE_VOLUME = _env('MIN_TRADE_VOLUME', 3000)
+BHAVCOPY_CHUNK_ROWS = _env('BHAVCOPY_CHUNK_ROWS', 50000)  # Rows parsed per chunk while streaming the zip
+
+# Engine for the bhavcopy read, transform, join and percentile stages: 'pandas', or
+# 'arrow' for pyarrow.compute kernels on multithreaded columnar tables (same output)
+COMPUTE_ENGINE = _env('COMPUTE_ENGINE', 'pandas')
+
+# File outputs written for every run: 'parquet' (partitioned dataset) and/or 'csv'
+# (monthly CSV kept with streaming appends). Use FO_OUTPUT_SINKS=parquet for a
+# Parquet-only run and export CSV on demand with --export-csv YYYYMM.
+OUTPUT_SINKS = _env('OUTPUT_SINKS', ('parquet', 'csv'))
+
+# Read-only rankings server (--serve): per-date outputs cached in memory as Arrow tables
+SERVE_HOST = _env('SERVE_HOST', '127.0.0.1')
+SERVE_PORT = _env('SERVE_PORT', 8765)
+SERVE_CACHE_DATES = _env('SERVE_CACHE_DATES', 64)  # Request dates kept in memory (LRU)
+SERVE_REFRESH_SECONDS = _env('SERVE_REFRESH_SECONDS', 5.0)  # How often the dataset is checked for new dates
+
+# Extra analytics evaluated in the same pass over each bhavcopy (opt-in).
+# Every spec widens the rows kept by the streaming read, so the default is {}.
+# FO_ANALYTICS_SPECS takes {spec name: spec} as inline JSON or the path of a JSON
+# file; ANALYTICS_SPEC_EXAMPLES shows the format.
+# instruments: FinInstrmTp codes (STF/IDF futures, STO/IDO options)
+# expiry: 'monthly' (last-Thursday rule), 'nearest' per symbol, or 'all'
+# min_volume / min_open_interest: row thresholds
+# group_by + metrics: bhavcopy columns and pandas aggregations per group
+# put_call_ratio: column summed for PE and CE legs per group
+ANALYTICS_SPEC_EXAMPLES = {
+    'index_futures': {
+        'instruments': ['IDF'],
+        'expiry': 'monthly',
+        'group_by': ['TckrSymb'],
+        'metrics': {'TtlTradgVol': 'sum', 'OpnIntrst': 'sum', 'ChngInOpnIntrst': 'sum'}
+    },
+    'stock_option_oi_by_strike': {
+        'instruments': ['STO'],
+        'expiry': 'nearest',
+        'min_open_interest': 1,
+        'group_by': ['TckrSymb', 'XpryDt', 'StrkPric', 'OptnTp'],
+        'metrics': {'OpnIntrst': 'sum', 'ChngInOpnIntrst': 'sum', 'TtlTradgVol': 'sum'}
+    },
+    'option_put_call_ratio': {
+        'instruments': ['STO', 'IDO'],
+        'expiry': 'all',
+        'group_by': ['TckrSymb'],
+        'metrics': {'TtlTradgVol': 'sum'},
+        'put_call_ratio': 'OpnIntrst'
+    }
 }
+ANALYTICS_SPECS = _env('ANALYTICS_SPECS', {})
+
+# Database ingestion
+DB_INSERT_METHOD = _env('DB_INSERT_METHOD', 'executemany')  # 'executemany', 'batch' or 'load_data'
+BACKFILL_DB_INSERT_METHOD = _env('BACKFILL_DB_INSERT_METHOD', 'batch')  # Staged bulk load for backfills
+DB_BATCH_SIZE = _env('DB_BATCH_SIZE', 5000)  # Rows per multi-row VALUES batch
+DB_DELTA_UPSERT = _env('DB_DELTA_UPSERT', True)  # Write only new/changed rows (row_hash) and delete dropped symbols
+
+# fo_market_analysis partitions (python src/setup_database.py --partitions / --check-partitions)
+DB_PARTITION_GRANULARITY = _env('DB_PARTITION_GRANULARITY', 'year')  # 'year' or 'month' for new partitions
+DB_PARTITIONS_AHEAD = _env('DB_PARTITIONS_AHEAD', 2)  # Future periods kept partitioned beyond the current one
+DB_PARTITION_RETENTION_MONTHS = _env('DB_PARTITION_RETENTION_MONTHS', 0)  # Partitions entirely older than this expire; 0 keeps all
+DB_PARTITION_RETENTION_ACTION = _env('DB_PARTITION_RETENTION_ACTION', 'archive')  # 'archive' (own table) or 'drop'
+
+# Database connection pool
+DB_POOL_SIZE = _env('DB_POOL_SIZE', 4)
+DB_POOL_WAIT_TIMEOUT = _env('DB_POOL_WAIT_TIMEOUT', 30)  # Seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = _env('DB_POOL_HEALTH_CHECK_INTERVAL', 60)  # Ping connections idle longer than this
+
+# Rolling (time-series) percentiles over each symbol's own history
+ROLLING_WINDOWS = _env('ROLLING_WINDOWS', (20, 60))  # Trading days
+ROLLING_MIN_PERIODS = _env('ROLLING_MIN_PERIODS', 5)  # Fewer observations than this yields empty values
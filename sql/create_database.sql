@@ -7,7 +7,7 @@ USE fo_market_data;
 
 -- Create table for F&O market data
 CREATE TABLE IF NOT EXISTS fo_market_analysis (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    id BIGINT AUTO_INCREMENT,
     symbol VARCHAR(50) NOT NULL,
     request_date DATE NOT NULL,
     expiry_date DATE NOT NULL,
@@ -18,8 +18,12 @@ CREATE TABLE IF NOT EXISTS fo_market_analysis (
     percentile_volatility INT NOT NULL,
     average_percentile DECIMAL(5,2) NOT NULL,
     average_percentile_desc VARCHAR(20) NOT NULL,
+    row_hash BIGINT UNSIGNED NULL COMMENT 'Hash of the stored values, used to skip unchanged rows on reload',
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     
+    -- Every unique key of a partitioned table must include the partitioning column
+    PRIMARY KEY (id, request_date),
+    
     -- Add unique constraint to prevent duplicate entries
     UNIQUE KEY uk_symbol_request_date (symbol, request_date),
     
@@ -43,14 +47,35 @@ CREATE TABLE IF NOT EXISTS fo_market_analysis (
     CONSTRAINT chk_volume CHECK (trade_volume >= 0)
 ) 
 ENGINE = InnoDB
-PARTITION BY RANGE (YEAR(request_date)) (
-    PARTITION p_2024 VALUES LESS THAN (2025),
-    PARTITION p_2025 VALUES LESS THAN (2026),
-    PARTITION p_2026 VALUES LESS THAN (2027),
-    PARTITION p_max VALUES LESS THAN MAXVALUE
+-- Later partitions are added ahead of time by python src/setup_database.py --partitions
+PARTITION BY RANGE COLUMNS (request_date) (
+    PARTITION p_2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p_2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p_2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p_max VALUES LESS THAN (MAXVALUE)
 );
 
--- Create a view for easy querying of latest data
+-- Latest row per symbol, kept current by the loader in the same transaction as
+-- fo_market_analysis (rebuild with: python src/setup_database.py --rebuild-latest)
+CREATE TABLE IF NOT EXISTS fo_market_latest (
+    symbol VARCHAR(50) NOT NULL PRIMARY KEY,
+    request_date DATE NOT NULL,
+    expiry_date DATE NOT NULL,
+    processed_timestamp TIMESTAMP NOT NULL,
+    daily_volatility DECIMAL(10,4) NOT NULL,
+    trade_volume BIGINT NOT NULL,
+    percentile_volume INT NOT NULL,
+    percentile_volatility INT NOT NULL,
+    average_percentile DECIMAL(5,2) NOT NULL,
+    average_percentile_desc VARCHAR(20) NOT NULL,
+
+    INDEX idx_request_date (request_date),
+    INDEX idx_average_percentile (average_percentile)
+)
+ENGINE = InnoDB
+COMMENT 'Latest fo_market_analysis row per symbol';
+
+-- Kept for existing readers; now a primary-key scan of fo_market_latest
 CREATE OR REPLACE VIEW v_latest_market_data AS
 SELECT 
     symbol,
@@ -62,12 +87,21 @@ SELECT
     percentile_volatility,
     average_percentile,
     average_percentile_desc
-FROM fo_market_analysis
-WHERE (symbol, request_date) IN (
-    SELECT symbol, MAX(request_date)
-    FROM fo_market_analysis
-    GROUP BY symbol
-);
+FROM fo_market_latest;
+
+-- Upgrading an existing database: add the change-detection hash (rows get it on their next load)
+-- ALTER TABLE fo_market_analysis
+--     ADD COLUMN row_hash BIGINT UNSIGNED NULL AFTER average_percentile_desc;
+-- tables still partitioned by YEAR(request_date) are converted (a full table copy) with
+--   python src/setup_database.py --repartition
+-- and fill fo_market_latest from the history once:
+-- INSERT INTO fo_market_latest (symbol, request_date, expiry_date, processed_timestamp, daily_volatility,
+--     trade_volume, percentile_volume, percentile_volatility, average_percentile, average_percentile_desc)
+-- SELECT h.symbol, h.request_date, h.expiry_date, h.processed_timestamp, h.daily_volatility,
+--     h.trade_volume, h.percentile_volume, h.percentile_volatility, h.average_percentile, h.average_percentile_desc
+-- FROM fo_market_analysis h
+-- JOIN (SELECT symbol, MAX(request_date) AS request_date FROM fo_market_analysis GROUP BY symbol) m
+--   ON h.symbol = m.symbol AND h.request_date = m.request_date;
 
 -- Add comments for documentation
 ALTER TABLE fo_market_analysis
@@ -75,5 +109,6 @@ ALTER TABLE fo_market_analysis
 
 -- Create user and grant permissions (customize username/password)
 CREATE USER IF NOT EXISTS 'fo_app_user'@'localhost' IDENTIFIED BY 'your_strong_password_here';
-GRANT SELECT, INSERT, UPDATE ON fo_market_data.* TO 'fo_app_user'@'localhost';
+-- DELETE: reloading a date removes symbols that dropped out of it (e.g. newly banned)
+GRANT SELECT, INSERT, UPDATE, DELETE ON fo_market_data.* TO 'fo_app_user'@'localhost';
 FLUSH PRIVILEGES;
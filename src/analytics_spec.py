@@ -0,0 +1,148 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Output names for bhavcopy columns used by analytics specs
+OUTPUT_NAMES = {
+    'TckrSymb': 'Symbol',
+    'FinInstrmTp': 'Instrument_Type',
+    'XpryDt': 'Expiry_Date',
+    'StrkPric': 'Strike',
+    'OptnTp': 'Option_Type',
+    'TtlTradgVol': 'Trade_volume',
+    'OpnIntrst': 'Open_interest',
+    'ChngInOpnIntrst': 'Change_in_OI',
+    'TtlTrfVal': 'Traded_value',
+    'ClsPric': 'Close_price'
+}
+
+EXPIRY_RULES = ('monthly', 'nearest', 'all')
+SPEC_KEYS = {'instruments', 'expiry', 'min_volume', 'min_open_interest', 'group_by', 'metrics', 'put_call_ratio'}
+
+
+def validate_spec(name, spec):
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise ValueError(f"Analytics spec {name}: unknown keys {sorted(unknown)}")
+    if not spec.get('instruments'):
+        raise ValueError(f"Analytics spec {name}: 'instruments' is required")
+    if spec.get('expiry', 'all') not in EXPIRY_RULES:
+        raise ValueError(f"Analytics spec {name}: expiry must be one of {EXPIRY_RULES}")
+    if not spec.get('metrics') and not spec.get('put_call_ratio'):
+        raise ValueError(f"Analytics spec {name}: needs 'metrics' and/or 'put_call_ratio'")
+    if spec.get('put_call_ratio') and not spec.get('group_by'):
+        raise ValueError(f"Analytics spec {name}: 'put_call_ratio' needs 'group_by' columns to compute it per group")
+
+
+def validate_specs(specs):
+    for name, spec in specs.items():
+        validate_spec(name, spec)
+
+
+def spec_columns(spec):
+    """Bhavcopy columns a spec reads"""
+    columns = {'FinInstrmTp', 'TckrSymb', 'XpryDt', 'TtlTradgVol'}
+    columns.update(spec.get('group_by', ()))
+    columns.update(spec.get('metrics', {}))
+    if spec.get('min_open_interest') is not None:
+        columns.add('OpnIntrst')
+    if spec.get('put_call_ratio'):
+        columns.update({'OptnTp', spec['put_call_ratio']})
+    return columns
+
+
+def row_mask(data, spec, instrument):
+    """
+    Row-level filters of a spec (instrument type and thresholds; expiry rules
+    need the whole date and are applied in evaluate_spec).
+    instrument is the stripped FinInstrmTp column, computed once per chunk.
+    """
+    mask = instrument.isin(spec['instruments'])
+    if spec.get('min_volume') is not None:
+        mask &= data['TtlTradgVol'] >= spec['min_volume']
+    if spec.get('min_open_interest') is not None:
+        mask &= data['OpnIntrst'] >= spec['min_open_interest']
+    return mask.fillna(False).astype(bool)
+
+
+def expiry_filter(data, rule):
+    """Keep rows whose expiry matches the rule: the monthly expiry, or each symbol's nearest one"""
+    from src.expiry_calendar import monthly_expiry_dates
+
+    if rule == 'all' or data.empty:
+        return data
+    expiry = pd.to_datetime(data['XpryDt'], errors='coerce')
+    if rule == 'monthly':
+        keep = expiry == monthly_expiry_dates(expiry)
+    else:
+        keep = expiry == expiry.groupby(data['TckrSymb']).transform('min')
+    return data.loc[keep.fillna(False)]
+
+
+def evaluate_spec(data, spec, instrument):
+    """Apply one spec to the parsed bhavcopy rows and return its output table"""
+    subset = expiry_filter(data.loc[row_mask(data, spec, instrument)], spec.get('expiry', 'all'))
+    group_by = list(spec.get('group_by', ()))
+    metrics = spec.get('metrics', {})
+
+    if group_by:
+        result = subset.groupby(group_by, observed=True, sort=True).agg(metrics) if metrics \
+            else subset[group_by].drop_duplicates().set_index(group_by)
+    else:
+        result = subset[list(metrics)]
+
+    pcr_column = spec.get('put_call_ratio')
+    if pcr_column:
+        sides = (subset.assign(OptnTp=subset['OptnTp'].astype('string').str.strip())
+                 .groupby(group_by + ['OptnTp'], observed=True)[pcr_column].sum()
+                 .unstack('OptnTp')
+                 .reindex(columns=['PE', 'CE'], fill_value=0))
+        label = OUTPUT_NAMES.get(pcr_column, pcr_column)
+        result[f'Put_{label}'] = sides['PE']
+        result[f'Call_{label}'] = sides['CE']
+        ratio = sides['PE'].astype('float64') / sides['CE'].astype('float64')
+        result['Put_Call_Ratio'] = ratio.replace([np.inf, -np.inf], np.nan).round(4)
+
+    result = result.reset_index() if group_by else result.reset_index(drop=True)
+    if 'XpryDt' in result.columns:
+        result['XpryDt'] = pd.to_datetime(result['XpryDt'], errors='coerce').dt.strftime('%Y-%m-%d')
+    return result.rename(columns=OUTPUT_NAMES)
+
+
+def evaluate_specs(data, request_date, specs=None):
+    """
+    Evaluate every analytics spec against one parsed bhavcopy.
+    The bhavcopy was read once with the union of the specs' columns and
+    instrument types; each spec is a set of vectorized masks and a groupby
+    over those rows. Returns {spec name: output DataFrame}.
+    """
+    specs = config.ANALYTICS_SPECS if specs is None else specs
+    if not isinstance(data, pd.DataFrame):
+        # Arrow table from the arrow compute engine's reader
+        from src.arrow_engine import to_pandas
+        data = to_pandas(data)
+    instrument = data['FinInstrmTp'].astype('string').str.strip()
+    outputs = {}
+    for name, spec in specs.items():
+        validate_spec(name, spec)
+        output = evaluate_spec(data, spec, instrument)
+        output['Request_Date'] = request_date
+        outputs[name] = output
+        logging.info(f"Analytics {name}: {len(output)} rows for {request_date}")
+    return outputs
+
+
+def write_analytics(bhavcopy, request_date, specs=None, root=None):
+    """Evaluate the specs and write each output into its own partitioned dataset"""
+    from src.dataset_writer import write_fragments
+
+    root = root or config.ANALYTICS_PATH
+    outputs = evaluate_specs(bhavcopy, request_date, specs)
+    for name, output in outputs.items():
+        if not output.empty:
+            write_fragments(output, os.path.join(root, name))
+    return outputs
@@ -0,0 +1,271 @@
+"""
+Arrow compute engine (config.COMPUTE_ENGINE = 'arrow'): the bhavcopy read,
+transform_data, the join and calculate_percentiles as pyarrow.compute kernels
+on columnar tables, with the same output as the pandas path.
+"""
+import io
+import zipfile
+import logging
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+import config
+from src.instrumentation import stage
+from src.schema import plain_columns
+
+# Arrow types for the bhavcopy columns transform_data and the analytics specs read
+BHAVCOPY_TYPES = {
+    'FinInstrmTp': pa.string(),
+    'XpryDt': pa.string(),
+    'TckrSymb': pa.string(),
+    'TtlTradgVol': pa.int64(),
+    'StrkPric': pa.float64(),
+    'OptnTp': pa.string(),
+    'OpnIntrst': pa.int64(),
+    'ChngInOpnIntrst': pa.int64(),
+    'TtlTrfVal': pa.float64(),
+    'ClsPric': pa.float64()
+}
+
+VOLATILITY_COLUMN = 'Applicable Daily Volatility (M) = Max (E or K)'
+
+# Average_Percentile thresholds, highest first (as in calculate_percentiles)
+PERCENTILE_BANDS = [(80, 'Very High'), (60, 'High'), (40, 'Moderate'), (20, 'Low')]
+
+# Bytes of CSV parsed per record batch while streaming the zip
+READ_BLOCK_SIZE = 1 << 20
+
+
+def as_table(data):
+    """Arrow table with stripped column names and plain (non-dictionary) columns"""
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+    table = plain_columns(table)
+    return table.rename_columns([name.strip() for name in table.column_names])
+
+
+def to_pandas(bhavcopy):
+    """Parsed bhavcopy table -> DataFrame with the dtypes of src.bhavcopy_reader (for the analytics specs)"""
+    from src.bhavcopy_reader import ANALYTICS_DTYPES, BHAVCOPY_DTYPES
+
+    dtypes = {**BHAVCOPY_DTYPES, **ANALYTICS_DTYPES, 'TtlTradgVol': 'int64'}
+    df = bhavcopy.to_pandas()
+    return df.astype({name: dtypes[name] for name in df.columns if name in dtypes})
+
+
+def batch_mask(batch, specs):
+    """Rows of one record batch that at least one spec selects"""
+    instrument = pc.utf8_trim_whitespace(batch.column('FinInstrmTp'))
+    mask = None
+    for spec in specs:
+        keep = pc.is_in(instrument, value_set=pa.array(spec['instruments'], pa.string()))
+        if spec.get('min_volume') is not None:
+            keep = pc.and_kleene(keep, pc.greater_equal(batch.column('TtlTradgVol'), spec['min_volume']))
+        if spec.get('min_open_interest') is not None:
+            keep = pc.and_kleene(keep, pc.greater_equal(batch.column('OpnIntrst'), spec['min_open_interest']))
+        keep = pc.fill_null(keep, False)
+        mask = keep if mask is None else pc.or_(mask, keep)
+    return mask
+
+
+def read_bhavcopy(content, instrument_type=None, min_volume=None, analytics_specs=None):
+    """
+    Arrow counterpart of src.bhavcopy_reader.read_bhavcopy: stream the zipped
+    CSV through the multithreaded pyarrow reader in record batches and keep
+    the rows and columns transform_data or an analytics spec needs.
+    Returns an Arrow table.
+    """
+    from src.analytics_spec import spec_columns, validate_specs
+    from src.bhavcopy_reader import read_header
+
+    instrument_type = instrument_type or config.BHAVCOPY_INSTRUMENT_TYPE
+    min_volume = config.MIN_TRADE_VOLUME if min_volume is None else min_volume
+    analytics_specs = config.ANALYTICS_SPECS if analytics_specs is None else analytics_specs
+    validate_specs(analytics_specs)
+    specs = [{'instruments': [instrument_type], 'min_volume': min_volume}] + list(analytics_specs.values())
+
+    columns = ['FinInstrmTp', 'XpryDt', 'TckrSymb', 'TtlTradgVol']
+    for spec in analytics_specs.values():
+        columns += sorted(spec_columns(spec) - set(columns))
+
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+        member = zip_file.namelist()[0]
+        raw_names = read_header(zip_file, member)
+        missing = [name for name in columns if name not in raw_names]
+        if missing:
+            raise ValueError(f"Bhavcopy is missing columns: {missing}")
+
+        convert_options = pacsv.ConvertOptions(
+            include_columns=[raw_names[name] for name in columns],
+            column_types={raw_names[name]: BHAVCOPY_TYPES.get(name, pa.string()) for name in columns},
+            strings_can_be_null=True
+        )
+        kept = []
+        total_rows = 0
+        with zip_file.open(member) as csv_file:
+            reader = pacsv.open_csv(csv_file, read_options=pacsv.ReadOptions(block_size=READ_BLOCK_SIZE),
+                                    convert_options=convert_options)
+            schema = reader.schema
+            for batch in reader:
+                total_rows += batch.num_rows
+                batch = batch.rename_columns([name.strip() for name in batch.schema.names])
+                kept.append(batch.filter(batch_mask(batch, specs)))
+
+    table = pa.Table.from_batches(kept) if kept else \
+        schema.empty_table().rename_columns([name.strip() for name in schema.names])
+    logging.info(f"Bhavcopy streamed {total_rows} rows, kept {table.num_rows} rows for "
+                 f"{instrument_type} (volume >= {min_volume}) and {len(analytics_specs)} analytics specs")
+    return table
+
+
+def expiry_timestamps(values):
+    """XpryDt as timestamp[s]; unparseable values become null (like errors='coerce')"""
+    if pa.types.is_timestamp(values.type) or pa.types.is_date(values.type):
+        return pc.cast(values, pa.timestamp('s'))
+    return pc.strptime(pc.utf8_trim_whitespace(pc.cast(values, pa.string())),
+                       format='%Y-%m-%d', unit='s', error_is_null=True)
+
+
+def monthly_expiry_array(expiry):
+    """Monthly expiry for each timestamp, resolving every distinct (year, month) once"""
+    from src.expiry_calendar import get_monthly_expiry
+
+    month_keys = pc.add(pc.multiply(pc.year(expiry), 12), pc.subtract(pc.month(expiry), 1))
+    keys = pc.unique(month_keys).drop_null()
+    expiries = pa.array([get_monthly_expiry(key // 12, key % 12 + 1) for key in keys.to_pylist()],
+                        pa.timestamp('s'))
+    return pc.take(expiries, pc.index_in(month_keys, value_set=keys))
+
+
+def transform_bhavcopy(table):
+    table = table.filter(pc.and_kleene(
+        pc.equal(pc.utf8_trim_whitespace(table.column('FinInstrmTp')), config.BHAVCOPY_INSTRUMENT_TYPE),
+        pc.greater_equal(table.column('TtlTradgVol'), config.MIN_TRADE_VOLUME)
+    ))
+    expiry = expiry_timestamps(table.column('XpryDt'))
+    table = table.filter(pc.equal(expiry, monthly_expiry_array(expiry)))
+
+    bhavcopy_data = pa.table({
+        'Symbol': pc.cast(table.column('TckrSymb'), pa.string()),
+        'Trade_volume': pc.cast(table.column('TtlTradgVol'), pa.int64())
+    })
+    logging.info(f"Bhavcopy Data Count (Last Thursday): {bhavcopy_data.num_rows}")
+    return bhavcopy_data
+
+
+def transform_volatility(table):
+    volatility = table.column(VOLATILITY_COLUMN)
+    filtered_data = pa.table({
+        'Symbol': pc.cast(table.column('Symbol'), pa.string()),
+        'Daily_Volatility': volatility
+    }).filter(pc.greater(volatility, pc.mean(volatility)))
+    logging.info(f"Volatility Data Count: {filtered_data.num_rows}")
+    return filtered_data
+
+
+def transform_secban(table):
+    # Skip the first row; the symbol is the last word of the first column
+    first = pc.utf8_trim_whitespace(pc.cast(table.column(0), pa.string())).slice(1)
+    symbols = pc.struct_field(pc.extract_regex(first, r'(?P<Symbol>\S+)$'), 'Symbol')
+    secban_data = pa.table({'Symbol': symbols})
+    logging.info(f"Secban Data Count: {secban_data.num_rows}")
+    return secban_data
+
+
+TRANSFORMS = {
+    'Bhavcopy': transform_bhavcopy,
+    'Volatility': transform_volatility,
+    'Secban': transform_secban
+}
+
+
+def transform_data(data, data_name):
+    """combine_code.transform_data on Arrow tables; returns an Arrow table (None on error)"""
+    try:
+        if data is None:
+            return None
+        return TRANSFORMS[data_name](as_table(data))
+    except Exception as e:
+        logging.error(f"Error occurred while transforming data: {e}")
+        return None
+
+
+def percentile_ranks(values):
+    """ceil(rank(pct=True) * 100) with pandas' average rank for ties: (min rank + max rank) / 2"""
+    low = pc.cast(pc.rank(values, tiebreaker='min'), pa.float64())
+    high = pc.cast(pc.rank(values, tiebreaker='max'), pa.float64())
+    average_rank = pc.divide(pc.add(low, high), 2.0)
+    return pc.cast(pc.ceil(pc.multiply(pc.divide(average_rank, float(pc.count(values).as_py())), 100.0)),
+                   pa.int8())
+
+
+def calculate_percentiles(table):
+    percentile_volume = percentile_ranks(table.column('Trade_volume'))
+    percentile_volatility = percentile_ranks(table.column('Daily_Volatility'))
+    # Sum in int16: two int8 percentiles can exceed 127
+    average = pc.cast(pc.ceil(pc.divide(
+        pc.cast(pc.add(pc.cast(percentile_volume, pa.int16()), pc.cast(percentile_volatility, pa.int16())),
+                pa.float64()),
+        2.0)), pa.int8())
+
+    conditions = pc.make_struct(*[pc.greater_equal(average, threshold) for threshold, _ in PERCENTILE_BANDS],
+                                field_names=[label for _, label in PERCENTILE_BANDS])
+    labels = pc.case_when(conditions, *[pa.scalar(label) for _, label in PERCENTILE_BANDS],
+                          pa.scalar('Very Low'))
+
+    logging.info("Percentiles calculated successfully with rounded values.")
+    return (table.append_column('Percentile_Volume', percentile_volume)
+            .append_column('Percentile_Volatility', percentile_volatility)
+            .append_column('Average_Percentile', average)
+            .append_column('Average_Percentile_Desc', labels))
+
+
+def keep_last(table, key):
+    """Drop duplicate keys keeping the last row of each, in the original row order"""
+    rows = table.append_column('_row', pa.array(np.arange(table.num_rows, dtype=np.int64)))
+    last = rows.group_by(key, use_threads=False).aggregate([('_row', 'max')]).column('_row_max')
+    return table.take(np.sort(last.to_numpy()))
+
+
+def build_final_data(bhavcopy_df, volatility_df, secban_df, target_date):
+    """
+    combine_code.build_final_data on Arrow tables: hash join, anti-filter on the
+    ban list and percentiles as Arrow kernels. Accepts DataFrames or tables
+    and returns a DataFrame in the output schema, like the pandas path.
+    """
+    from combine_code import get_next_expiry_thursday
+    from src.schema import apply_output_dtypes
+
+    if bhavcopy_df is None or volatility_df is None:
+        logging.warning("Error: One or more DataFrames are empty.")
+        return None
+
+    bhavcopy = as_table(bhavcopy_df).select(['Symbol', 'Trade_volume'])
+    volatility = as_table(volatility_df).select(['Symbol', 'Daily_Volatility'])
+    bhavcopy = bhavcopy.set_column(0, 'Symbol', pc.cast(bhavcopy.column('Symbol'), pa.string()))
+    volatility = volatility.set_column(0, 'Symbol', pc.cast(volatility.column('Symbol'), pa.string()))
+
+    # Row numbers restore pd.merge's order (left rows, then right matches) after the hash join
+    bhavcopy = bhavcopy.append_column('_left', pa.array(np.arange(bhavcopy.num_rows, dtype=np.int64)))
+    volatility = volatility.append_column('_right', pa.array(np.arange(volatility.num_rows, dtype=np.int64)))
+    merged_data = (bhavcopy.join(volatility, 'Symbol', join_type='inner')
+                   .sort_by([('_left', 'ascending'), ('_right', 'ascending')])
+                   .select(['Symbol', 'Trade_volume', 'Daily_Volatility']))
+
+    if secban_df is not None:
+        logging.info("Merging data for secban")
+        banned = pc.cast(as_table(secban_df).column('Symbol'), pa.string())
+        merged_data = merged_data.filter(pc.invert(pc.is_in(merged_data.column('Symbol'), value_set=banned)))
+
+    with stage('percentiles', rows_in=merged_data.num_rows) as span:
+        final_table = calculate_percentiles(merged_data)
+        span.rows_out = final_table.num_rows
+
+    final_data = keep_last(final_table, 'Symbol').to_pandas()
+    final_data["Expiry_Date"] = get_next_expiry_thursday(target_date)
+    final_data["Processed_Timestamp"] = datetime.now()
+    final_data["Request_Date"] = datetime(target_date.year, target_date.month, target_date.day)
+    return apply_output_dtypes(final_data)
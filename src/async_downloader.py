@@ -0,0 +1,140 @@
+import asyncio
+import random
+import logging
+
+import aiohttp
+
+import config
+from src.date_utils import get_valid_dates, is_market_holiday
+from src.raw_cache import RawFileCache
+
+
+def build_download_jobs(target_dates, urls=None):
+    """
+    Build (date key, file type, file date, url) jobs for every NSE file of every target date.
+    urls overrides config.NSE_URLS, e.g. to point at a local stand-in server.
+    """
+    urls = urls or config.NSE_URLS
+    jobs = []
+    for target_date in target_dates:
+        date_key = target_date.strftime('%Y-%m-%d')
+        valid_dates = get_valid_dates(target_date)
+        for file_type, url_template in urls.items():
+            file_date = valid_dates[file_type]
+            date_str = file_date.strftime(config.DATE_FORMATS[file_type])
+            jobs.append((date_key, file_type, file_date, url_template.format(date=date_str)))
+    return jobs
+
+
+def create_session():
+    """Create an aiohttp session with bounded, per-host pooled connections"""
+    connector = aiohttp.TCPConnector(
+        limit=config.DOWNLOAD_CONCURRENCY,
+        limit_per_host=config.DOWNLOAD_LIMIT_PER_HOST
+    )
+    timeout = aiohttp.ClientTimeout(total=config.DOWNLOAD_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=config.URL_HEADERS)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with jitter, honouring a Retry-After header when present"""
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), config.DOWNLOAD_BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = config.DOWNLOAD_BACKOFF_BASE * (2 ** attempt)
+    return min(delay + random.uniform(0, delay / 10), config.DOWNLOAD_BACKOFF_MAX)
+
+
+async def fetch_file(session, semaphore, file_type, file_date, url):
+    """
+    Fetch one file and return its raw bytes, or None if it is unavailable.
+    5xx/429 responses and network errors are retried with exponential backoff;
+    404s are not retried since NSE returns them for holidays and unpublished files.
+    """
+    day = file_date.strftime('%Y-%m-%d')
+    for attempt in range(config.DOWNLOAD_MAX_RETRIES + 1):
+        retry_after = None
+        try:
+            async with semaphore:
+                logging.info(f"Downloading {file_type} file for date {day} from: {url}")
+                async with session.get(url) as response:
+                    if response.status == 404:
+                        if is_market_holiday(file_date):
+                            logging.info(f"File not found for {file_type} on {day}, market holiday")
+                        else:
+                            logging.warning(f"File not found for {file_type} on {day}, "
+                                            f"might be a holiday or not published yet")
+                        return None
+                    if response.status == 429 or response.status >= 500:
+                        retry_after = response.headers.get('Retry-After')
+                        raise aiohttp.ClientResponseError(
+                            response.request_info, response.history,
+                            status=response.status, message=response.reason
+                        )
+                    if response.status >= 400:
+                        logging.error(f"Error downloading {file_type} file: HTTP {response.status}")
+                        return None
+                    content = await response.read()
+                    logging.info(f"Successfully downloaded {file_type} file for {day} "
+                                 f"({len(content)} bytes)")
+                    return content
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == config.DOWNLOAD_MAX_RETRIES:
+                logging.error(f"Error downloading {file_type} file after {attempt + 1} attempts: {e}")
+                return None
+            delay = backoff_delay(attempt, retry_after)
+            logging.warning(f"Retrying {file_type} for {day} in {delay:.1f}s after error: {e!r}")
+            await asyncio.sleep(delay)
+    return None
+
+
+async def fetch_all(target_dates, urls=None, session=None, cache=None):
+    """
+    Fetch every NSE file for every target date concurrently.
+    Files already in the raw cache are served from disk; only missing or stale
+    entries go to the network, and nothing does when config.OFFLINE_MODE is set.
+    Returns {date 'YYYY-MM-DD': {file_type: bytes or None}}.
+    """
+    jobs = build_download_jobs(target_dates, urls)
+    if cache is None:
+        cache = RawFileCache()
+
+    contents = [cache.get(file_type, file_date) for _, file_type, file_date, _ in jobs]
+    misses = [i for i, content in enumerate(contents) if content is None]
+    logging.info(f"Raw cache: {len(jobs) - len(misses)} hits, {len(misses)} misses")
+
+    if misses and config.OFFLINE_MODE:
+        for i in misses:
+            _, file_type, file_date, _ = jobs[i]
+            logging.warning(f"Offline mode: {file_type} for {file_date:%Y-%m-%d} is not cached")
+    elif misses:
+        semaphore = asyncio.Semaphore(config.DOWNLOAD_CONCURRENCY)
+        own_session = session is None
+        if own_session:
+            session = create_session()
+        try:
+            fetched = await asyncio.gather(*(
+                fetch_file(session, semaphore, jobs[i][1], jobs[i][2], jobs[i][3]) for i in misses
+            ))
+        finally:
+            if own_session:
+                await session.close()
+
+        for i, content in zip(misses, fetched):
+            if content is not None:
+                _, file_type, file_date, url = jobs[i]
+                cache.put(file_type, file_date, content, url)
+                contents[i] = content
+        cache.flush()
+
+    results = {}
+    for (date_key, file_type, _, _), content in zip(jobs, contents):
+        results.setdefault(date_key, {})[file_type] = content
+    return results
+
+
+def fetch_raw_files(target_dates, urls=None):
+    """Synchronous entry point for fetch_all"""
+    return asyncio.run(fetch_all(target_dates, urls))
@@ -0,0 +1,271 @@
+import time
+import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import config
+from src.async_downloader import fetch_raw_files
+from src.date_utils import get_trading_days
+from src.frame_store import read_frame, write_frame
+from src.pipeline import (JOINED_FRAME, StageManifest, load_transformed, run_analytics, save_transformed,
+                          write_outputs)
+from src.rolling_percentiles import add_rolling_percentiles, rebuild_rolling_state
+from src.schema import date_key
+
+STAGES = ['fetch', 'parse', 'transform', 'join', 'write']
+# Manifest stages a worker process is responsible for
+WORKER_STAGES = ('downloaded', 'transformed', 'joined')
+
+
+def process_date_stages(date_str, raw_files):
+    """
+    Run parse, transform and join for one date inside a worker process.
+    raw_files=None resumes from the transformed Arrow IPC frames of an earlier run.
+    Returns the joined frame (or None) with per-stage timings, row counts and
+    the manifest outcome of the 'downloaded' and 'transformed' stages.
+    """
+    import combine_code
+
+    combine_code.configure_logging()  # spawned workers do not inherit the parent's handlers
+    target_date = pd.Timestamp(date_str).to_pydatetime()
+    timings = {}
+    rows = {}
+    outcome = {}
+
+    if raw_files is None:
+        frames = load_transformed(date_str)
+        bhavcopy_filtered, volatility_filtered = frames['bhavcopy'], frames['volatility']
+        secban_filtered = frames['secban']
+    else:
+        if raw_files.get('bhavcopy') is None or raw_files.get('volatility') is None:
+            logging.error(f"Backfill: required downloads failed for {date_str}")
+            outcome['downloaded'] = 'bhavcopy or volatility file missing'
+            return date_str, None, timings, rows, outcome
+        outcome['downloaded'] = None
+
+        start = time.perf_counter()
+        downloaded_data = combine_code.download_files(target_date, raw_files=raw_files)
+        timings['parse'] = time.perf_counter() - start
+        rows['parse'] = sum(len(df) for df in downloaded_data.values() if df is not None)
+
+        start = time.perf_counter()
+        run_analytics(downloaded_data.get('bhavcopy'), date_str)
+        bhavcopy_filtered = volatility_filtered = secban_filtered = None
+        if downloaded_data.get('bhavcopy') is not None and downloaded_data.get('volatility') is not None:
+            bhavcopy_filtered = combine_code.transform_data(downloaded_data.get('bhavcopy'), 'Bhavcopy')
+            volatility_filtered = combine_code.transform_data(downloaded_data.get('volatility'), 'Volatility')
+        if downloaded_data.get('secban') is not None:
+            secban_filtered = combine_code.transform_data(downloaded_data.get('secban'), 'Secban')
+        timings['transform'] = time.perf_counter() - start
+        rows['transform'] = sum(len(df) for df in (bhavcopy_filtered, volatility_filtered, secban_filtered)
+                                if df is not None)
+
+        if bhavcopy_filtered is None or volatility_filtered is None:
+            outcome['transformed'] = 'bhavcopy or volatility transform failed'
+            return date_str, None, timings, rows, outcome
+        save_transformed(date_str, {'bhavcopy': bhavcopy_filtered, 'volatility': volatility_filtered,
+                                    'secban': secban_filtered})
+        outcome['transformed'] = None
+
+    start = time.perf_counter()
+    final_data = combine_code.build_final_data(bhavcopy_filtered, volatility_filtered,
+                                               secban_filtered, target_date)
+    timings['join'] = time.perf_counter() - start
+    rows['join'] = len(final_data) if final_data is not None else 0
+
+    return date_str, final_data, timings, rows, outcome
+
+
+def format_throughput_report(stage_seconds, stage_rows, dates_done, wall_seconds):
+    """Build a per-stage throughput summary for a backfill run"""
+    lines = [f"Backfill processed {dates_done} dates in {wall_seconds:.1f}s "
+             f"({dates_done / wall_seconds if wall_seconds else 0:.2f} dates/s)"]
+    for stage in STAGES:
+        seconds = stage_seconds.get(stage, 0.0)
+        n_rows = stage_rows.get(stage, 0)
+        rate = n_rows / seconds if seconds else 0
+        unit = 'files' if stage == 'fetch' else 'rows'
+        lines.append(f"  {stage:<10} {seconds:9.2f}s  {n_rows:>10} {unit:<5} {rate:12.0f} {unit}/s")
+    return "\n".join(lines)
+
+
+def collect_month(year_month, futures, stage_seconds, stage_rows, results, manifest, joined_dates=(),
+                  done_dates=(), store=None):
+    """
+    Wait for one month's worker results and write them as a single batch.
+    joined_dates already have a stored joined frame and only need their outputs
+    written; done_dates are complete and are only read to advance the rolling
+    state. Every date goes through the rolling state in date order.
+    """
+    month_frames = []
+    for future in as_completed(futures):
+        date_str = futures[future]
+        try:
+            _, final_data, timings, rows, outcome = future.result()
+            for stage, seconds in timings.items():
+                stage_seconds[stage] += seconds
+            for stage, n_rows in rows.items():
+                stage_rows[stage] += n_rows
+            for stage_name, error in outcome.items():
+                if error is None:
+                    manifest.mark_done(date_str, stage_name)
+                else:
+                    manifest.mark_failed(date_str, stage_name, error)
+            if final_data is not None and not final_data.empty:
+                month_frames.append(final_data)
+            elif not any(outcome.values()):
+                manifest.mark_failed(date_str, 'joined', 'join produced no data')
+            results[date_str] = final_data
+        except Exception as e:
+            # A crashed worker reports no outcome; fail the first stage it owns that is not done
+            stage_name = next((name for name in WORKER_STAGES if not manifest.is_done(date_str, name)), 'joined')
+            manifest.mark_failed(date_str, stage_name, f"backfill worker error: {e}")
+            results[date_str] = None
+
+    for date_str in joined_dates:
+        final_data = read_frame(date_str, JOINED_FRAME, as_pandas=True)
+        if final_data is None:
+            manifest.reset(date_str, ['joined'])
+            continue
+        month_frames.append(final_data)
+
+    for date_str in done_dates:
+        final_data = read_frame(date_str, JOINED_FRAME, as_pandas=True)
+        if final_data is None:
+            logging.warning(f"Backfill: no stored joined frame for {date_str}; "
+                            f"its rolling window slot stays empty")
+            continue
+        month_frames.append(final_data)
+
+    if not month_frames:
+        return
+
+    joined = pd.concat(month_frames, ignore_index=True)
+    joined.sort_values(['Request_Date', 'Symbol'], inplace=True)
+    # Resumed and complete dates are recomputed too, so no date is missing from the windows
+    joined = add_rolling_percentiles(joined, store)
+    month_frames = []
+    for request_date, date_df in joined.groupby('Request_Date', sort=True):
+        date_str = date_key(request_date)
+        if date_str in done_dates:
+            continue
+        write_frame(date_df, date_str, JOINED_FRAME)
+        manifest.mark_done(date_str, 'joined', len(date_df))
+        results[date_str] = date_df
+        month_frames.append(date_df)
+
+    if not month_frames:
+        return
+
+    month_data = pd.concat(month_frames, ignore_index=True)
+    start = time.perf_counter()
+    write_outputs(manifest, month_data, year_month, db_method=config.BACKFILL_DB_INSERT_METHOD)
+    stage_seconds['write'] += time.perf_counter() - start
+    stage_rows['write'] += len(month_data)
+
+
+def run_backfill(start_date, end_date, workers=None, force=False):
+    """
+    Process every trading day between start_date and end_date across a process pool.
+    Each month's files are fetched concurrently while the previous month is
+    still being processed, and results are written as one batch per month partition.
+    Stages the pipeline manifest records as done are skipped unless force is set.
+
+    The rolling state is rebuilt up to the first pending date and every later
+    date (complete ones included) is fed through it in date order, so an earlier
+    range can be backfilled after the daily job. It is rebuilt up to the newest
+    stored date afterwards.
+
+    Returns ({date: joined frame or None} for the pending dates, throughput report);
+    the report is also logged.
+    """
+    import combine_code
+
+    # Before the holiday loader logs anything, which would set up a WARNING-level root handler
+    combine_code.configure_logging()
+    trading_days = get_trading_days(start_date, end_date)
+    if not trading_days:
+        logging.warning(f"Backfill: no trading days between {start_date} and {end_date}")
+        return {}, ''
+
+    manifest = StageManifest()
+    pending = {}
+    for day in trading_days:
+        date_str = day.strftime('%Y-%m-%d')
+        if force:
+            manifest.reset(date_str)
+        stages = manifest.pending(date_str)
+        if stages:
+            pending[date_str] = stages
+    logging.info(f"Backfill: {len(trading_days) - len(pending)} of {len(trading_days)} trading days "
+                 f"already complete in the pipeline manifest")
+
+    workers = workers or config.BACKFILL_WORKERS
+    logging.info(f"Backfill: {len(pending)} trading days from {trading_days[0]:%Y-%m-%d} "
+                 f"to {trading_days[-1]:%Y-%m-%d} with {workers} workers")
+
+    months = defaultdict(list)
+    store = None
+    if pending:
+        first, last = min(pending), max(pending)
+        store = rebuild_rolling_state(str(np.datetime64(first) - 1))
+        for day in trading_days:
+            if first <= day.strftime('%Y-%m-%d') <= last:
+                months[day.strftime('%Y%m')].append(day)
+
+    stage_seconds = defaultdict(float)
+    stage_rows = defaultdict(int)
+    results = {}
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep at most two months in flight so raw bytes held in memory stay bounded
+        in_flight = None
+        for year_month, days in months.items():
+            joined_dates, transformed_dates, done_dates, fetch_days = [], [], [], []
+            for day in days:
+                stages = pending.get(day.strftime('%Y-%m-%d'))
+                if not stages:
+                    done_dates.append(day.strftime('%Y-%m-%d'))
+                elif 'joined' not in stages:
+                    joined_dates.append(day.strftime('%Y-%m-%d'))
+                elif 'transformed' not in stages:
+                    transformed_dates.append(day.strftime('%Y-%m-%d'))
+                else:
+                    fetch_days.append(day)
+
+            start = time.perf_counter()
+            raw_by_date = fetch_raw_files(fetch_days) if fetch_days else {}
+            stage_seconds['fetch'] += time.perf_counter() - start
+            stage_rows['fetch'] += sum(1 for files in raw_by_date.values()
+                                       for content in files.values() if content is not None)
+
+            # Dates that were transformed by an earlier run resume from their Arrow IPC frames
+            raw_by_date.update({date_str: None for date_str in transformed_dates})
+            futures = {executor.submit(process_date_stages, date_str, raw_files): date_str
+                       for date_str, raw_files in raw_by_date.items()}
+            del raw_by_date
+
+            if in_flight is not None:
+                month, month_futures, month_joined, month_done = in_flight
+                collect_month(month, month_futures, stage_seconds, stage_rows, results, manifest,
+                              month_joined, month_done, store)
+            in_flight = (year_month, futures, joined_dates, done_dates)
+
+        if in_flight is not None:
+            month, month_futures, month_joined, month_done = in_flight
+            collect_month(month, month_futures, stage_seconds, stage_rows, results, manifest,
+                          month_joined, month_done, store)
+
+    manifest.close()
+    if pending:
+        # Dates after the backfilled range (the daily job's) go back into the windows
+        rebuild_rolling_state()
+    report = format_throughput_report(stage_seconds, stage_rows,
+                                      sum(1 for v in results.values() if v is not None),
+                                      time.perf_counter() - wall_start)
+    logging.info(report)
+    return results, report
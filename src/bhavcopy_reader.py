@@ -0,0 +1,96 @@
+import io
+import zipfile
+import logging
+
+import pandas as pd
+
+import config
+
+# Only the columns transform_data needs, with compact dtypes.
+# XpryDt stays a string until after filtering so only kept rows are date-parsed.
+BHAVCOPY_DTYPES = {
+    'FinInstrmTp': 'category',
+    'XpryDt': 'string',
+    'TckrSymb': 'string',
+    'TtlTradgVol': 'Int64'
+}
+
+# Dtypes for the extra columns analytics specs may read
+ANALYTICS_DTYPES = {
+    'StrkPric': 'float64',
+    'OptnTp': 'category',
+    'OpnIntrst': 'Int64',
+    'ChngInOpnIntrst': 'Int64',
+    'TtlTrfVal': 'float64',
+    'ClsPric': 'float64'
+}
+
+
+def read_header(zip_file, member):
+    """Map stripped column names to the raw header names of a zipped CSV member"""
+    with zip_file.open(member) as raw:
+        header = io.TextIOWrapper(raw, encoding='utf-8-sig').readline()
+    return {name.strip(): name for name in header.rstrip('\r\n').split(',')}
+
+
+def filter_chunk(chunk, specs):
+    """Keep rows that at least one spec (the base STF filter or an analytics spec) selects"""
+    from src.analytics_spec import row_mask
+
+    instrument = chunk['FinInstrmTp'].astype('string').str.strip()
+    mask = pd.Series(False, index=chunk.index)
+    for spec in specs:
+        mask |= row_mask(chunk, spec, instrument)
+    return chunk.loc[mask]
+
+
+def read_bhavcopy(content, instrument_type=None, min_volume=None, chunksize=None, analytics_specs=None):
+    """
+    Stream the CSV inside a bhavcopy zip and return only the rows transform_data
+    or an analytics spec keeps, with the union of the columns they read.
+    The zip member is decompressed incrementally and parsed in chunks, so peak
+    memory scales with the filtered rows rather than the full F&O file.
+    """
+    from src.analytics_spec import spec_columns, validate_specs
+
+    instrument_type = instrument_type or config.BHAVCOPY_INSTRUMENT_TYPE
+    min_volume = config.MIN_TRADE_VOLUME if min_volume is None else min_volume
+    chunksize = chunksize or config.BHAVCOPY_CHUNK_ROWS
+    analytics_specs = config.ANALYTICS_SPECS if analytics_specs is None else analytics_specs
+    validate_specs(analytics_specs)
+    specs = [{'instruments': [instrument_type], 'min_volume': min_volume}] + list(analytics_specs.values())
+
+    columns = dict(BHAVCOPY_DTYPES)
+    for spec in analytics_specs.values():
+        for name in sorted(spec_columns(spec) - set(columns)):
+            columns[name] = ANALYTICS_DTYPES.get(name)
+
+    with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+        # Get the first file in the zip (should be the CSV)
+        member = zip_file.namelist()[0]
+        raw_names = read_header(zip_file, member)
+        missing = [name for name in columns if name not in raw_names]
+        if missing:
+            raise ValueError(f"Bhavcopy is missing columns: {missing}")
+
+        usecols = [raw_names[name] for name in columns]
+        dtypes = {raw_names[name]: dtype for name, dtype in columns.items() if dtype is not None}
+        renames = {raw_names[name]: name for name in columns}
+
+        kept = []
+        total_rows = 0
+        with zip_file.open(member) as csv_file:
+            for chunk in pd.read_csv(csv_file, usecols=usecols, dtype=dtypes,
+                                     chunksize=chunksize, encoding='utf-8-sig'):
+                total_rows += len(chunk)
+                kept.append(filter_chunk(chunk.rename(columns=renames), specs))
+
+    if kept:
+        data = pd.concat(kept, ignore_index=True)
+    else:
+        data = pd.DataFrame({name: pd.Series(dtype=dtype or 'object') for name, dtype in columns.items()})
+    # Rows kept only by an analytics spec without min_volume may have no volume (nothing traded)
+    data['TtlTradgVol'] = data['TtlTradgVol'].fillna(0).astype('int64')
+    logging.info(f"Bhavcopy streamed {total_rows} rows, kept {len(data)} rows for "
+                 f"{instrument_type} (volume >= {min_volume}) and {len(analytics_specs)} analytics specs")
+    return data
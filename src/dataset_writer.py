@@ -0,0 +1,97 @@
+import os
+import uuid
+import shutil
+import logging
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import config
+from src.schema import date_strings, to_arrow
+
+# Hive partition keys, in directory order: year=YYYY/month=MM/request_date=YYYY-MM-DD
+PARTITION_SCHEMA = pa.schema([
+    ('year', pa.int16()),
+    ('month', pa.int8()),
+    ('request_date', pa.string())
+])
+FRAGMENT_NAME = "part-0.parquet"
+
+
+def partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+
+def fragment_dir(request_date, root=None):
+    """Directory holding the fragment for one request date ('YYYY-MM-DD')"""
+    root = root or config.DATASET_PATH
+    year, month, _ = request_date.split('-')
+    return os.path.join(root, f"year={int(year)}", f"month={int(month)}", f"request_date={request_date}")
+
+
+def write_date_fragment(table, request_date, root=None):
+    """
+    Atomically write or replace the fragment for one request date.
+    The file is written next to its final location and swapped in with
+    os.replace, so readers never observe a half-written fragment.
+    """
+    if not isinstance(table, pa.Table):
+        table = to_arrow(table)
+
+    target_dir = fragment_dir(request_date, root)
+    os.makedirs(target_dir, exist_ok=True)
+    target_path = os.path.join(target_dir, FRAGMENT_NAME)
+    tmp_path = os.path.join(target_dir, f".{uuid.uuid4().hex}.tmp")
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    logging.info(f"Parquet fragment written: {target_path} ({table.num_rows} rows)")
+    return target_path
+
+
+def write_fragments(df, root=None):
+    """Write one fragment per Request_Date found in df"""
+    paths = []
+    for request_date, date_df in df.groupby(date_strings(df['Request_Date']), sort=True):
+        paths.append(write_date_fragment(date_df, request_date, root))
+    return paths
+
+
+def open_dataset(root=None):
+    """Open the partitioned dataset so readers can prune by year/month/request_date"""
+    return ds.dataset(root or config.DATASET_PATH, format='parquet', partitioning=partitioning())
+
+
+def compact_month(year, month, root=None, output_root=None, remove_fragments=False):
+    """
+    Compact one month of date fragments into Output_Parquet/YYYYMM/filtered_data_with_percentiles.parquet.
+    Optionally removes the date fragments once the monthly file is in place.
+    """
+    root = root or config.DATASET_PATH
+    output_root = output_root or config.Parquet_OUTPUT_PATH
+    month_dir = os.path.join(root, f"year={int(year)}", f"month={int(month)}")
+    if not os.path.isdir(month_dir):
+        logging.warning(f"No fragments to compact for {year}-{month:02d}")
+        return None
+
+    dataset = ds.dataset(month_dir, format='parquet', partitioning=ds.partitioning(
+        pa.schema([('request_date', pa.string())]), flavor='hive'))
+    table = dataset.to_table(columns=[name for name in dataset.schema.names if name != 'request_date'])
+    table = table.sort_by([('Request_Date', 'ascending'), ('Symbol', 'ascending')])
+
+    output_dir = os.path.join(output_root, f"{int(year)}{int(month):02d}")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "filtered_data_with_percentiles.parquet")
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, output_path)
+    logging.info(f"Compacted {table.num_rows} rows into {output_path}")
+
+    if remove_fragments:
+        shutil.rmtree(month_dir)
+    return output_path
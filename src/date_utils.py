@@ -1,41 +1,119 @@
-import pandas as pd
-from datetime import datetime, timedelta
-import config
+import os
+import csv
+import glob
 import logging
+from datetime import datetime, time
+from functools import lru_cache
+
+import numpy as np
+import config
+
+
+def to_day(date):
+    """Convert a date string, date or datetime to numpy datetime64[D]"""
+    if isinstance(date, str):
+        date = datetime.strptime(date, '%Y-%m-%d')
+    return np.datetime64(date, 'D')
+
+
+def to_datetime(day):
+    """Convert numpy datetime64[D] back to a midnight datetime"""
+    return datetime.combine(day.astype(object), time())
+
+
+class TradingCalendar:
+    """
+    NSE trading calendar over every loaded holiday year.
+
+    Holidays are held as a sorted datetime64[D] array (backing a numpy
+    busdaycalendar for vectorized offsets and ranges) plus a set of day
+    ordinals for O(1) membership checks.
+    """
+
+    def __init__(self, holidays=()):
+        self.holidays = np.unique(np.array([to_day(d) for d in holidays], dtype='datetime64[D]'))
+        self._holiday_ordinals = set(self.holidays.astype(np.int64).tolist())
+        self._busdaycal = np.busdaycalendar(weekmask='1111100', holidays=self.holidays)
+
+    def is_trading_day(self, date):
+        day = to_day(date)
+        # 1970-01-01 was a Thursday, so (ordinal + 3) % 7 is Monday=0 .. Sunday=6
+        ordinal = int(day.astype(np.int64))
+        return (ordinal + 3) % 7 < 5 and ordinal not in self._holiday_ordinals
+
+    def is_trading_days(self, dates):
+        """Vectorized trading-day mask for an array of dates"""
+        return np.is_busday(np.asarray(dates, dtype='datetime64[D]'), busdaycal=self._busdaycal)
+
+    def next_trading_days(self, dates, n=1):
+        """The n-th trading day strictly after each date (vectorized)"""
+        return np.busday_offset(np.asarray(dates, dtype='datetime64[D]'), n,
+                                roll='backward', busdaycal=self._busdaycal)
+
+    def previous_trading_days(self, dates, n=1):
+        """The n-th trading day strictly before each date (vectorized)"""
+        return np.busday_offset(np.asarray(dates, dtype='datetime64[D]'), -n,
+                                roll='forward', busdaycal=self._busdaycal)
+
+    def on_or_before(self, dates):
+        """Each date if it is a trading day, else the previous trading day"""
+        return np.busday_offset(np.asarray(dates, dtype='datetime64[D]'), 0,
+                                roll='backward', busdaycal=self._busdaycal)
+
+    def trading_index(self, dates):
+        """Number of trading days since 1970-01-01 (consecutive for consecutive trading days)"""
+        return np.busday_count(np.datetime64('1970-01-01', 'D'), np.asarray(dates, dtype='datetime64[D]'),
+                               busdaycal=self._busdaycal)
+
+    def trading_days(self, start_date, end_date):
+        """All trading days between start_date and end_date (inclusive) as datetime64[D]"""
+        days = np.arange(to_day(start_date), to_day(end_date) + 1, dtype='datetime64[D]')
+        return days[self.is_trading_days(days)]
+
 
 def load_holidays():
-    """Load NSE holidays from CSV file"""
-    try:
-        holidays_df = pd.read_csv(config.NSE_HOLIDAYS_FILE)
-        holidays = [datetime.strptime(date, '%Y-%m-%d') for date in holidays_df['Date']]
-        logging.info(f"Loaded {len(holidays)} holidays from {config.NSE_HOLIDAYS_FILE}")
-        return holidays
-    except Exception as e:
-        logging.error(f"Error loading holidays: {e}")
-        return []
-
-# Load holidays when module is imported
-NSE_HOLIDAYS = load_holidays()
+    """Load NSE holidays from every holiday CSV in config.HOLIDAYS_PATH"""
+    files = sorted(glob.glob(os.path.join(config.HOLIDAYS_PATH, config.NSE_HOLIDAYS_PATTERN)))
+    if config.NSE_HOLIDAYS_FILE not in files and os.path.exists(config.NSE_HOLIDAYS_FILE):
+        files.append(config.NSE_HOLIDAYS_FILE)
+
+    holidays = []
+    for path in files:
+        try:
+            with open(path, newline='') as f:
+                holidays.extend(datetime.strptime(row['Date'].strip(), '%Y-%m-%d') for row in csv.DictReader(f))
+        except Exception as e:
+            logging.error(f"Error loading holidays from {path}: {e}")
+    if not files:
+        logging.error(f"Error loading holidays: no holiday files in {config.HOLIDAYS_PATH}")
+    logging.info(f"Loaded {len(holidays)} holidays from {len(files)} files")
+    return sorted(set(holidays))
+
+@lru_cache(maxsize=None)
+def get_calendar():
+    """The NSE trading calendar, built from the holiday files on first use"""
+    return TradingCalendar(load_holidays())
+
+
+def __getattr__(name):
+    # NSE_HOLIDAYS / CALENDAR stay importable without reading holiday files at import time
+    if name == 'CALENDAR':
+        return get_calendar()
+    if name == 'NSE_HOLIDAYS':
+        return [to_datetime(day) for day in get_calendar().holidays]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def is_market_holiday(date):
     """Check if given date is a market holiday"""
-    # Convert to datetime if date string is provided
-    if isinstance(date, str):
-        date = datetime.strptime(date, '%Y-%m-%d')
-    
-    # Check if it's weekend
-    if date.weekday() >= 5:  # 5 is Saturday, 6 is Sunday
-        return True
-    
-    # Check if it's a holiday
-    return date.replace(hour=0, minute=0, second=0, microsecond=0) in NSE_HOLIDAYS
+    return not get_calendar().is_trading_day(date)
 
 def get_next_trading_day(date):
     """Get the next trading day after the given date"""
-    next_day = date + timedelta(days=1)
-    while is_market_holiday(next_day):
-        next_day += timedelta(days=1)
-    return next_day
+    return to_datetime(get_calendar().next_trading_days(to_day(date)))
+
+def get_trading_days(start_date, end_date):
+    """Get all trading days between start_date and end_date (inclusive)"""
+    return [to_datetime(day) for day in get_calendar().trading_days(start_date, end_date)]
 
 def get_valid_dates(target_date=None):
     """
@@ -46,14 +124,14 @@ def get_valid_dates(target_date=None):
         target_date = datetime.now()
     elif isinstance(target_date, str):
         target_date = datetime.strptime(target_date, '%Y-%m-%d')
-        
+
     # If target date is a holiday, move to next trading day
-    while is_market_holiday(target_date):
+    if is_market_holiday(target_date):
         target_date = get_next_trading_day(target_date)
-    
+
     # For secban, we need the next trading day
     secban_date = get_next_trading_day(target_date)
-    
+
     return {
         'bhavcopy': target_date,
         'volatility': target_date,
@@ -1,60 +1,534 @@
+import os
+import time
+import queue
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
 import pandas as pd
 import mysql.connector
 from mysql.connector import errorcode
 import logging
+import config
+from src.schema import apply_output_dtypes, date_strings
+
+
+class TimedCursor:
+    """Cursor wrapper that records query latency into the owning pool's metrics"""
+
+    def __init__(self, cursor, pool):
+        self._cursor = cursor
+        self._pool = pool
+
+    def execute(self, query, params=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params)
+        finally:
+            self._pool.record_query(time.perf_counter() - start)
+
+    def executemany(self, query, seq_params):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, seq_params)
+        finally:
+            self._pool.record_query(time.perf_counter() - start)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of mysql.connector connections shared by the insert path,
+    setup_database.py and read APIs.
+
+    Connections are opened lazily up to pool_size, health-checked with a ping
+    when they have been idle longer than health_check_interval, and callers
+    wait up to wait_timeout seconds when every connection is in use.
+    """
+
+    def __init__(self, db_params, pool_size=None, wait_timeout=None, health_check_interval=None):
+        self.db_params = dict(db_params)
+        self.pool_size = pool_size or config.DB_POOL_SIZE
+        self.wait_timeout = wait_timeout if wait_timeout is not None else config.DB_POOL_WAIT_TIMEOUT
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else config.DB_POOL_HEALTH_CHECK_INTERVAL)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._wait_times = deque(maxlen=1000)
+        self._query_times = deque(maxlen=1000)
+        self._queries = 0
+        self._health_check_failures = 0
+
+    def _acquire(self):
+        start = time.perf_counter()
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn, last_used = mysql.connector.connect(**self.db_params), time.monotonic()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn, last_used = self._idle.get(timeout=self.wait_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No database connection available within {self.wait_timeout}s")
+
+        with self._lock:
+            self._wait_times.append(time.perf_counter() - start)
+            self._in_use += 1
+
+        if time.monotonic() - last_used > self.health_check_interval:
+            try:
+                conn.ping(reconnect=True, attempts=2, delay=1)
+            except mysql.connector.Error as e:
+                logging.warning(f"Pooled connection failed health check: {e}")
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                with self._lock:
+                    self._health_check_failures += 1
+                    self._in_use -= 1
+                    self._created -= 1
+                return self._acquire()
+        return conn
+
+    def _release(self, conn, broken=False):
+        with self._lock:
+            self._in_use -= 1
+            if broken:
+                self._created -= 1
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        else:
+            self._idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection and return it to the pool afterwards"""
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except mysql.connector.Error:
+            broken = not conn.is_connected()
+            raise
+        finally:
+            self._release(conn, broken)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a timed cursor; commit on success, roll back on any error"""
+        with self.connection() as conn:
+            cursor = TimedCursor(conn.cursor(), self)
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                if conn.is_connected():
+                    conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def record_query(self, seconds):
+        with self._lock:
+            self._queries += 1
+            self._query_times.append(seconds)
+
+    @staticmethod
+    def _summarize(samples):
+        if not samples:
+            return {'count': 0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(samples)
+        return {
+            'count': len(ordered),
+            'p50_ms': ordered[len(ordered) // 2] * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max_ms': ordered[-1] * 1000
+        }
+
+    def metrics(self):
+        """Snapshot of pool occupancy, wait times and query latencies (recent samples)"""
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'health_check_failures': self._health_check_failures,
+                'queries': self._queries,
+                'wait': self._summarize(self._wait_times),
+                'query': self._summarize(self._query_times)
+            }
+
+    def close(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(db_params, **kwargs):
+    """
+    Return the shared pool for these connection parameters, creating it on first use.
+    Pools are per process, so workers forked from a pool owner never share sockets.
+    """
+    key = (os.getpid(), tuple(sorted((k, str(v)) for k, v in db_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_params, **kwargs)
+            _pools[key] = pool
+        return pool
+
+def pool_metrics():
+    """Metrics of every pool opened by this process, keyed by host/database"""
+    return {
+        f"{pool.db_params.get('host')}/{pool.db_params.get('database', '')}": pool.metrics()
+        for (pid, _), pool in list(_pools.items()) if pid == os.getpid()
+    }
+
+def db_rows(df):
+    """
+    Rows of df as tuples of native Python values for the driver: dates as
+    datetime.date, timestamps as datetime, categories as str, missing as None.
+    Columns are converted whole, so no per-value string formatting or parsing.
+    """
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            if (series.dt.normalize() == series).all():
+                values = list(series.dt.date)
+            else:
+                values = list(series.dt.to_pydatetime())
+        elif isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_extension_array_dtype(series):
+            values = series.astype(object).tolist()
+        else:
+            values = series.tolist()
+        if series.hasnans:
+            values = [None if pd.isna(value) else value for value in values]
+        columns.append(values)
+    return list(zip(*columns))
+
+# Unique key of fo_market_analysis; upserts never rewrite it
+KEY_COLUMNS = ('symbol', 'request_date')
+
+# Left out of row_hash: the processing time changes on every run
+UNHASHED_COLUMNS = ('processed_timestamp', 'row_hash')
+
+def update_clause(columns):
+    """ON DUPLICATE KEY UPDATE assignments for the non-key columns"""
+    return ', '.join(f'{col}=VALUES({col})' for col in columns if col not in KEY_COLUMNS)
+
+# Latest row per symbol, maintained alongside the history table it mirrors
+LATEST_TABLES = {'fo_market_analysis': 'fo_market_latest'}
+
+LATEST_COLUMNS = ('symbol', 'request_date', 'expiry_date', 'processed_timestamp', 'daily_volatility',
+                  'trade_volume', 'percentile_volume', 'percentile_volatility', 'average_percentile',
+                  'average_percentile_desc')
+
+def update_latest(cursor, df, table_name):
+    """
+    Upsert each symbol's newest row of df into table_name's latest table
+    (no-op for tables without one). A stored row is only replaced by one for
+    the same or a later request_date, so loading an older date never
+    regresses it; request_date is assigned last because MySQL applies the
+    assignments in order.
+    """
+    latest_table = LATEST_TABLES.get(table_name)
+    if latest_table is None or len(df) == 0:
+        return 0
+    newest = df.sort_values('request_date', kind='stable').drop_duplicates('symbol', keep='last')
+    columns = list(LATEST_COLUMNS)
+    assignments = [f'{col}=IF(VALUES(request_date) >= request_date, VALUES({col}), {col})'
+                   for col in columns if col not in KEY_COLUMNS]
+    assignments.append('request_date=GREATEST(request_date, VALUES(request_date))')
+    cursor.executemany(f"""INSERT INTO {latest_table} ({', '.join(columns)})
+               VALUES ({', '.join(['%s'] * len(columns))})
+               ON DUPLICATE KEY UPDATE
+               {', '.join(assignments)}""", db_rows(newest[columns]))
+    return len(newest)
+
+def rebuild_latest(cursor, table_name='fo_market_analysis', symbols=None):
+    """
+    Recompute table_name's latest table from the full history, for every
+    symbol or only for symbols. Used after deletes and for backfills loaded
+    outside the pipeline. Returns the number of rows written.
+    """
+    latest_table = LATEST_TABLES[table_name]
+    column_list = ', '.join(LATEST_COLUMNS)
+    where, params = '', []
+    if symbols is not None:
+        symbols = sorted(set(symbols))
+        if not symbols:
+            return 0
+        where = f"WHERE symbol IN ({', '.join(['%s'] * len(symbols))})"
+        params = symbols
+
+    cursor.execute(f"DELETE FROM {latest_table} {where}", params)
+    # The GROUP BY is a loose index scan of uk_symbol_request_date
+    cursor.execute(f"""INSERT INTO {latest_table} ({column_list})
+               SELECT {', '.join('h.' + col for col in LATEST_COLUMNS)}
+               FROM {table_name} h
+               JOIN (SELECT symbol, MAX(request_date) AS request_date
+                     FROM {table_name} {where} GROUP BY symbol) m
+                 ON h.symbol = m.symbol AND h.request_date = m.request_date""", params)
+    return cursor.rowcount
+
+def rebuild_latest_table(db_params, table_name='fo_market_analysis'):
+    """Rebuild the whole latest table in one transaction (python src/setup_database.py --rebuild-latest)"""
+    start = time.perf_counter()
+    with get_pool(db_params).transaction() as cursor:
+        rows = rebuild_latest(cursor, table_name)
+    logging.info(f"Rebuilt {LATEST_TABLES[table_name]} with {rows} symbols in {time.perf_counter() - start:.2f}s")
+    return rows
+
+def row_hashes(df):
+    """
+    64-bit hash of each row of a DB-shaped frame over every column except
+    UNHASHED_COLUMNS. Values are normalized to what the table stores (dates
+    as days, numbers at 4 decimals whether they arrive as int or float, labels
+    as text), so reprocessing an unchanged row yields the same hash whatever
+    dtypes the frame carried.
+    """
+    normalized = {}
+    for name in df.columns:
+        if name in UNHASHED_COLUMNS:
+            continue
+        series = df[name]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            normalized[name] = series.astype('datetime64[s]').astype('int64')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            normalized[name] = series.astype('float64').round(4)
+        else:
+            normalized[name] = series.astype(str).astype(object)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized, index=df.index), index=False)
+
+def upsert_rows(cursor, df, table_name):
+    """Row-by-row INSERT ... ON DUPLICATE KEY UPDATE through executemany"""
+    values = db_rows(df)
+    columns = list(df.columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    query = f"""INSERT INTO {table_name} ({', '.join(columns)}) 
+               VALUES ({placeholders})
+               ON DUPLICATE KEY UPDATE
+               {update_clause(columns)}"""
+
+    logging.info(f"Executing query with {len(values)} rows")
+    logging.info(f"Sample value: {values[0] if values else None}")
+
+    cursor.executemany(query, values)
+    logging.info(f"Successfully inserted/updated {cursor.rowcount} rows")
+    return cursor.rowcount
 
 def insert_to_db(df, table_name, db_params):
     """
-    Insert DataFrame to MySQL database using mysql.connector
+    Insert DataFrame to MySQL database using a pooled mysql.connector connection
+    (and table_name's latest table, in the same transaction)
     
     Args:
         df (pandas.DataFrame): DataFrame to insert
         table_name (str): Name of the table to insert into
         db_params (dict): Database connection parameters
     """
-    conn = None
-    cursor = None
     try:
-        # Connect to database
-        logging.info(f"Connecting to database {db_params['database']}")
-        conn = mysql.connector.connect(**db_params)
-        cursor = conn.cursor()
-        
-        # Convert DataFrame to list of tuples
-        values = [tuple(x) for x in df.values]
-        
-        # Create the INSERT query
-        columns = list(df.columns)
-        placeholders = ", ".join(["%s"] * len(columns))
-        query = f"""INSERT INTO {table_name} ({', '.join(columns)}) 
-                   VALUES ({placeholders})
-                   ON DUPLICATE KEY UPDATE
-                   {', '.join(f'{col}=VALUES({col})' for col in columns)}"""
-        
-        logging.info(f"Executing query with {len(values)} rows")
-        logging.info(f"Sample value: {values[0] if values else None}")
-        
-        cursor.executemany(query, values)
-        conn.commit()
-        logging.info(f"Successfully inserted/updated {cursor.rowcount} rows")
+        logging.info(f"Using pooled connection to database {db_params['database']}")
+        with get_pool(db_params).transaction() as cursor:
+            upsert_rows(cursor, df, table_name)
+            update_latest(cursor, df, table_name)
         
     except mysql.connector.Error as e:
         logging.error(f"MySQL Error: {e}")
-        if 'values' in locals():
-            logging.error(f"Sample value: {values[0] if values else None}")
         raise
+
+def stage_batches(cursor, stage_table, columns, values, batch_size):
+    """Send rows to the staging table as multi-row INSERT ... VALUES batches"""
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    for start in range(0, len(values), batch_size):
+        batch = values[start:start + batch_size]
+        query = (f"INSERT INTO {stage_table} ({', '.join(columns)}) VALUES "
+                 + ", ".join([row_placeholder] * len(batch)))
+        cursor.execute(query, [value for row in batch for value in row])
+
+def stage_load_data(cursor, stage_table, df):
+    """Send rows to the staging table through a temporary file and LOAD DATA LOCAL INFILE"""
+    columns = list(df.columns)
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, newline='') as tmp:
+        df.to_csv(tmp, sep='\t', header=False, index=False, na_rep='\\N', lineterminator='\n')
+        tmp_path = tmp.name
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {stage_table} "
+            f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+            (tmp_path,)
+        )
     finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        os.remove(tmp_path)
+
+def stage_and_merge(cursor, df, table_name, method='batch', batch_size=None):
+    """
+    Load df into a temporary staging table, then merge it into table_name with
+    a single INSERT ... SELECT ... ON DUPLICATE KEY UPDATE. Returns affected rows.
+    """
+    batch_size = batch_size or config.DB_BATCH_SIZE
+    stage_table = f"{table_name}_stage"
+    columns = list(df.columns)
+    column_list = ', '.join(columns)
+
+    # Staging table copies the column types but none of the indexes or partitions
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage_table}")
+    cursor.execute(f"CREATE TEMPORARY TABLE {stage_table} AS "
+                   f"SELECT {column_list} FROM {table_name} LIMIT 0")
+
+    if method == 'load_data':
+        stage_load_data(cursor, stage_table, df)
+    else:
+        stage_batches(cursor, stage_table, columns, db_rows(df), batch_size)
+
+    cursor.execute(f"""INSERT INTO {table_name} ({column_list})
+               SELECT {column_list} FROM {stage_table}
+               ON DUPLICATE KEY UPDATE
+               {update_clause(columns)}""")
+    merged = cursor.rowcount
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {stage_table}")
+    return merged
+
+def bulk_params(db_params, method):
+    # LOAD DATA LOCAL INFILE has to be enabled on the client connection
+    return dict(db_params, allow_local_infile=True) if method == 'load_data' else db_params
+
+def bulk_insert_to_db(df, table_name, db_params, method='batch', batch_size=None):
+    """
+    Bulk-load a DataFrame through a temporary staging table, then merge it into
+    table_name with a single INSERT ... SELECT ... ON DUPLICATE KEY UPDATE.
+
+    Args:
+        df (pandas.DataFrame): DataFrame to insert
+        table_name (str): Name of the table to insert into
+        db_params (dict): Database connection parameters
+        method (str): 'batch' for multi-row VALUES batches, 'load_data' for LOAD DATA LOCAL INFILE
+        batch_size (int): Rows per VALUES batch (default config.DB_BATCH_SIZE)
+
+    Returns:
+        float: Rows per second achieved for stage + merge
+    """
+    if method not in ('batch', 'load_data'):
+        raise ValueError(f"Unknown bulk insert method: {method}")
 
-def insert_fo_data(df, db_params):
-    """Insert data into the fo_market_analysis table"""
     try:
-        # Create a copy of the dataframe
-        insert_df = df.copy()
-        
+        logging.info(f"Using pooled connection to database {db_params['database']} for bulk load ({method})")
+        start = time.perf_counter()
+        with get_pool(bulk_params(db_params, method)).transaction() as cursor:
+            merged = stage_and_merge(cursor, df, table_name, method, batch_size)
+            update_latest(cursor, df, table_name)
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = len(df) / elapsed if elapsed else 0.0
+        logging.info(f"Bulk loaded {len(df)} rows into {table_name} in {elapsed:.2f}s "
+                     f"({rows_per_second:.0f} rows/s, {merged} affected)")
+        return rows_per_second
+
+    except mysql.connector.Error as e:
+        logging.error(f"MySQL Error during bulk load: {e}")
+        raise
+
+def stored_hashes(cursor, table_name, request_dates):
+    """{(symbol, 'YYYY-MM-DD'): row_hash} of the rows already stored for request_dates"""
+    placeholders = ", ".join(["%s"] * len(request_dates))
+    cursor.execute(f"SELECT symbol, request_date, row_hash FROM {table_name} "
+                   f"WHERE request_date IN ({placeholders})", list(request_dates))
+    # The driver returns DATE as datetime.date, whose str() is already 'YYYY-MM-DD'
+    return {(symbol, str(request_date)[:10]): row_hash for symbol, request_date, row_hash in cursor.fetchall()}
+
+def delta_upsert(df, table_name, db_params, method='executemany', batch_size=None):
+    """
+    Write only the rows of df that are new or whose row_hash differs from the
+    stored one, and delete stored rows of the same request dates that df no
+    longer contains (e.g. symbols banned since the last run). df must hold
+    every row of each request date it covers. One transaction, which also
+    updates table_name's latest table; unchanged rows and their index entries
+    are not touched.
+
+    Returns:
+        dict: Counts of 'inserted', 'updated', 'unchanged' and 'deleted' rows
+    """
+    if method not in ('executemany', 'batch', 'load_data'):
+        raise ValueError(f"Unknown insert method: {method}")
+    keys = list(zip(df['symbol'].astype(str), date_strings(df['request_date'])))
+    request_dates = sorted(set(pd.to_datetime(df['request_date']).dt.date))
+
+    try:
+        with get_pool(bulk_params(db_params, method)).transaction() as cursor:
+            stored = stored_hashes(cursor, table_name, request_dates)
+            changed = [stored.get(key) != row_hash for key, row_hash in zip(keys, df['row_hash'].tolist())]
+            changes = df[changed]
+            deleted = sorted(set(stored) - set(keys))
+            counts = {
+                'inserted': sum(1 for key, is_changed in zip(keys, changed) if is_changed and key not in stored),
+                'updated': sum(1 for key, is_changed in zip(keys, changed) if is_changed and key in stored),
+                'unchanged': len(df) - len(changes),
+                'deleted': len(deleted)
+            }
+
+            if len(changes):
+                if method == 'executemany':
+                    upsert_rows(cursor, changes, table_name)
+                else:
+                    stage_and_merge(cursor, changes, table_name, method, batch_size)
+                update_latest(cursor, changes, table_name)
+            if deleted:
+                cursor.executemany(f"DELETE FROM {table_name} WHERE symbol = %s AND request_date = %s", deleted)
+                if table_name in LATEST_TABLES:
+                    # A deleted row may have been a symbol's latest; fall back to its previous date
+                    rebuild_latest(cursor, table_name, [symbol for symbol, _ in deleted])
+
+        logging.info(f"Delta upsert into {table_name}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                     f"{counts['unchanged']} unchanged, {counts['deleted']} deleted")
+        return counts
+
+    except mysql.connector.Error as e:
+        logging.error(f"MySQL Error during delta upsert: {e}")
+        raise
+
+def insert_fo_data(df, db_params, method=None, delta=None):
+    """
+    Insert data into the fo_market_analysis table.
+    method is 'executemany' (row upsert), 'batch' or 'load_data' (staged bulk load);
+    defaults to config.DB_INSERT_METHOD. With delta (default config.DB_DELTA_UPSERT)
+    only new or changed rows are written and symbols missing from df's dates are
+    deleted, so df must hold complete request dates.
+    """
+    method = method or config.DB_INSERT_METHOD
+    delta = config.DB_DELTA_UPSERT if delta is None else delta
+    try:
         # Rename columns to match database schema
         column_mapping = {
             'Symbol': 'symbol',
@@ -69,30 +543,24 @@ def insert_fo_data(df, db_params):
             'Average_Percentile_Desc': 'average_percentile_desc'
         }
         
+        # Enforce the output schema (a no-op for frames built by the pipeline) so
+        # dates, timestamps and compact ints reach the driver as native values
+        insert_df = apply_output_dtypes(df[list(column_mapping)])
+
         # Rename columns
         insert_df = insert_df.rename(columns=column_mapping)
-        
-        # Convert date columns to proper format
-        insert_df['request_date'] = pd.to_datetime(insert_df['request_date']).dt.strftime('%Y-%m-%d')
-        insert_df['expiry_date'] = pd.to_datetime(insert_df['expiry_date']).dt.strftime('%Y-%m-%d')
-        insert_df['processed_timestamp'] = pd.to_datetime(insert_df['processed_timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Ensure numeric columns are of correct type
-        insert_df['daily_volatility'] = insert_df['daily_volatility'].astype(float)
-        insert_df['trade_volume'] = insert_df['trade_volume'].astype(int)
-        insert_df['percentile_volume'] = insert_df['percentile_volume'].astype(int)
-        insert_df['percentile_volatility'] = insert_df['percentile_volatility'].astype(int)
-        insert_df['average_percentile'] = insert_df['average_percentile'].astype(float)
-        
-        # Select only the columns we want to insert
-        columns_to_insert = list(column_mapping.values())
-        insert_df = insert_df[columns_to_insert]
+        insert_df['row_hash'] = row_hashes(insert_df)
         
         logging.info(f"Preparing to insert {len(insert_df)} rows into database")
         logging.info(f"Columns: {list(insert_df.columns)}")
         
         # Insert into database
-        insert_to_db(insert_df, 'fo_market_analysis', db_params)
+        if delta:
+            delta_upsert(insert_df, 'fo_market_analysis', db_params, method=method)
+        elif method == 'executemany':
+            insert_to_db(insert_df, 'fo_market_analysis', db_params)
+        else:
+            bulk_insert_to_db(insert_df, 'fo_market_analysis', db_params, method=method)
         
     except Exception as e:
         logging.error(f"Error inserting data into database: {e}")
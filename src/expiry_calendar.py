@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+
+from src.date_utils import get_calendar, to_datetime, to_day
+
+
+def get_last_thursday(year, month):
+    """Get the last Thursday of the given month"""
+    # Get last day of the month
+    if month == 12:
+        next_month = datetime(year + 1, 1, 1)
+    else:
+        next_month = datetime(year, month + 1, 1)
+
+    last_day = next_month - timedelta(days=1)
+
+    # Step back to the last Thursday (3 = Thursday)
+    return last_day - timedelta(days=(last_day.weekday() - 3) % 7)
+
+
+@lru_cache(maxsize=None)
+def get_monthly_expiry(year, month):
+    """
+    Monthly F&O expiry: the last Thursday of the month, moved back to the
+    previous trading day when that Thursday is a market holiday.
+    """
+    return to_datetime(get_calendar().on_or_before(to_day(get_last_thursday(year, month))))
+
+
+def get_next_expiry(today=None):
+    """Get the monthly expiry on or after the given date"""
+    if today is None:
+        today = datetime.today()
+
+    expiry = get_monthly_expiry(today.year, today.month)
+    if today.date() > expiry.date():
+        # Move to next month
+        if today.month == 12:
+            return get_monthly_expiry(today.year + 1, 1)
+        return get_monthly_expiry(today.year, today.month + 1)
+    return expiry
+
+
+def monthly_expiry_dates(dates):
+    """
+    Vectorized lookup of the monthly expiry for each date in a datetime Series.
+    Each distinct (year, month) is resolved once and mapped back onto the frame.
+    """
+    dates = pd.to_datetime(dates)
+    month_keys = dates.dt.year * 12 + dates.dt.month - 1
+    expiry_table = pd.Series({
+        key: get_monthly_expiry(int(key) // 12, int(key) % 12 + 1)
+        for key in month_keys.dropna().unique()
+    }, dtype='datetime64[ns]')
+    return month_keys.map(expiry_table)
@@ -0,0 +1,90 @@
+import os
+import uuid
+import logging
+
+import pyarrow as pa
+
+import config
+
+# Frames kept per request date: the transform_data outputs and the joined result
+FRAME_NAMES = ('bhavcopy', 'volatility', 'secban', 'final')
+
+
+def frame_path(request_date, name, root=None):
+    """<INTERMEDIATE_PATH>/<YYYY-MM-DD>/<name>.arrow"""
+    root = root or config.INTERMEDIATE_PATH
+    return os.path.join(root, request_date, f"{name}.arrow")
+
+
+def write_frame(df, request_date, name, root=None):
+    """
+    Atomically store a DataFrame (or Arrow table) as an uncompressed Arrow IPC
+    file (Feather v2). Uncompressed buffers can be memory-mapped by the
+    loaders without a decode step.
+    """
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    path = frame_path(request_date, name, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def _map_table(path):
+    # Record batches reference the mapped pages directly; nothing is copied or parsed
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_frame(request_date, name, root=None, as_pandas=False):
+    """
+    Memory-map one stored frame as an Arrow table (as_pandas converts it, which
+    copies), or return None if it was never written
+    """
+    path = frame_path(request_date, name, root)
+    if not os.path.exists(path):
+        return None
+    table = _map_table(path)
+    return table.to_pandas(split_blocks=True) if as_pandas else table
+
+
+def available_dates(name, start=None, end=None, root=None):
+    """Request dates ('YYYY-MM-DD', sorted) that have a stored frame called name"""
+    root = root or config.INTERMEDIATE_PATH
+    if not os.path.isdir(root):
+        return []
+    dates = []
+    for request_date in sorted(os.listdir(root)):
+        if start and request_date < str(start)[:10]:
+            continue
+        if end and request_date > str(end)[:10]:
+            continue
+        if os.path.exists(frame_path(request_date, name, root)):
+            dates.append(request_date)
+    return dates
+
+
+def read_range(name, start=None, end=None, root=None, as_pandas=False):
+    """
+    Memory-map the stored frame for every request date in [start, end] and
+    concatenate them (zero-copy) with a Request_Date column added where the
+    frame does not carry one. Returns an Arrow table unless as_pandas is set.
+    """
+    tables = []
+    for request_date in available_dates(name, start, end, root):
+        table = _map_table(frame_path(request_date, name, root))
+        if 'Request_Date' not in table.column_names:
+            table = table.append_column('Request_Date', pa.array([request_date] * table.num_rows, pa.string()))
+        tables.append(table)
+
+    if not tables:
+        logging.info(f"Frame store: no {name} frames between {start} and {end}")
+        return None
+    table = pa.concat_tables(tables, promote_options='permissive')
+    return table.to_pandas(split_blocks=True) if as_pandas else table
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import uuid
+import logging
+import resource
+import platform
+import cProfile
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+_RSS_TO_BYTES = 1 if platform.system() == 'Darwin' else 1024
+
+
+def peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_TO_BYTES
+
+
+class StageSpan:
+    """Timing, memory and row counts for one pipeline stage"""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_bytes = None
+        self.tracemalloc_peak_bytes = None
+        self.status = 'ok'
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+
+    def to_dict(self, run):
+        return {
+            'run_id': run['run_id'],
+            'request_date': run['request_date'],
+            'stage': self.name,
+            'status': self.status,
+            'started_at': self.started_at,
+            'wall_seconds': round(self.wall_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'tracemalloc_peak_bytes': self.tracemalloc_peak_bytes,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out
+        }
+
+
+# The active run of the current thread or task; the daemon processes days in
+# executor threads, each started in its own copy of the context
+_run = contextvars.ContextVar('instrumentation_run', default=None)
+
+
+def start_run(request_date):
+    """Begin collecting spans for one pipeline run"""
+    run = {
+        'run_id': uuid.uuid4().hex[:12],
+        'request_date': request_date,
+        'spans': []
+    }
+    _run.set(run)
+    return run['run_id']
+
+
+def _profile_enabled(option, name):
+    """option is a tuple of stage names (as _env parses FO_PROFILE_STAGES=all) or a single name"""
+    if isinstance(option, str):
+        option = (option,)
+    option = option or ()
+    return 'all' in option or name in option
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Record wall time, CPU time, peak RSS and row counts for a block of work.
+    Set span.rows_out inside the block. Spans are kept only while a run is active;
+    stages listed in config.PROFILE_STAGES / config.TRACEMALLOC_STAGES (or 'all')
+    also dump a cProfile file or record the tracemalloc peak.
+    """
+    span = StageSpan(name, rows_in)
+    run = _run.get()
+    profiler = None
+    if run is not None and _profile_enabled(config.PROFILE_STAGES, name):
+        profiler = cProfile.Profile()
+    trace = _profile_enabled(config.TRACEMALLOC_STAGES, name) and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield span
+    except Exception:
+        span.status = 'error'
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        span.wall_seconds = time.perf_counter() - wall_start
+        span.cpu_seconds = time.process_time() - cpu_start
+        span.peak_rss_bytes = peak_rss_bytes()
+        if trace:
+            span.tracemalloc_peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        if run is not None:
+            run['spans'].append(span)
+            if profiler:
+                profile_dir = os.path.join(config.METRICS_PATH, 'profiles')
+                os.makedirs(profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(profile_dir, f"{run['run_id']}_{name}.prof"))
+        logging.info(f"Stage {name}: {span.wall_seconds:.3f}s wall, {span.cpu_seconds:.3f}s cpu, "
+                     f"rows {span.rows_in} -> {span.rows_out}")
+
+
+def export_jsonl(records, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def export_prometheus(records, path):
+    """Write the latest run as a node_exporter textfile (replaced atomically)"""
+    metrics = [
+        ('fo_stage_wall_seconds', 'wall_seconds', 'Wall-clock seconds spent in a pipeline stage'),
+        ('fo_stage_cpu_seconds', 'cpu_seconds', 'CPU seconds spent in a pipeline stage'),
+        ('fo_stage_peak_rss_bytes', 'peak_rss_bytes', 'Process peak RSS at the end of a stage'),
+        ('fo_stage_rows_in', 'rows_in', 'Rows entering a pipeline stage'),
+        ('fo_stage_rows_out', 'rows_out', 'Rows leaving a pipeline stage'),
+    ]
+    lines = []
+    for metric, field, help_text in metrics:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for record in records:
+            if record[field] is not None:
+                lines.append(f'{metric}{{stage="{record["stage"]}",status="{record["status"]}"}} {record[field]}')
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+def finish_run():
+    """Export the spans of the active run in the configured formats and end it"""
+    run = _run.get()
+    if run is None:
+        return []
+    records = [span.to_dict(run) for span in run['spans']]
+    formats = config.METRICS_FORMATS
+    if 'jsonl' in formats:
+        export_jsonl(records, os.path.join(config.METRICS_PATH, 'stages.jsonl'))
+    if 'prometheus' in formats:
+        export_prometheus(records, os.path.join(config.METRICS_PATH, 'fo_pipeline.prom'))
+    _run.set(None)
+    return records
@@ -0,0 +1,145 @@
+import os
+import csv
+import uuid
+import logging
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+import config
+from src.instrumentation import stage
+from src.schema import plain_columns, to_arrow
+
+CSV_NAME = "filtered_data_with_percentiles.csv"
+
+
+def csv_path_for(year_month, root=None):
+    return os.path.join(root or config.OUTPUT_PATH, year_month, CSV_NAME)
+
+
+def sorted_table(table):
+    return table.sort_by([('Request_Date', 'ascending'), ('Symbol', 'ascending')])
+
+
+def _write_csv_atomic(table, path):
+    tmp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+    try:
+        pacsv.write_csv(table, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _align(existing, table):
+    """Cast columns of a CSV read back from disk to the types of the incoming table"""
+    columns = []
+    for name in existing.column_names:
+        column = existing.column(name)
+        if name in table.column_names and column.type != table.schema.field(name).type:
+            try:
+                column = pc.cast(column, table.schema.field(name).type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+        columns.append(column)
+    return pa.table(columns, names=existing.column_names)
+
+
+def _header_and_last_row(path):
+    """First and last CSV rows of a file, reading only its two ends"""
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8-sig').rstrip('\r\n')]), None)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 64 * 1024))
+        tail = f.read().decode('utf-8', errors='replace').rstrip('\r\n').rsplit('\n', 1)[-1]
+    last_row = next(csv.reader([tail]), None)
+    return header, last_row
+
+
+def write_parquet(final_data, year_month):
+    """One fragment per request date in the partitioned dataset; no month rewrite"""
+    from src.dataset_writer import write_fragments
+    write_fragments(final_data)
+    return len(final_data)
+
+
+def append_csv(final_data, year_month):
+    """
+    Keep Output/YYYYMM/filtered_data_with_percentiles.csv with the pyarrow CSV
+    writer. Dates newer than the last row in the file are streamed onto the
+    end; re-runs of dates already in the file (or a changed column set) rewrite
+    the month once from Arrow instead of round-tripping through pandas.
+    """
+    table = sorted_table(plain_columns(to_arrow(final_data)))
+    path = csv_path_for(year_month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        _write_csv_atomic(table, path)
+        return table.num_rows
+
+    header, last_row = _header_and_last_row(path)
+    new_dates = pc.cast(table.column('Request_Date'), pa.string())
+    if header == table.column_names and last_row and len(last_row) == len(header) \
+            and pc.min(new_dates).as_py() > last_row[header.index('Request_Date')]:
+        with open(path, 'ab') as f:
+            pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(include_header=False))
+        return table.num_rows
+
+    existing = _align(pacsv.read_csv(path), table)
+    keep = pc.invert(pc.is_in(pc.cast(existing.column('Request_Date'), pa.string()),
+                              value_set=pc.unique(new_dates)))
+    combined = sorted_table(pa.concat_tables([existing.filter(keep), table], promote_options='permissive'))
+    _write_csv_atomic(combined, path)
+    logging.info(f"CSV month {year_month} rewritten with {combined.num_rows} rows")
+    return combined.num_rows
+
+
+# Output sinks by name: func(final_data, year_month) -> rows written
+SINKS = {
+    'parquet': write_parquet,
+    'csv': append_csv,
+}
+
+
+def register_sink(name, func):
+    """Add an output sink that write_outputs can select through config.OUTPUT_SINKS"""
+    SINKS[name] = func
+
+
+def write_outputs(final_data, year_month, sinks=None):
+    """Write final_data with each configured sink (config.OUTPUT_SINKS by default)"""
+    sinks = config.OUTPUT_SINKS if sinks is None else sinks
+    unknown = [name for name in sinks if name not in SINKS]
+    if unknown:
+        raise ValueError(f"Unknown output sinks: {unknown} (available: {sorted(SINKS)})")
+
+    for name in sinks:
+        with stage(f'{name}_write', rows_in=len(final_data)) as span:
+            span.rows_out = SINKS[name](final_data, year_month)
+        logging.info(f"Output sink {name}: {len(final_data)} rows for {year_month}")
+
+
+def export_csv(year_month, path=None):
+    """
+    Export one month of the Parquet dataset to CSV on demand (for Parquet-only
+    runs). Defaults to Output/YYYYMM/filtered_data_with_percentiles.csv.
+    """
+    import pyarrow.dataset as ds
+    from src.dataset_writer import PARTITION_SCHEMA, open_dataset
+
+    year, month = int(year_month[:4]), int(year_month[4:6])
+    dataset = open_dataset()
+    columns = [name for name in dataset.schema.names if name not in PARTITION_SCHEMA.names]
+    table = dataset.to_table(columns=columns, filter=(ds.field('year') == year) & (ds.field('month') == month))
+    if table.num_rows == 0:
+        logging.warning(f"No Parquet rows to export for {year_month}")
+        return None
+
+    path = path or csv_path_for(year_month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_csv_atomic(sorted_table(plain_columns(table)), path)
+    logging.info(f"Exported {table.num_rows} rows for {year_month} to {path}")
+    return path
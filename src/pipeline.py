@@ -0,0 +1,251 @@
+import sqlite3
+import logging
+from datetime import datetime
+
+import config
+from src.frame_store import read_frame, write_frame
+from src.instrumentation import stage
+
+# Per-date stages, in order. 'db' is only required while config.DB_ENABLED is set.
+STAGES = ('downloaded', 'transformed', 'joined', 'parquet', 'db')
+TRANSFORMED_FRAMES = ('bhavcopy', 'volatility', 'secban')
+# Not a required stage: 'waiting' while a date's outputs were built without the
+# ban list and the daemon is still polling for it, 'done' once it was applied
+SECBAN_MARKER = 'secban'
+JOINED_FRAME = 'final'
+
+
+def required_stages():
+    return [name for name in STAGES if name != 'db' or config.DB_ENABLED]
+
+
+class StageManifest:
+    """
+    SQLite record of which pipeline stages finished for each request date.
+
+    One row per (request_date, stage) with its status ('done' or 'failed'),
+    attempt count, row count and last error, so re-runs skip finished
+    stages and retry only the failed ones.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.PIPELINE_MANIFEST_PATH
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_runs (
+                request_date TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                row_count INTEGER,
+                error TEXT,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (request_date, stage)
+            )
+        """)
+        self.conn.commit()
+
+    def status(self, request_date):
+        """{stage: status} for one request date"""
+        cursor = self.conn.execute(
+            "SELECT stage, status FROM stage_runs WHERE request_date = ?", (request_date,))
+        return dict(cursor.fetchall())
+
+    def is_done(self, request_date, stage_name):
+        return self.status(request_date).get(stage_name) == 'done'
+
+    def pending(self, request_date):
+        """Required stages that have not finished for request_date, in order"""
+        status = self.status(request_date)
+        return [name for name in required_stages() if status.get(name) != 'done']
+
+    def mark(self, request_date, stage_name, status, row_count=None, error=None):
+        self.conn.execute("""
+            INSERT INTO stage_runs (request_date, stage, status, attempts, row_count, error, updated_at)
+            VALUES (?, ?, ?, 1, ?, ?, ?)
+            ON CONFLICT (request_date, stage) DO UPDATE SET
+                status = excluded.status,
+                attempts = stage_runs.attempts + 1,
+                row_count = excluded.row_count,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+        """, (request_date, stage_name, status, row_count, error,
+              datetime.now().isoformat(timespec='seconds')))
+        self.conn.commit()
+
+    def mark_done(self, request_date, stage_name, row_count=None):
+        self.mark(request_date, stage_name, 'done', row_count)
+
+    def mark_failed(self, request_date, stage_name, error):
+        logging.error(f"Pipeline: stage {stage_name} failed for {request_date}: {error}")
+        self.mark(request_date, stage_name, 'failed', error=str(error))
+
+    def reset(self, request_date, stages=None):
+        """Forget stage results for request_date (all stages by default) so they run again"""
+        stages = stages or STAGES + (SECBAN_MARKER,)
+        self.conn.executemany("DELETE FROM stage_runs WHERE request_date = ? AND stage = ?",
+                              [(request_date, name) for name in stages])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def save_transformed(request_date, frames, root=None):
+    """Store the filtered bhavcopy/volatility/secban frames (None entries are skipped)"""
+    for name in TRANSFORMED_FRAMES:
+        if frames.get(name) is not None:
+            write_frame(frames[name], request_date, name, root)
+
+
+def load_transformed(request_date, root=None):
+    """
+    The stored transformed frames, as memory-mapped Arrow tables for the arrow
+    compute engine and as DataFrames for the pandas one
+    """
+    as_pandas = config.COMPUTE_ENGINE != 'arrow'
+    return {name: read_frame(request_date, name, root, as_pandas) for name in TRANSFORMED_FRAMES}
+
+
+def run_analytics(bhavcopy, request_date):
+    """Write the config.ANALYTICS_SPECS outputs for one parsed bhavcopy (errors are logged)"""
+    from src.analytics_spec import write_analytics
+
+    if bhavcopy is None or not config.ANALYTICS_SPECS:
+        return None
+    try:
+        with stage('analytics', rows_in=len(bhavcopy)) as span:
+            outputs = write_analytics(bhavcopy, request_date)
+            span.rows_out = sum(len(output) for output in outputs.values())
+        return outputs
+    except Exception as e:
+        logging.error(f"Error evaluating analytics specs for {request_date}: {e}")
+        return None
+
+
+def transform_raw_files(target_date, raw_files):
+    """Decode and filter one date's raw files; returns {name: filtered frame or None}"""
+    import combine_code
+
+    with stage('decode') as span:
+        downloaded_data = combine_code.download_files(target_date, raw_files=raw_files)
+        span.rows_out = sum(combine_code.rows(df) for df in downloaded_data.values())
+
+    # Every analytics spec is evaluated on the same parsed rows; no second scan
+    run_analytics(downloaded_data.get('bhavcopy'), target_date.strftime('%Y-%m-%d'))
+
+    frames = {}
+    for name, label in zip(TRANSFORMED_FRAMES, ('Bhavcopy', 'Volatility', 'Secban')):
+        data = downloaded_data.get(name)
+        with stage(f'transform_{name}', rows_in=combine_code.rows(data)) as span:
+            frames[name] = combine_code.transform_data(data, label) if data is not None else None
+            span.rows_out = combine_code.rows(frames[name])
+    return frames
+
+
+def write_outputs(manifest, final_data, year_month, db_method=None):
+    """
+    Run the pending 'parquet' (CSV + Parquet files) and 'db' stages for every
+    request date in final_data, recording each outcome in the manifest.
+    """
+    import combine_code
+    from src.schema import date_strings
+
+    request_dates = date_strings(final_data['Request_Date'])
+    date_rows = request_dates.value_counts()
+    for stage_name in [name for name in required_stages() if name in ('parquet', 'db')]:
+        dates = [d for d in sorted(date_rows.index) if not manifest.is_done(d, stage_name)]
+        if not dates:
+            continue
+        data = final_data[request_dates.isin(dates)]
+        try:
+            if stage_name == 'parquet':
+                combine_code.write_file_outputs(data, year_month)
+            else:
+                combine_code.load_to_db(data, db_method)
+        except Exception as e:
+            for request_date in dates:
+                manifest.mark_failed(request_date, stage_name, e)
+            continue
+        for request_date in dates:
+            manifest.mark_done(request_date, stage_name, int(date_rows[request_date]))
+
+
+def run_date(target_date, manifest=None, force=False, db_method=None):
+    """
+    Run the pipeline for one date, skipping stages the manifest records as
+    done and resuming from the stored Arrow IPC intermediates.
+    Returns the final frame, or None if a required stage failed.
+    """
+    import combine_code
+    from src.async_downloader import fetch_raw_files
+    from src.rolling_percentiles import add_rolling_percentiles
+
+    if manifest is None:
+        # A manifest opened here is closed here (the daemon calls this once per day)
+        manifest = StageManifest()
+        try:
+            return run_date(target_date, manifest, force, db_method)
+        finally:
+            manifest.close()
+
+    date_str = target_date.strftime('%Y-%m-%d')
+    if force:
+        manifest.reset(date_str)
+
+    pending = manifest.pending(date_str)
+    if not pending:
+        logging.info(f"Pipeline: all stages already done for {date_str}, skipping")
+        return read_frame(date_str, JOINED_FRAME, as_pandas=True)
+    logging.info(f"Pipeline: pending stages for {date_str}: {', '.join(pending)}")
+
+    final_data = None
+    if 'joined' not in pending:
+        final_data = read_frame(date_str, JOINED_FRAME, as_pandas=True)
+        if final_data is None:
+            # Intermediate was removed; rebuild it from the transformed frames
+            manifest.reset(date_str, ['joined'])
+
+    if final_data is None:
+        frames = None
+        if 'transformed' not in manifest.pending(date_str):
+            frames = load_transformed(date_str)
+            if frames['bhavcopy'] is None or frames['volatility'] is None:
+                manifest.reset(date_str, ['transformed'])
+                frames = None
+
+        if frames is None:
+            with stage('download') as span:
+                # Files fetched by an earlier run are served from the raw cache
+                raw_files = fetch_raw_files([target_date])[date_str]
+                span.rows_out = sum(1 for content in raw_files.values() if content is not None)
+            if raw_files.get('bhavcopy') is None or raw_files.get('volatility') is None:
+                manifest.mark_failed(date_str, 'downloaded', 'bhavcopy or volatility file missing')
+                return None
+            manifest.mark_done(date_str, 'downloaded', span.rows_out)
+
+            frames = transform_raw_files(target_date, raw_files)
+            if frames['bhavcopy'] is None or frames['volatility'] is None:
+                manifest.mark_failed(date_str, 'transformed', 'bhavcopy or volatility transform failed')
+                return None
+            save_transformed(date_str, frames)
+            manifest.mark_done(date_str, 'transformed', sum(combine_code.rows(df) for df in frames.values()))
+
+        with stage('join', rows_in=combine_code.rows(frames['bhavcopy'])) as span:
+            try:
+                final_data = combine_code.build_final_data(frames['bhavcopy'], frames['volatility'],
+                                                           frames['secban'], target_date)
+                if final_data is not None:
+                    final_data = add_rolling_percentiles(final_data)
+            except Exception as e:
+                final_data = None
+                logging.error(f"Error occurred while joining data: {e}")
+            span.rows_out = combine_code.rows(final_data)
+        if final_data is None:
+            manifest.mark_failed(date_str, 'joined', 'join produced no data')
+            return None
+        write_frame(final_data, date_str, JOINED_FRAME)
+        manifest.mark_done(date_str, 'joined', len(final_data))
+
+    write_outputs(manifest, final_data, target_date.strftime('%Y%m'), db_method)
+    return final_data
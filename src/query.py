@@ -0,0 +1,196 @@
+import os
+import time
+import logging
+from bisect import bisect_left, bisect_right
+
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import config
+from src.dataset_writer import FRAGMENT_NAME, PARTITION_SCHEMA, partitioning
+
+
+class FragmentScanner:
+    """
+    Finds the date fragments under root, listing a directory again only when
+    its mtime changed: adding or removing a date touches its month directory,
+    and replacing a fragment (os.replace) touches its date directory. A
+    refresh of an unchanged dataset is one stat per directory, no listings.
+    """
+
+    # Directories modified this recently are listed again next time, since a
+    # second change within the filesystem's mtime resolution would not show
+    SETTLE_SECONDS = 1.0
+
+    def __init__(self, root):
+        self.root = root
+        self._dirs = {}  # dirpath -> (mtime_ns, listed_at, subdirectories, fragment entry or None)
+
+    def scan(self):
+        """{request_date: (fragment path, mtime)} for every date fragment under root"""
+        paths = {}
+        seen = set()
+        pending = [self.root]
+        while pending:
+            dirpath = pending.pop()
+            try:
+                mtime_ns = os.stat(dirpath).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            seen.add(dirpath)
+            cached = self._dirs.get(dirpath)
+            if cached is None or cached[0] != mtime_ns or mtime_ns / 1e9 > cached[1] - self.SETTLE_SECONDS:
+                cached = (mtime_ns, time.time(), *self._list(dirpath))
+                self._dirs[dirpath] = cached
+            _, _, subdirs, fragment = cached
+            if fragment is not None:
+                paths[dirpath.rsplit('request_date=', 1)[1]] = fragment
+            pending.extend(subdirs)
+        for dirpath in set(self._dirs) - seen:
+            del self._dirs[dirpath]
+        return paths
+
+    @staticmethod
+    def _list(dirpath):
+        subdirs, fragment = [], None
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name == FRAGMENT_NAME and 'request_date=' in dirpath:
+                    fragment = (entry.path, entry.stat().st_mtime)
+        return subdirs, fragment
+
+
+def fragment_paths(root):
+    """{request_date: (fragment path, mtime)} for every date fragment under root (one full listing)"""
+    return FragmentScanner(root).scan()
+
+
+class OutputHistory:
+    """
+    Lazily scanned view of the processed output dataset (year/month/request_date).
+
+    Filters are pushed down to Arrow: date bounds prune partitions, symbol and
+    percentile predicates are evaluated against row-group statistics, and only
+    requested columns are read. A symbol -> dates index, built from the Symbol
+    column alone, lets single-symbol lookups open just the fragments that hold it.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.DATASET_PATH
+        self._fragments = {}  # request_date -> (path, mtime)
+        self._symbol_dates = {}  # symbol -> sorted list of request_dates
+        self._scanner = FragmentScanner(self.root)
+
+    def refresh_index(self):
+        """Index any fragments written, replaced or removed since the last refresh"""
+        current = self._scanner.scan()
+        changed = [d for d, entry in current.items() if self._fragments.get(d) != entry]
+        removed = [d for d in self._fragments if d not in current]
+        if not changed and not removed:
+            return
+
+        stale_dates = set(changed) | set(removed)
+        for symbol, dates in self._symbol_dates.items():
+            self._symbol_dates[symbol] = [d for d in dates if d not in stale_dates]
+
+        for request_date in changed:
+            symbols = pq.read_table(current[request_date][0], columns=['Symbol']).column('Symbol')
+            for symbol in set(symbols.to_pylist()):
+                self._symbol_dates.setdefault(symbol, []).append(request_date)
+        for dates in self._symbol_dates.values():
+            dates.sort()
+
+        self._fragments = current
+        logging.info(f"Output history index: {len(current)} dates, {len(self._symbol_dates)} symbols")
+
+    def symbol_date_range(self, symbol):
+        """(first, last) request date for a symbol, or None if it never appears"""
+        self.refresh_index()
+        dates = self._symbol_dates.get(symbol)
+        return (dates[0], dates[-1]) if dates else None
+
+    def _candidate_dates(self, symbols, start, end):
+        dates = set()
+        for symbol in symbols:
+            symbol_dates = self._symbol_dates.get(symbol, [])
+            lo = bisect_left(symbol_dates, start) if start else 0
+            hi = bisect_right(symbol_dates, end) if end else len(symbol_dates)
+            dates.update(symbol_dates[lo:hi])
+        return sorted(dates)
+
+    def scan(self, start=None, end=None, symbols=None, min_percentile=None, max_percentile=None,
+             labels=None, columns=None, as_pandas=True):
+        """
+        Read processed rows matching the filters.
+
+        Args:
+            start, end (str): Inclusive request date bounds, 'YYYY-MM-DD'
+            symbols (list): Restrict to these symbols
+            min_percentile, max_percentile (int): Inclusive Average_Percentile band
+            labels (list): Average_Percentile_Desc values, e.g. ['High', 'Very High']
+            columns (list): Columns to return (default: all)
+            as_pandas (bool): Return a DataFrame instead of a pyarrow Table
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        if symbols:
+            # Only open fragments whose dates contain one of the symbols
+            self.refresh_index()
+            dates = self._candidate_dates(symbols, start, end)
+            sources = [self._fragments[d][0] for d in dates]
+            if not sources:
+                table = ds.dataset(self._any_fragment(), format='parquet').schema.empty_table()
+                table = table.select(columns) if columns else table.drop_columns(
+                    [name for name in PARTITION_SCHEMA.names if name in table.schema.names])
+                return table.to_pandas(date_as_object=False) if as_pandas else table
+            dataset = ds.dataset(sources, format='parquet', partitioning=partitioning(),
+                                 partition_base_dir=self.root)
+        else:
+            dataset = ds.dataset(self.root, format='parquet', partitioning=partitioning())
+
+        expression = None
+        conditions = []
+        if start:
+            conditions.append(ds.field('request_date') >= start)
+            conditions.append(ds.field('year') >= int(start[:4]))
+        if end:
+            conditions.append(ds.field('request_date') <= end)
+            conditions.append(ds.field('year') <= int(end[:4]))
+        if symbols:
+            conditions.append(ds.field('Symbol').isin(symbols))
+        if min_percentile is not None:
+            conditions.append(ds.field('Average_Percentile') >= min_percentile)
+        if max_percentile is not None:
+            conditions.append(ds.field('Average_Percentile') <= max_percentile)
+        if labels:
+            conditions.append(ds.field('Average_Percentile_Desc').isin(labels))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        if columns is None:
+            # Partition keys duplicate Request_Date; only return the stored columns
+            columns = [name for name in dataset.schema.names if name not in PARTITION_SCHEMA.names]
+        table = dataset.to_table(columns=columns, filter=expression)
+        return table.to_pandas(date_as_object=False) if as_pandas else table
+
+    def _any_fragment(self):
+        return next(iter(self._fragments.values()))[0] if self._fragments else self.root
+
+
+_default_history = None
+
+
+def get_history():
+    """Shared OutputHistory over config.DATASET_PATH"""
+    global _default_history
+    if _default_history is None or _default_history.root != config.DATASET_PATH:
+        _default_history = OutputHistory()
+    return _default_history
+
+
+def scan(**filters):
+    """Convenience wrapper around get_history().scan(...)"""
+    return get_history().scan(**filters)
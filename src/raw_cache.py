@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+from datetime import datetime
+
+import config
+
+
+class RawFileCache:
+    """
+    Content-addressed store for the exact bytes downloaded from NSE.
+
+    Blobs live under objects/<sha[:2]>/<sha256> and manifest.json maps
+    "<file_type>/<YYYY-MM-DD>" to the blob checksum, size, source url and fetch time.
+    Several processes (backfill workers, the daily job) may share one cache, so
+    flush merges this process's entries into the manifest under manifest.lock.
+    """
+
+    def __init__(self, root=None, max_age=None):
+        self.root = root or config.RAW_CACHE_PATH
+        self.max_age = max_age if max_age is not None else config.RAW_CACHE_MAX_AGE
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.lock_path = os.path.join(self.root, "manifest.lock")
+        self.manifest = self._load_manifest()
+        self._pending = {}  # entries put since the last flush
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error reading raw cache manifest {self.manifest_path}: {e}")
+            return {}
+
+    @staticmethod
+    def key(file_type, file_date):
+        return f"{file_type}/{file_date.strftime('%Y-%m-%d')}"
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256[:2], sha256)
+
+    def get(self, file_type, file_date):
+        """Return cached bytes for (file_type, file_date), or None if missing or stale"""
+        entry = self.manifest.get(self.key(file_type, file_date))
+        if entry is None:
+            return None
+
+        if self.max_age is not None and time.time() - entry['fetched_at'] > self.max_age:
+            logging.info(f"Raw cache entry {self.key(file_type, file_date)} is older than {self.max_age}s")
+            return None
+
+        try:
+            with open(self._blob_path(entry['sha256']), 'rb') as f:
+                content = f.read()
+        except OSError:
+            logging.warning(f"Raw cache blob missing for {self.key(file_type, file_date)}")
+            return None
+
+        if hashlib.sha256(content).hexdigest() != entry['sha256']:
+            logging.warning(f"Raw cache checksum mismatch for {self.key(file_type, file_date)}")
+            return None
+
+        return content
+
+    def put(self, file_type, file_date, content, url=None):
+        """Store downloaded bytes and record them in the manifest"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(sha256)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, blob_path)
+
+        entry = {
+            'sha256': sha256,
+            'size': len(content),
+            'url': url,
+            'fetched_at': time.time(),
+            'fetched_at_iso': datetime.now().isoformat(timespec='seconds')
+        }
+        self.manifest[self.key(file_type, file_date)] = entry
+        self._pending[self.key(file_type, file_date)] = entry
+
+    def flush(self):
+        """
+        Merge the entries put since the last flush into the manifest on disk.
+        The read-merge-write holds an exclusive lock, so entries flushed by
+        other processes in the meantime are kept rather than overwritten.
+        """
+        if not self._pending:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self._load_manifest()
+                manifest.update(self._pending)
+                tmp_path = f"{self.manifest_path}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(manifest, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.manifest_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.manifest = manifest
+        self._pending = {}
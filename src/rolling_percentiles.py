@@ -0,0 +1,186 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+import config
+from src.date_utils import get_calendar, to_day
+from src.schema import date_key
+
+METRICS = {'Trade_volume': 'Volume', 'Daily_Volatility': 'Volatility'}
+
+
+class RollingStateStore:
+    """
+    Per-symbol ring buffers of each metric over the last N trading days.
+
+    Slots are keyed by trading day (slot = trading-day index % N), so a day a
+    symbol was filtered out or banned stays NaN rather than the window reaching
+    back past N trading days. State is a handful of NumPy arrays (one row per
+    symbol) persisted as .npz, so each daily update touches O(symbols) cells
+    and never re-reads history.
+    """
+
+    LAYOUT = 'trading_day'
+
+    def __init__(self, window=None, path=None, calendar=None, load=True):
+        self.window = window or max(config.ROLLING_WINDOWS)
+        self.path = path or config.ROLLING_STATE_PATH
+        self.calendar = calendar or get_calendar()
+        self.symbols = []
+        self.index = {}
+        self.values = {metric: np.full((0, self.window), np.nan) for metric in METRICS}
+        self.last_day = np.zeros(0, dtype=np.int64)  # Trading-day index of the newest value
+        if load:
+            self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as state:
+            if 'layout' not in state or str(state['layout']) != self.LAYOUT:
+                logging.warning(f"Rolling state at {self.path} uses an older layout, starting fresh state "
+                                f"(a backfill run rebuilds it from the stored joined frames)")
+                return
+            if state['volume'].shape[1] != self.window:
+                logging.warning(f"Rolling state window {state['volume'].shape[1]} != {self.window}, "
+                                f"starting fresh state")
+                return
+            self.symbols = state['symbols'].tolist()
+            self.values = {'Trade_volume': state['volume'], 'Daily_Volatility': state['volatility']}
+            self.last_day = state['last_day']
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, layout=np.array(self.LAYOUT), symbols=np.array(self.symbols, dtype=str),
+                 volume=self.values['Trade_volume'], volatility=self.values['Daily_Volatility'],
+                 last_day=self.last_day)
+        os.replace(tmp_path, self.path)
+
+    def newest_day(self):
+        """Trading-day index of the newest date in the state, or None if it is empty"""
+        return int(self.last_day.max()) if len(self.last_day) else None
+
+    def _rows_for(self, symbols):
+        """Row index of each symbol, growing the arrays for unseen symbols"""
+        new_symbols = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.index]
+        if new_symbols:
+            start = len(self.symbols)
+            self.symbols.extend(new_symbols)
+            self.index.update({symbol: start + i for i, symbol in enumerate(new_symbols)})
+            n_new = len(new_symbols)
+            for metric in METRICS:
+                self.values[metric] = np.vstack([self.values[metric], np.full((n_new, self.window), np.nan)])
+            # -1 sits more than a window before any real day, so every slot reads as empty
+            self.last_day = np.concatenate([self.last_day, np.full(n_new, -1, dtype=np.int64)])
+        return np.array([self.index[symbol] for symbol in symbols], dtype=np.int64)
+
+    def update(self, frame, request_date):
+        """
+        Write one date's values and return time-series percentiles and z-scores.
+        Re-running a symbol's newest date overwrites its slot. A date older than
+        a symbol's newest date is not written and gets empty values, since its
+        window would already hold later days.
+        """
+        day = int(self.calendar.trading_index(np.datetime64(request_date, 'D')))
+        rows = self._rows_for(frame['Symbol'].tolist())
+
+        stale = self.last_day[rows] > day
+        if stale.any():
+            logging.warning(f"Rolling state already past {request_date} for {int(stale.sum())} symbols; "
+                            f"leaving their rolling values empty (a backfill rebuilds the state in date order)")
+
+        # Slots of the trading days after each symbol's newest value and before this one
+        # were skipped (symbol absent that day) and are cleared to NaN
+        age = (day - np.arange(self.window)) % self.window
+        written = rows[~stale]
+        skipped = (age[None, :] > 0) & (age[None, :] < (day - self.last_day[written])[:, None])
+        slot = day % self.window
+        for metric in METRICS:
+            values = self.values[metric]
+            block = values[written]
+            block[skipped] = np.nan
+            block[:, slot] = frame[metric].to_numpy(dtype=float)[~stale]
+            values[written] = block
+        self.last_day[written] = day
+
+        return self._statistics(frame, rows, day, ~stale)
+
+    def _statistics(self, frame, rows, day, scored):
+        result = pd.DataFrame(index=frame.index)
+        # Slots from the newest to the oldest trading day of the window: shape (symbols, window)
+        offsets = (day - np.arange(self.window)) % self.window
+        for metric, label in METRICS.items():
+            current = frame[metric].to_numpy(dtype=float)
+            history = self.values[metric][rows[:, None], offsets[None, :]]
+            for window in config.ROLLING_WINDOWS:
+                recent = history[:, :window]
+                valid = ~np.isnan(recent)
+                n_valid = valid.sum(axis=1)
+                enough = scored & (n_valid >= config.ROLLING_MIN_PERIODS)
+
+                at_or_below = ((recent <= current[:, None]) & valid).sum(axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    percentile = np.ceil(at_or_below / n_valid * 100)
+                    mean = np.where(valid, recent, 0.0).sum(axis=1) / n_valid
+                    squared = np.where(valid, (recent - mean[:, None]) ** 2, 0.0).sum(axis=1)
+                    std = np.sqrt(squared / (n_valid - 1))
+                    zscore = np.where(std > 0, (current - mean) / std, np.nan)
+
+                result[f'TS_Percentile_{label}_{window}'] = pd.array(
+                    np.where(enough, percentile, np.nan), dtype='Float64').round().astype('Int8')
+                result[f'ZScore_{label}_{window}'] = np.where(enough, np.round(zscore, 4), np.nan)
+        return result
+
+
+def rolling_columns():
+    """Names of the columns add_rolling_percentiles appends"""
+    return [f'{kind}_{label}_{window}' for label in METRICS.values() for window in config.ROLLING_WINDOWS
+            for kind in ('TS_Percentile', 'ZScore')]
+
+
+def rebuild_rolling_state(end_date=None, path=None):
+    """
+    Rebuild the rolling state from the stored joined frames of the trading days
+    up to end_date (default: the newest stored frame), replayed in date order.
+    Only the last window of trading days is read.
+    """
+    from src.frame_store import available_dates, read_range
+    from src.pipeline import JOINED_FRAME
+
+    store = RollingStateStore(path=path, load=False)
+    dates = available_dates(JOINED_FRAME, end=end_date)
+    if dates:
+        end = store.calendar.on_or_before(to_day(dates[-1]))
+        start = store.calendar.previous_trading_days(end, store.window - 1)
+        history = read_range(JOINED_FRAME, str(start), dates[-1])
+        columns = ['Request_Date', 'Symbol', *METRICS]
+        history = history.select(columns).to_pandas() if history is not None else None
+        if history is not None:
+            for request_date, date_df in history.groupby('Request_Date', sort=True):
+                store.update(date_df, date_key(request_date))
+    store.save()
+    logging.info(f"Rolling state rebuilt from {len(store.symbols)} symbols up to {dates[-1] if dates else None}")
+    return store
+
+
+def add_rolling_percentiles(final_data, store=None):
+    """
+    Update the rolling state with final_data (one or more Request_Dates, applied
+    in date order) and append time-series percentile and z-score columns.
+    """
+    if final_data is None or final_data.empty:
+        return final_data
+    store = store or RollingStateStore()
+    # Frames resumed from the store already carry the columns; they are recomputed
+    final_data = final_data.drop(columns=rolling_columns(), errors='ignore')
+
+    stats = []
+    for request_date, date_df in final_data.groupby('Request_Date', sort=True):
+        stats.append(store.update(date_df, date_key(request_date)))
+    store.save()
+
+    return final_data.join(pd.concat(stats))
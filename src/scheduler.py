@@ -0,0 +1,218 @@
+import random
+import asyncio
+import contextvars
+import logging
+from datetime import datetime, timedelta
+
+import config
+from src.date_utils import get_next_trading_day, is_market_holiday
+
+
+def at_time(day, hhmm):
+    """datetime for HH:MM on the given day"""
+    hour, minute = (int(part) for part in hhmm.split(':'))
+    return datetime.combine(day.date(), datetime.min.time()).replace(hour=hour, minute=minute)
+
+
+def next_poll_delay(delay):
+    """Grow the poll interval after a miss, with a little jitter so file types drift apart"""
+    delay = min(delay * config.SCHEDULER_BACKOFF_FACTOR, config.SCHEDULER_POLL_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def warm_up():
+    """
+    Import the pipeline modules, build the trading calendar and open a DB
+    connection once, so each day's run starts without cold-start costs.
+    """
+    import pandas, pyarrow  # noqa: F401
+    import src.bhavcopy_reader, src.dataset_writer, src.rolling_percentiles  # noqa: F401
+    from src.date_utils import get_calendar
+
+    get_calendar()
+    if config.DB_ENABLED:
+        from src.db_utils import get_pool
+        try:
+            with get_pool(config.DB_PARAMS).connection():
+                pass
+        except Exception as e:
+            logging.warning(f"Scheduler: database not reachable yet, will retry on load: {e}")
+
+
+def transform_landed(target_date, file_type, content):
+    """Decode and filter one file as soon as it lands; stores the frame for the pipeline"""
+    import combine_code
+    from src.frame_store import write_frame
+    from src.pipeline import run_analytics
+
+    label = {'bhavcopy': 'Bhavcopy', 'volatility': 'Volatility', 'secban': 'Secban'}[file_type]
+    data = combine_code.parse_file(file_type, content)
+    if file_type == 'bhavcopy':
+        run_analytics(data, target_date.strftime('%Y-%m-%d'))
+    frame = combine_code.transform_data(data, label)
+    if frame is not None:
+        write_frame(frame, target_date.strftime('%Y-%m-%d'), file_type)
+    return frame
+
+
+async def poll_file(session, semaphore, cache, file_type, file_date, url, deadline):
+    """
+    Poll one NSE file until it is published or the deadline passes.
+    The interval starts at config.SCHEDULER_POLL_MIN and backs off towards
+    config.SCHEDULER_POLL_MAX while the file keeps returning 404.
+    """
+    from src.async_downloader import fetch_file
+
+    delay = config.SCHEDULER_POLL_MIN
+    while True:
+        content = cache.get(file_type, file_date)
+        if content is None and not config.OFFLINE_MODE:
+            content = await fetch_file(session, semaphore, file_type, file_date, url)
+            if content is not None:
+                cache.put(file_type, file_date, content, url)
+                cache.flush()
+        if content is not None:
+            logging.info(f"Scheduler: {file_type} for {file_date:%Y-%m-%d} landed")
+            return content
+
+        if datetime.now() + timedelta(seconds=delay) > deadline:
+            logging.warning(f"Scheduler: {file_type} for {file_date:%Y-%m-%d} not published "
+                            f"by {deadline:%H:%M}, giving up")
+            return None
+        await asyncio.sleep(delay)
+        delay = next_poll_delay(delay)
+
+
+def secban_waiting(manifest, date_str):
+    from src.pipeline import SECBAN_MARKER
+
+    return manifest.status(date_str).get(SECBAN_MARKER) == 'waiting'
+
+
+async def run_day(session, target_date, manifest):
+    """
+    Poll every file for target_date, transform each one as it lands, then
+    finish the day through process_for_date (which resumes from the
+    transformed frames). If secban is not in config.SCHEDULER_SECBAN_GRACE
+    seconds after the other files, the day is written without the ban list
+    and secban is polled until config.SCHEDULER_DEADLINE; when it lands the
+    join and outputs run again (the delta upsert deletes the banned rows).
+    """
+    import combine_code
+    from src.async_downloader import build_download_jobs
+    from src.pipeline import SECBAN_MARKER
+    from src.raw_cache import RawFileCache
+
+    date_str = target_date.strftime('%Y-%m-%d')
+    loop = asyncio.get_running_loop()
+    cache = RawFileCache()
+    semaphore = asyncio.Semaphore(config.DOWNLOAD_CONCURRENCY)
+    deadline = at_time(target_date, config.SCHEDULER_DEADLINE)
+    # Outputs already written without the ban list (e.g. before a daemon restart)
+    built_without_secban = secban_waiting(manifest, date_str)
+    final_data = None
+
+    async def land(file_type, file_date, url):
+        content = await poll_file(session, semaphore, cache, file_type, file_date, url, deadline)
+        if content is None:
+            return None
+        return await in_executor(transform_landed, target_date, file_type, content)
+
+    def in_executor(func, *args):
+        # A fresh copy of the context per job, so the instrumentation runs of days
+        # processed at the same time never share spans
+        return loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+
+    def process():
+        return in_executor(combine_code.process_for_date, date_str)
+
+    tasks = {file_type: asyncio.ensure_future(land(file_type, file_date, url))
+             for _, file_type, file_date, url in build_download_jobs([target_date])}
+    secban_task = tasks['secban']
+    try:
+        bhavcopy, volatility = await asyncio.gather(tasks['bhavcopy'], tasks['volatility'])
+        if bhavcopy is None or volatility is None:
+            manifest.mark_failed(date_str, 'downloaded', 'bhavcopy or volatility not published before deadline')
+            return None
+
+        manifest.mark_done(date_str, 'downloaded')
+        manifest.mark_done(date_str, 'transformed')
+        try:
+            await asyncio.wait_for(asyncio.shield(secban_task), timeout=config.SCHEDULER_SECBAN_GRACE)
+        except asyncio.TimeoutError:
+            logging.warning(f"Scheduler: processing {date_str} without the secban list, "
+                            f"still polling for it until {deadline:%H:%M}")
+            manifest.mark(date_str, SECBAN_MARKER, 'waiting')
+            built_without_secban = True
+            final_data = await process()
+
+        secban = await secban_task
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+    if secban is None:
+        manifest.mark_failed(date_str, SECBAN_MARKER, f"not published by {deadline:%H:%M}")
+        return final_data if built_without_secban else await process()
+
+    manifest.mark_done(date_str, SECBAN_MARKER)
+    if built_without_secban:
+        logging.info(f"Scheduler: secban for {date_str} landed, re-running the join without banned symbols")
+        manifest.reset(date_str, ['joined', 'parquet', 'db'])
+    return await process()
+
+
+def next_window(now, manifest):
+    """(target date, window start) of the next trading day with pending stages or a secban still awaited"""
+    day = datetime.combine(now.date(), datetime.min.time())
+    date_str = day.strftime('%Y-%m-%d')
+    open_today = manifest.pending(date_str) or secban_waiting(manifest, date_str)
+    if is_market_holiday(day) or not open_today or now >= at_time(day, config.SCHEDULER_DEADLINE):
+        day = get_next_trading_day(day)
+    return day, at_time(day, config.SCHEDULER_PUBLISH_START)
+
+
+async def run_scheduler(once=False):
+    """
+    Stay resident and process each trading day as soon as NSE publishes its
+    files, reusing one HTTP session and DB pool across days.
+    once=True processes the next pending trading day and returns.
+    """
+    from src.async_downloader import create_session
+    from src.pipeline import StageManifest
+
+    warm_up()
+    manifest = StageManifest()
+    session = create_session()
+    try:
+        while True:
+            target_date, window_start = next_window(datetime.now(), manifest)
+            wait = (window_start - datetime.now()).total_seconds()
+            if wait > 0:
+                logging.info(f"Scheduler: sleeping {wait / 3600:.1f}h until {window_start:%Y-%m-%d %H:%M}")
+                await asyncio.sleep(wait)
+
+            logging.info(f"Scheduler: polling NSE for {target_date:%Y-%m-%d}")
+            try:
+                await run_day(session, target_date, manifest)
+            except Exception as e:
+                logging.error(f"Scheduler: error processing {target_date:%Y-%m-%d}: {e}")
+            if once:
+                return
+
+            # Don't start the same day again until its deadline has passed
+            deadline = at_time(target_date, config.SCHEDULER_DEADLINE)
+            date_str = target_date.strftime('%Y-%m-%d')
+            if (manifest.pending(date_str) or secban_waiting(manifest, date_str)) and datetime.now() < deadline:
+                await asyncio.sleep((deadline - datetime.now()).total_seconds())
+    finally:
+        await session.close()
+        manifest.close()
+
+
+def run_daemon(once=False):
+    """Synchronous entry point for run_scheduler"""
+    try:
+        asyncio.run(run_scheduler(once))
+    except KeyboardInterrupt:
+        logging.info("Scheduler: stopped")
@@ -0,0 +1,104 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Average_Percentile_Desc labels, lowest to highest ('Unknown' is np.select's default)
+PERCENTILE_LABELS = ['Very Low', 'Low', 'Moderate', 'High', 'Very High', 'Unknown']
+
+DATE_COLUMNS = ('Expiry_Date', 'Request_Date')
+TIMESTAMP_COLUMNS = ('Processed_Timestamp',)
+
+# Output table schema shared by the Parquet dataset, the Arrow frames and the DB load
+OUTPUT_SCHEMA = pa.schema([
+    ('Symbol', pa.dictionary(pa.int32(), pa.string())),
+    ('Trade_volume', pa.int64()),
+    ('Daily_Volatility', pa.float64()),
+    ('Percentile_Volume', pa.int8()),
+    ('Percentile_Volatility', pa.int8()),
+    ('Average_Percentile', pa.int8()),
+    ('Average_Percentile_Desc', pa.dictionary(pa.int8(), pa.string())),
+    ('Expiry_Date', pa.date32()),
+    ('Processed_Timestamp', pa.timestamp('s')),
+    ('Request_Date', pa.date32())
+])
+
+# In-memory (pandas) dtypes for the same columns; dates are midnight datetime64[s]
+PANDAS_DTYPES = {
+    'Symbol': 'category',
+    'Trade_volume': 'int64',
+    'Daily_Volatility': 'float64',
+    'Percentile_Volume': 'int8',
+    'Percentile_Volatility': 'int8',
+    'Average_Percentile': 'int8',
+    'Average_Percentile_Desc': pd.CategoricalDtype(PERCENTILE_LABELS, ordered=True),
+    'Expiry_Date': 'datetime64[s]',
+    'Processed_Timestamp': 'datetime64[s]',
+    'Request_Date': 'datetime64[s]'
+}
+
+# Rolling columns are named per window, so they are typed by prefix
+PREFIX_DTYPES = {'TS_Percentile_': ('Int8', pa.int8())}
+
+
+def column_dtype(name):
+    if name in PANDAS_DTYPES:
+        return PANDAS_DTYPES[name]
+    for prefix, (dtype, _) in PREFIX_DTYPES.items():
+        if name.startswith(prefix):
+            return dtype
+    return None
+
+
+def apply_output_dtypes(df):
+    """
+    Cast the known output columns of df to the compact schema: categorical
+    symbols and labels, datetime64 dates and timestamps, int8 percentiles.
+    Columns already in the right dtype are left untouched.
+    """
+    df = df.copy()
+    for name in df.columns:
+        dtype = column_dtype(name)
+        if dtype is None or df[name].dtype == dtype:
+            continue
+        if name in DATE_COLUMNS:
+            df[name] = pd.to_datetime(df[name]).dt.normalize().astype(dtype)
+        elif name in TIMESTAMP_COLUMNS:
+            df[name] = pd.to_datetime(df[name]).dt.floor('s').astype(dtype)
+        elif isinstance(dtype, pd.CategoricalDtype) or dtype == 'category':
+            df[name] = df[name].astype('string').astype(dtype)
+        else:
+            df[name] = df[name].astype(dtype)
+    return df
+
+
+def arrow_type(name, current):
+    if name in OUTPUT_SCHEMA.names:
+        return OUTPUT_SCHEMA.field(name).type
+    for prefix, (_, arrow) in PREFIX_DTYPES.items():
+        if name.startswith(prefix):
+            return arrow
+    return current
+
+
+def to_arrow(df):
+    """DataFrame -> Arrow table with the output schema (date32 dates, dictionary strings)"""
+    table = pa.Table.from_pandas(apply_output_dtypes(df), preserve_index=False)
+    target = pa.schema([pa.field(field.name, arrow_type(field.name, field.type)) for field in table.schema])
+    return table.cast(target)
+
+
+def plain_columns(table):
+    """Decode dictionary columns to their value types (for writers and kernels without dictionary support)"""
+    columns = [pc.cast(column, column.type.value_type) if pa.types.is_dictionary(column.type) else column
+               for column in table.columns]
+    return pa.table(columns, names=table.column_names)
+
+
+def date_strings(series):
+    """'YYYY-MM-DD' strings for a date column, whichever dtype it currently has"""
+    return pd.to_datetime(series).dt.strftime('%Y-%m-%d')
+
+
+def date_key(value):
+    """'YYYY-MM-DD' for one date value (string, date, datetime or Timestamp)"""
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
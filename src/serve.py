@@ -0,0 +1,359 @@
+"""
+Read-only HTTP service for the daily rankings (python combine_code.py --serve).
+
+Per-date output tables are kept in an in-memory LRU of Arrow tables, loaded
+from the partitioned Parquet dataset and warmed as soon as a run writes its
+outputs. Endpoints:
+
+    GET /rankings/latest            newest request date
+    GET /rankings/YYYY-MM-DD        one request date
+    GET /rankings?start=&end=       a date range (inclusive, at most
+                                    config.SERVE_CACHE_DATES dates)
+    GET /dates                      request dates available
+    GET /health
+
+Ranking endpoints accept symbol=A,B and label=High,Very%20High (repeatable)
+to filter on Symbol and Average_Percentile_Desc, and format=json|arrow.
+Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
+"""
+import io
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import config
+from src.dataset_writer import FRAGMENT_NAME, fragment_dir
+from src.query import FragmentScanner
+from src.schema import date_strings, plain_columns, to_arrow
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream'
+}
+
+# Filtered responses kept per cached date
+RESPONSES_PER_DATE = 64
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def nan_to_null(table):
+    """JSON has no NaN; float columns carry missing values as null"""
+    columns = [pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column)
+               if pa.types.is_floating(column.type) else column for column in table.columns]
+    return pa.table(columns, names=table.column_names)
+
+
+def render(table, fmt):
+    if fmt == 'arrow':
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+    return json.dumps(table.to_pylist(), default=_json_default, separators=(',', ':')).encode()
+
+
+def filter_table(table, symbols=(), labels=()):
+    mask = None
+    if symbols:
+        mask = pc.is_in(table.column('Symbol'), value_set=pa.array(symbols, pa.string()))
+    if labels:
+        keep = pc.is_in(table.column('Average_Percentile_Desc'), value_set=pa.array(labels, pa.string()))
+        mask = keep if mask is None else pc.and_(mask, keep)
+    return table if mask is None else table.filter(mask)
+
+
+def make_etag(*parts):
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest() + '"'
+
+
+class CachedDate:
+    """One request date's rankings and the responses already rendered from them"""
+
+    def __init__(self, request_date, table, mtime=None):
+        self.request_date = request_date
+        self.table = nan_to_null(plain_columns(table))
+        self.mtime = mtime
+        self.etag = make_etag(request_date, hashlib.blake2b(render(self.table, 'arrow')).hexdigest())
+        self._responses = OrderedDict()  # (fmt, symbols, labels) -> body
+        self._lock = threading.Lock()
+
+    def response(self, fmt, symbols, labels):
+        key = (fmt, symbols, labels)
+        with self._lock:
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+                return body
+        body = render(filter_table(self.table, symbols, labels), fmt)
+        with self._lock:
+            self._responses[key] = body
+            while len(self._responses) > RESPONSES_PER_DATE:
+                self._responses.popitem(last=False)
+        return body
+
+
+class RankingCache:
+    """
+    LRU of per-date ranking tables (at most config.SERVE_CACHE_DATES dates).
+    Dates are loaded from the dataset on first use; refresh() notices
+    fragments that were added or replaced and loads the newest date eagerly.
+    """
+
+    def __init__(self, root=None, max_dates=None):
+        self.root = root or config.DATASET_PATH
+        self.max_dates = max_dates or config.SERVE_CACHE_DATES
+        self._entries = OrderedDict()  # request_date -> CachedDate
+        self._fragments = {}  # request_date -> (path, mtime)
+        self._scanner = FragmentScanner(self.root)
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        fragments = self._scanner.scan()
+        with self._lock:
+            self._fragments = fragments
+            for request_date, entry in list(self._entries.items()):
+                on_disk = fragments.get(request_date)
+                if on_disk is not None and on_disk[1] != entry.mtime:
+                    del self._entries[request_date]
+        latest = self.latest_date()
+        if latest:
+            self.get(latest)
+
+    def warm(self):
+        """Load the newest dates up to the cache size, newest last so it ends up most recent"""
+        for request_date in self.dates()[-self.max_dates:]:
+            self.get(request_date)
+
+    def dates(self):
+        with self._lock:
+            return sorted(set(self._fragments) | set(self._entries))
+
+    def latest_date(self):
+        dates = self.dates()
+        return dates[-1] if dates else None
+
+    def get(self, request_date, store=True):
+        """
+        CachedDate for request_date, loading its fragment if needed (None if
+        unknown). store=False reads a date that is not cached without adding
+        it, so range scans do not evict the hot dates.
+        """
+        with self._lock:
+            entry = self._entries.get(request_date)
+            if entry is not None:
+                if store:
+                    self._entries.move_to_end(request_date)
+                return entry
+            source = self._fragments.get(request_date)
+        if source is None:
+            return None
+        path, mtime = source
+        entry = CachedDate(request_date, pq.read_table(path), mtime)
+        return self._store(entry) if store else entry
+
+    def put(self, request_date, table):
+        """Cache a freshly written date (its fragment, if any, is recorded as current)"""
+        path = os.path.join(fragment_dir(request_date, self.root), FRAGMENT_NAME)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime is not None:
+            with self._lock:
+                self._fragments[request_date] = (path, mtime)
+        return self._store(CachedDate(request_date, table, mtime))
+
+    def _store(self, entry):
+        with self._lock:
+            self._entries[entry.request_date] = entry
+            self._entries.move_to_end(entry.request_date)
+            while len(self._entries) > self.max_dates:
+                self._entries.popitem(last=False)
+        return entry
+
+
+_cache = None
+
+
+def publish(final_data):
+    """
+    Warm the cache of a server running in this process with newly written
+    output (one entry per Request_Date). No-op when nothing is serving.
+    """
+    if _cache is None or final_data is None or len(final_data) == 0:
+        return
+    for request_date, date_df in final_data.groupby(date_strings(final_data['Request_Date']), sort=True):
+        _cache.put(request_date, to_arrow(date_df))
+        logging.info(f"Serve: cache warmed for {request_date} ({len(date_df)} rows)")
+
+
+def parse_list(params, name):
+    values = []
+    for value in params.get(name, []):
+        values += [part.strip() for part in value.split(',') if part.strip()]
+    return tuple(sorted(set(values)))
+
+
+def route(cache, path, params):
+    """
+    Resolve a request to (status, etag, content type, render callable, headers).
+    Nothing is rendered until the handler knows the client's copy is stale.
+    """
+    fmt = params.get('format', ['json'])[0]
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"format must be one of {sorted(CONTENT_TYPES)}")
+    symbols = tuple(sorted({symbol.upper() for symbol in parse_list(params, 'symbol')}))
+    labels = parse_list(params, 'label')
+    path = path.rstrip('/')
+
+    if path == '/health':
+        return 200, None, CONTENT_TYPES['json'], lambda: b'{"status":"ok"}', {}
+    if path == '/dates':
+        dates = cache.dates()
+        return 200, make_etag(dates), CONTENT_TYPES['json'], lambda: json.dumps(dates).encode(), {}
+
+    if path == '/rankings':
+        start, end = params.get('start', [None])[0], params.get('end', [None])[0]
+        dates = [d for d in cache.dates() if (not start or d >= start) and (not end or d <= end)]
+        if len(dates) > cache.max_dates:
+            raise ValueError(f"Range covers {len(dates)} dates; narrow start/end to at most {cache.max_dates}")
+        entries = [entry for entry in (cache.get(d, store=False) for d in dates) if entry is not None]
+        etag = make_etag(fmt, symbols, labels, [entry.etag for entry in entries])
+
+        def render_range():
+            tables = [filter_table(entry.table, symbols, labels) for entry in entries]
+            if not tables:
+                return render(pa.table({}), fmt) if fmt == 'arrow' else b'[]'
+            return render(pa.concat_tables(tables, promote_options='permissive'), fmt)
+        return 200, etag, CONTENT_TYPES[fmt], render_range, {}
+
+    if path.startswith('/rankings/'):
+        request_date = path[len('/rankings/'):]
+        if request_date == 'latest':
+            request_date = cache.latest_date()
+        entry = cache.get(request_date) if request_date else None
+        if entry is None:
+            raise LookupError(f"No rankings for {request_date or 'any date'}")
+        etag = make_etag(entry.etag, fmt, symbols, labels)
+        return (200, etag, CONTENT_TYPES[fmt], lambda: entry.response(fmt, symbols, labels),
+                {'X-Request-Date': entry.request_date})
+
+    raise LookupError(f"Unknown path {path}")
+
+
+class RankingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so dashboards reuse connections
+    # Headers and body go out in separate writes; without TCP_NODELAY the body
+    # waits on the client's delayed ACK (~40 ms per response)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, etag, content_type, produce, headers = route(self.server.cache, url.path, parse_qs(url.query))
+            if etag and etag in self.headers.get('If-None-Match', ''):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            body = produce()
+        except ValueError as e:
+            return self.send_error_json(400, str(e))
+        except LookupError as e:
+            return self.send_error_json(404, str(e))
+        except Exception as e:
+            logging.error(f"Serve: error handling {self.path}: {e}")
+            return self.send_error_json(500, 'internal error')
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        if etag:
+            self.send_header('ETag', etag)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message):
+        body = json.dumps({'error': message}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', CONTENT_TYPES['json'])
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request lines would dominate the pipeline log
+        pass
+
+
+class RankingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, cache):
+        super().__init__(address, RankingHandler)
+        self.cache = cache
+        self.stopped = threading.Event()
+
+    def watch(self):
+        """
+        Preload the newest dates, then pick up dates written by other
+        processes every config.SERVE_REFRESH_SECONDS
+        """
+        try:
+            self.cache.warm()
+        except Exception as e:
+            logging.error(f"Serve: error warming the cache: {e}")
+        while not self.stopped.wait(config.SERVE_REFRESH_SECONDS):
+            try:
+                self.cache.refresh()
+            except Exception as e:
+                logging.error(f"Serve: error refreshing the cache: {e}")
+
+    def shutdown(self):
+        self.stopped.set()
+        super().shutdown()
+        self.server_close()
+
+
+def start_server(host=None, port=None, root=None):
+    """
+    Start the server and its refresh thread in the background and return the
+    server (server.shutdown() stops it). The cache becomes this process's
+    publish() target, so a pipeline or daemon in the same process warms it.
+    """
+    global _cache
+    cache = RankingCache(root)
+    cache.refresh()
+    server = RankingServer((host or config.SERVE_HOST, config.SERVE_PORT if port is None else port), cache)
+    threading.Thread(target=server.watch, daemon=True).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    _cache = cache
+    logging.info(f"Serve: rankings on http://{server.server_address[0]}:{server.server_address[1]} "
+                 f"({len(cache.dates())} dates available)")
+    return server
+
+
+def run_server(host=None, port=None):
+    """Serve until interrupted"""
+    server = start_server(host, port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logging.info("Serve: stopped")
+    finally:
+        server.shutdown()
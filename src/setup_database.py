@@ -1,12 +1,15 @@
-import mysql.connector
 from mysql.connector import Error
 import sys
 import os
 import logging
+from collections import namedtuple
+from datetime import date
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
 from config import DB_PARAMS
+from src.db_utils import get_pool, rebuild_latest, rebuild_latest_table
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -16,84 +19,407 @@ def create_database_if_not_exists():
     """Create the database and table if they don't exist"""
     try:
         # First connect without database to check/create it
-        conn = mysql.connector.connect(
-            host=DB_PARAMS['host'],
-            port=DB_PARAMS['port'],
-            user=DB_PARAMS['user'],
-            password=DB_PARAMS['password']
-        )
+        server_params = {k: v for k, v in DB_PARAMS.items() if k != 'database'}
+        with get_pool(server_params, pool_size=1).transaction() as cursor:
+            create_schema(cursor)
+        return True
         
-        cursor = conn.cursor()
+    except Error as e:
+        logger.error(f"Error: {e}")
+        return False
+
+def create_schema(cursor):
+    """Create the database, the fo_market_analysis table and its fo_market_latest snapshot"""
+    # Create database if it doesn't exist
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_PARAMS['database']} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    logger.info(f"Database {DB_PARAMS['database']} is ready")
+    
+    # Switch to the database
+    cursor.execute(f"USE {DB_PARAMS['database']}")
+    
+    # Create table if it doesn't exist
+    create_table_sql = """
+    CREATE TABLE IF NOT EXISTS fo_market_analysis (
+        id BIGINT AUTO_INCREMENT,
+        symbol VARCHAR(50) NOT NULL,
+        request_date DATE NOT NULL,
+        expiry_date DATE NOT NULL,
+        processed_timestamp TIMESTAMP NOT NULL,
+        daily_volatility DECIMAL(10,4) NOT NULL,
+        trade_volume BIGINT NOT NULL,
+        percentile_volume INT NOT NULL,
+        percentile_volatility INT NOT NULL,
+        average_percentile DECIMAL(5,2) NOT NULL,
+        average_percentile_desc VARCHAR(20) NOT NULL,
+        row_hash BIGINT UNSIGNED NULL COMMENT 'Hash of the stored values, used to skip unchanged rows on reload',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
         
-        # Create database if it doesn't exist
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_PARAMS['database']} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-        logger.info(f"Database {DB_PARAMS['database']} is ready")
+        -- Every unique key of a partitioned table must include the partitioning column
+        PRIMARY KEY (id, request_date),
         
-        # Switch to the database
-        cursor.execute(f"USE {DB_PARAMS['database']}")
+        -- Add unique constraint to prevent duplicate entries
+        UNIQUE KEY uk_symbol_request_date (symbol, request_date),
         
-        # Create table if it doesn't exist
-        create_table_sql = """
-        CREATE TABLE IF NOT EXISTS fo_market_analysis (
-            id BIGINT AUTO_INCREMENT PRIMARY KEY,
-            symbol VARCHAR(50) NOT NULL,
-            request_date DATE NOT NULL,
-            expiry_date DATE NOT NULL,
-            processed_timestamp TIMESTAMP NOT NULL,
-            daily_volatility DECIMAL(10,4) NOT NULL,
-            trade_volume BIGINT NOT NULL,
-            percentile_volume INT NOT NULL,
-            percentile_volatility INT NOT NULL,
-            average_percentile DECIMAL(5,2) NOT NULL,
-            average_percentile_desc VARCHAR(20) NOT NULL,
-            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-            
-            -- Add unique constraint to prevent duplicate entries
-            UNIQUE KEY uk_symbol_request_date (symbol, request_date),
-            
-            -- Add indexes for common queries
-            INDEX idx_request_date (request_date),
-            INDEX idx_expiry_date (expiry_date),
-            INDEX idx_symbol (symbol),
-            INDEX idx_average_percentile (average_percentile),
-            
-            -- Add composite indexes for common query patterns
-            INDEX idx_symbol_dates (symbol, request_date, expiry_date),
-            INDEX idx_percentiles (average_percentile, percentile_volume, percentile_volatility),
-            
-            -- Add constraints
-            CONSTRAINT chk_percentiles CHECK (
-                percentile_volume BETWEEN 0 AND 100
-                AND percentile_volatility BETWEEN 0 AND 100
-                AND average_percentile BETWEEN 0 AND 100
-            ),
-            CONSTRAINT chk_volatility CHECK (daily_volatility >= 0),
-            CONSTRAINT chk_volume CHECK (trade_volume >= 0)
-        ) 
-        ENGINE = InnoDB
-        PARTITION BY RANGE (YEAR(request_date)) (
-            PARTITION p_2024 VALUES LESS THAN (2025),
-            PARTITION p_2025 VALUES LESS THAN (2026),
-            PARTITION p_2026 VALUES LESS THAN (2027),
-            PARTITION p_max VALUES LESS THAN MAXVALUE
-        )
-        """
-        cursor.execute(create_table_sql)
-        logger.info("Table fo_market_analysis is ready")
+        -- Add indexes for common queries
+        INDEX idx_request_date (request_date),
+        INDEX idx_expiry_date (expiry_date),
+        INDEX idx_symbol (symbol),
+        INDEX idx_average_percentile (average_percentile),
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        -- Add composite indexes for common query patterns
+        INDEX idx_symbol_dates (symbol, request_date, expiry_date),
+        INDEX idx_percentiles (average_percentile, percentile_volume, percentile_volatility),
         
-        return True
+        -- Add constraints
+        CONSTRAINT chk_percentiles CHECK (
+            percentile_volume BETWEEN 0 AND 100
+            AND percentile_volatility BETWEEN 0 AND 100
+            AND average_percentile BETWEEN 0 AND 100
+        ),
+        CONSTRAINT chk_volatility CHECK (daily_volatility >= 0),
+        CONSTRAINT chk_volume CHECK (trade_volume >= 0)
+    ) 
+    ENGINE = InnoDB
+    PARTITION BY RANGE COLUMNS (request_date) (
+        PARTITION p_2024 VALUES LESS THAN ('2025-01-01'),
+        PARTITION p_2025 VALUES LESS THAN ('2026-01-01'),
+        PARTITION p_2026 VALUES LESS THAN ('2027-01-01'),
+        PARTITION p_max VALUES LESS THAN (MAXVALUE)
+    )
+    """
+    cursor.execute(create_table_sql)
+    add_row_hash_column(cursor)
+    logger.info("Table fo_market_analysis is ready")
+    create_latest_table(cursor)
+    try:
+        ensure_partitions(cursor)
+    except ValueError as e:
+        logger.warning(f"Partitions not extended: {e}")
+
+def create_latest_table(cursor):
+    """Create fo_market_latest (filled from the history on creation) and point v_latest_market_data at it"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS fo_market_latest (
+        symbol VARCHAR(50) NOT NULL PRIMARY KEY,
+        request_date DATE NOT NULL,
+        expiry_date DATE NOT NULL,
+        processed_timestamp TIMESTAMP NOT NULL,
+        daily_volatility DECIMAL(10,4) NOT NULL,
+        trade_volume BIGINT NOT NULL,
+        percentile_volume INT NOT NULL,
+        percentile_volatility INT NOT NULL,
+        average_percentile DECIMAL(5,2) NOT NULL,
+        average_percentile_desc VARCHAR(20) NOT NULL,
         
-    except Error as e:
-        logger.error(f"Error: {e}")
-        return False
+        INDEX idx_request_date (request_date),
+        INDEX idx_average_percentile (average_percentile)
+    )
+    ENGINE = InnoDB
+    COMMENT 'Latest fo_market_analysis row per symbol'
+    """)
+    cursor.execute("SELECT COUNT(*) FROM fo_market_latest")
+    if cursor.fetchone()[0] == 0:
+        rows = rebuild_latest(cursor)
+        if rows:
+            logger.info(f"Filled fo_market_latest from history ({rows} symbols)")
 
-if __name__ == "__main__":
-    if create_database_if_not_exists():
-        logger.info("Database setup completed successfully")
+    cursor.execute("""
+    CREATE OR REPLACE VIEW v_latest_market_data AS
+    SELECT symbol, request_date, expiry_date, daily_volatility, trade_volume, percentile_volume,
+           percentile_volatility, average_percentile, average_percentile_desc
+    FROM fo_market_latest
+    """)
+    logger.info("Table fo_market_latest is ready")
+
+def add_row_hash_column(cursor):
+    """Add row_hash to tables created before delta upserts; existing rows get it on their next load"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'fo_market_analysis' AND COLUMN_NAME = 'row_hash'",
+        (DB_PARAMS['database'],)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("ALTER TABLE fo_market_analysis "
+                       "ADD COLUMN row_hash BIGINT UNSIGNED NULL AFTER average_percentile_desc")
+        logger.info("Added row_hash column to fo_market_analysis")
+
+# Partition lifecycle of fo_market_analysis: RANGE COLUMNS (request_date)
+# partitions named p_YYYY or p_YYYYMM after the period they end in, with p_max
+# (MAXVALUE) last. Run --partitions from cron so upcoming periods exist before
+# data arrives; rows that land in p_max are not pruned by date-range queries.
+PARTITIONED_TABLE = 'fo_market_analysis'
+
+Partition = namedtuple('Partition', 'name method bound rows data_bytes index_bytes')
+
+def period_start(day, granularity):
+    return date(day.year, 1, 1) if granularity == 'year' else date(day.year, day.month, 1)
+
+def next_bound(bound, granularity):
+    """First day of the period after the one containing bound"""
+    if granularity == 'year':
+        return date(bound.year + 1, 1, 1)
+    if granularity == 'month':
+        return date(bound.year + bound.month // 12, bound.month % 12 + 1, 1)
+    raise ValueError(f"Unknown partition granularity: {granularity}")
+
+def months_before(day, months):
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(bound, granularity):
+    """Named after the period the partition ends in: p_2027 or p_202701 for LESS THAN 2028-01-01 / 2027-02-01"""
+    last_day = date.fromordinal(bound.toordinal() - 1)
+    return f"p_{last_day:%Y}" if granularity == 'year' else f"p_{last_day:%Y%m}"
+
+def partition_definition(name, bound):
+    return f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d}')"
+
+def parse_bound(method, description):
+    """Exclusive upper bound of a partition as a date (None for MAXVALUE)"""
+    if description is None or 'MAXVALUE' in description.upper():
+        return None
+    if method == 'RANGE COLUMNS':
+        return date.fromisoformat(description.strip("'"))
+    # RANGE (YEAR(request_date)) from the original schema
+    return date(int(description), 1, 1)
+
+def read_partitions(cursor, table=PARTITIONED_TABLE):
+    """Partitions of table in order, with estimated rows and sizes ([] when not partitioned)"""
+    try:
+        # MySQL 8 caches these statistics for a day by default
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except Error:
+        pass
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_DESCRIPTION, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH "
+        "FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (DB_PARAMS['database'], table)
+    )
+    return [Partition(name, method, parse_bound(method, description), rows or 0, data or 0, index or 0)
+            for name, method, description, rows, data, index in cursor.fetchall()]
+
+def require_range_columns(partitions):
+    if not partitions:
+        raise ValueError(f"{PARTITIONED_TABLE} is not partitioned; run --repartition")
+    if partitions[0].method != 'RANGE COLUMNS':
+        raise ValueError(f"{PARTITIONED_TABLE} is partitioned by {partitions[0].method} on YEAR(); "
+                         f"run --repartition to switch to RANGE COLUMNS (request_date)")
+
+def coverage_target(today, granularity, ahead):
+    """Bound the last dated partition must reach: the current period plus `ahead` more"""
+    target = period_start(today, granularity)
+    for _ in range(ahead + 1):
+        target = next_bound(target, granularity)
+    return target
+
+def planned_bounds(last_bound, target, granularity):
+    bounds = []
+    while last_bound < target:
+        last_bound = next_bound(last_bound, granularity)
+        bounds.append(last_bound)
+    return bounds
+
+def ensure_partitions(cursor, granularity=None, ahead=None, today=None):
+    """
+    Split partitions for the current and the next `ahead` periods out of
+    p_max (REORGANIZE PARTITION, which only moves rows already in p_max).
+    Returns the names of the partitions created.
+    """
+    granularity = granularity or config.DB_PARTITION_GRANULARITY
+    ahead = config.DB_PARTITIONS_AHEAD if ahead is None else ahead
+    today = today or date.today()
+
+    partitions = read_partitions(cursor)
+    require_range_columns(partitions)
+    bounds = [p.bound for p in partitions if p.bound is not None]
+    start = bounds[-1] if bounds else period_start(today, granularity)
+    new = planned_bounds(start, coverage_target(today, granularity, ahead), granularity)
+    if not bounds:
+        new.insert(0, start)
+    if not new:
+        return []
+
+    definitions = [partition_definition(partition_name(bound, granularity), bound) for bound in new]
+    if partitions[-1].bound is None:
+        definitions.append(f"PARTITION {partitions[-1].name} VALUES LESS THAN (MAXVALUE)")
+        if partitions[-1].rows:
+            logger.info(f"Moving ~{partitions[-1].rows} rows out of {partitions[-1].name}")
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} REORGANIZE PARTITION {partitions[-1].name} "
+                       f"INTO ({', '.join(definitions)})")
     else:
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} ADD PARTITION ({', '.join(definitions)})")
+    names = [partition_name(bound, granularity) for bound in new]
+    logger.info(f"Added partitions {', '.join(names)} to {PARTITIONED_TABLE} (through {new[-1]:%Y-%m-%d})")
+    return names
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+                   (DB_PARAMS['database'], table))
+    return cursor.fetchone()[0] > 0
+
+def apply_retention(cursor, months=None, action=None, today=None):
+    """
+    Archive or drop partitions whose whole range is older than `months`
+    months before the current month. 'archive' swaps the partition into its
+    own table (fo_market_analysis_archive_<partition>, EXCHANGE PARTITION
+    moves no rows) before dropping it. Symbols whose latest row went with
+    it are recomputed in fo_market_latest. Returns the partitions removed.
+    """
+    months = config.DB_PARTITION_RETENTION_MONTHS if months is None else months
+    action = action or config.DB_PARTITION_RETENTION_ACTION
+    if action not in ('archive', 'drop'):
+        raise ValueError(f"Unknown retention action: {action}")
+    if not months:
+        return []
+    cutoff = months_before(today or date.today(), months)
+
+    partitions = read_partitions(cursor)
+    require_range_columns(partitions)
+    expired = [p for p in partitions if p.bound is not None and p.bound <= cutoff]
+    removed = []
+    for partition in expired:
+        if action == 'archive':
+            archive = f"{PARTITIONED_TABLE}_archive_{partition.name}"
+            if table_exists(cursor, archive):
+                # Exchanging with a non-empty table would swap its rows back in
+                logger.error(f"Archive table {archive} already exists; leaving {partition.name} in place")
+                continue
+            cursor.execute(f"CREATE TABLE {archive} LIKE {PARTITIONED_TABLE}")
+            cursor.execute(f"ALTER TABLE {archive} REMOVE PARTITIONING")
+            cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} EXCHANGE PARTITION {partition.name} WITH TABLE {archive}")
+            logger.info(f"Archived {partition.name} (~{partition.rows} rows) to {archive}")
+        cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} DROP PARTITION {partition.name}")
+        logger.info(f"Dropped partition {partition.name} (before {partition.bound:%Y-%m-%d})")
+        removed.append(partition)
+
+    if removed:
+        cursor.execute("SELECT symbol FROM fo_market_latest WHERE request_date < %s", (removed[-1].bound,))
+        stale = [symbol for (symbol,) in cursor.fetchall()]
+        if stale:
+            rebuild_latest(cursor, PARTITIONED_TABLE, stale)
+    return [p.name for p in removed]
+
+def repartition(cursor, granularity=None, ahead=None, today=None):
+    """
+    Rebuild fo_market_analysis as RANGE COLUMNS (request_date) partitions from
+    its earliest row through the coverage target, making (id, request_date)
+    the primary key if needed. Copies the whole table, so run it off-hours.
+    """
+    granularity = granularity or config.DB_PARTITION_GRANULARITY
+    ahead = config.DB_PARTITIONS_AHEAD if ahead is None else ahead
+    today = today or date.today()
+
+    cursor.execute(f"SELECT MIN(request_date) FROM {PARTITIONED_TABLE}")
+    earliest = cursor.fetchone()[0] or today
+    start = period_start(earliest, granularity)
+    bounds = [next_bound(start, granularity)]
+    bounds += planned_bounds(bounds[0], coverage_target(today, granularity, ahead), granularity)
+    definitions = [partition_definition(partition_name(bound, granularity), bound) for bound in bounds]
+    definitions.append("PARTITION p_max VALUES LESS THAN (MAXVALUE)")
+
+    cursor.execute("SELECT COLUMN_NAME FROM information_schema.STATISTICS "
+                   "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = 'PRIMARY'",
+                   (DB_PARAMS['database'], PARTITIONED_TABLE))
+    key_change = ''
+    if 'request_date' not in {column for (column,) in cursor.fetchall()}:
+        key_change = 'DROP PRIMARY KEY, ADD PRIMARY KEY (id, request_date) '
+    logger.info(f"Repartitioning {PARTITIONED_TABLE} into {len(definitions)} partitions (copies the table)")
+    cursor.execute(f"ALTER TABLE {PARTITIONED_TABLE} {key_change}"
+                   f"PARTITION BY RANGE COLUMNS (request_date) ({', '.join(definitions)})")
+
+def check_partitions(cursor, granularity=None, ahead=None, today=None):
+    """
+    Log every partition's range, estimated rows and size, and return the
+    problems that stop date-range queries from pruning well: rows in p_max
+    and upcoming periods without a partition.
+    """
+    granularity = granularity or config.DB_PARTITION_GRANULARITY
+    ahead = config.DB_PARTITIONS_AHEAD if ahead is None else ahead
+    today = today or date.today()
+
+    partitions = read_partitions(cursor)
+    try:
+        require_range_columns(partitions)
+    except ValueError as e:
+        return [str(e)]
+
+    lower = None
+    for p in partitions:
+        span = f"{lower or '...'} to {p.bound or 'MAXVALUE'}"
+        logger.info(f"{p.name:<10} {span:<26} ~{p.rows:>10} rows  "
+                    f"{p.data_bytes / 2**20:8.1f} MiB data  {p.index_bytes / 2**20:8.1f} MiB index")
+        lower = p.bound
+
+    problems = []
+    if partitions[-1].bound is None:
+        # TABLE_ROWS is an estimate; count the catch-all exactly
+        cursor.execute(f"SELECT COUNT(*) FROM {PARTITIONED_TABLE} PARTITION ({partitions[-1].name})")
+        overflow = cursor.fetchone()[0]
+        if overflow:
+            problems.append(f"{overflow} rows in {partitions[-1].name}; run --partitions to split them out")
+    bounds = [p.bound for p in partitions if p.bound is not None]
+    target = coverage_target(today, granularity, ahead)
+    if not bounds or bounds[-1] < target:
+        problems.append(f"Partitions end at {bounds[-1] if bounds else 'none'}, expected through {target}; "
+                        f"run --partitions")
+    total = sum(p.data_bytes + p.index_bytes for p in partitions)
+    logger.info(f"{len(partitions)} partitions, {total / 2**20:.1f} MiB in total")
+    for problem in problems:
+        logger.warning(problem)
+    return problems
+
+def manage_partitions(args):
+    """Run the partition commands selected on the command line in one pooled session"""
+    with get_pool(DB_PARAMS, pool_size=1).transaction() as cursor:
+        if args.repartition:
+            repartition(cursor, args.granularity, args.ahead)
+        if args.partitions:
+            ensure_partitions(cursor, args.granularity, args.ahead)
+            apply_retention(cursor, args.retention_months, args.retention_action)
+        if args.check_partitions:
+            return not check_partitions(cursor, args.granularity, args.ahead)
+    return True
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Create the F&O database and tables')
+    parser.add_argument('--rebuild-latest', action='store_true',
+                        help='Recompute fo_market_latest from the full history (e.g. after a backfill loaded outside the pipeline)')
+    parser.add_argument('--partitions', action='store_true',
+                        help='Create upcoming partitions and archive/drop those past the retention window')
+    parser.add_argument('--check-partitions', action='store_true',
+                        help='Report partition ranges and sizes; exit 1 if p_max holds rows or upcoming periods are missing')
+    parser.add_argument('--repartition', action='store_true',
+                        help='Rebuild the table as RANGE COLUMNS (request_date) partitions (copies the table)')
+    parser.add_argument('--granularity', choices=['year', 'month'], required=False,
+                        help='Period of new partitions (default config.DB_PARTITION_GRANULARITY)')
+    parser.add_argument('--ahead', type=int, required=False,
+                        help='Future periods to keep partitioned (default config.DB_PARTITIONS_AHEAD)')
+    parser.add_argument('--retention-months', type=int, required=False,
+                        help='Expire partitions older than this many months; 0 keeps all '
+                             '(default config.DB_PARTITION_RETENTION_MONTHS)')
+    parser.add_argument('--retention-action', choices=['archive', 'drop'], required=False,
+                        help='What to do with expired partitions (default config.DB_PARTITION_RETENTION_ACTION)')
+    args = parser.parse_args()
+
+    if not create_database_if_not_exists():
         logger.error("Database setup failed")
         sys.exit(1)
+    logger.info("Database setup completed successfully")
+    if args.rebuild_latest:
+        try:
+            rebuild_latest_table(DB_PARAMS)
+        except Error as e:
+            logger.error(f"Error rebuilding fo_market_latest: {e}")
+            sys.exit(1)
+    if args.partitions or args.check_partitions or args.repartition:
+        try:
+            healthy = manage_partitions(args)
+        except (Error, ValueError) as e:
+            logger.error(f"Partition maintenance failed: {e}")
+            sys.exit(1)
+        if not healthy:
+            sys.exit(1)
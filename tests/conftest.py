@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Keep data, state and metrics of the code under test out of the working tree
+os.environ.setdefault('FO_BASE_PATH', tempfile.mkdtemp(prefix='fo_tests_'))
+os.environ.setdefault('FO_DB_ENABLED', 'false')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers each path with its scripted responses in order (the last one repeats)"""
+
+    def do_GET(self):
+        responses = self.server.routes.get(self.path, [(404, b'', {})])
+        hits = self.server.hits.setdefault(self.path, 0)
+        self.server.hits[self.path] = hits + 1
+        status, body, headers = responses[min(hits, len(responses) - 1)]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    """Local HTTP server standing in for NSE; set server.routes = {path: [(status, body, headers), ...]}"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.routes, server.hits = {}, {}
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
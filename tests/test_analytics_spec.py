@@ -0,0 +1,109 @@
+import io
+import json
+import zipfile
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import config
+from benchmarks.synthetic import BHAVCOPY_COLUMNS
+from src.analytics_spec import evaluate_specs, validate_spec
+from src.bhavcopy_reader import read_bhavcopy
+
+TRADE_DATE = datetime(2025, 3, 5)
+EXAMPLES = config.ANALYTICS_SPEC_EXAMPLES
+
+# (FinInstrmTp, TckrSymb, XpryDt, StrkPric, OptnTp, OpnIntrst, ChngInOpnIntrst, TtlTradgVol)
+ROWS = [
+    ('STF', 'RELIANCE', '2025-03-27', None, '', 9000, 90, 5000),
+    # Index futures: a weekly NIFTY contract is not a monthly expiry
+    ('IDF', 'NIFTY', '2025-03-27', None, '', 1000, 10, 100),
+    ('IDF', 'NIFTY', '2025-04-24', None, '', 500, 5, 50),
+    ('IDF', 'NIFTY', '2025-03-13', None, '', 700, 7, 70),
+    ('IDF', 'BANKNIFTY', '2025-03-27', None, '', 300, -3, 30),
+    # Stock options: only the nearest expiry with open interest counts per strike;
+    # one leg has no traded volume at all
+    ('STO', 'RELIANCE', '2025-03-27', 1200, 'CE', 40, 4, 10),
+    ('STO', 'RELIANCE', '2025-03-27', 1200, 'PE', 60, 6, None),
+    ('STO', 'RELIANCE', '2025-04-24', 1200, 'CE', 99, 9, 1),
+    ('STO', 'RELIANCE', '2025-03-27', 1300, 'CE', 0, 0, 2),
+    # Index options
+    ('IDO', 'NIFTY', '2025-03-27', 22000, 'PE', 200, 20, 5),
+    ('IDO', 'NIFTY', '2025-03-27', 22000, 'CE', 100, 10, 5),
+]
+
+
+@pytest.fixture(scope='module')
+def bhavcopy_zip():
+    frame = pd.DataFrame(ROWS, columns=['FinInstrmTp', 'TckrSymb', 'XpryDt', 'StrkPric', 'OptnTp', 'OpnIntrst',
+                                        'ChngInOpnIntrst', 'TtlTradgVol'])
+    frame = frame.reindex(columns=BHAVCOPY_COLUMNS, fill_value='')
+    frame['OpnIntrst'] = frame['OpnIntrst'].astype('Int64')
+    frame['TtlTradgVol'] = frame['TtlTradgVol'].astype('Int64')
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        zip_file.writestr(f"BhavCopy_NSE_FO_0_0_0_{TRADE_DATE:%Y%m%d}_F_0000.csv", frame.to_csv(index=False))
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def outputs(bhavcopy_zip):
+    data = read_bhavcopy(bhavcopy_zip, 'STF', 1000, analytics_specs=EXAMPLES)
+    return evaluate_specs(data, '2025-03-05', EXAMPLES)
+
+
+@pytest.mark.parametrize('spec, message', [
+    ({**EXAMPLES['index_futures'], 'having': 1}, 'unknown keys'),
+    ({'metrics': {'TtlTradgVol': 'sum'}}, "'instruments' is required"),
+    ({**EXAMPLES['index_futures'], 'expiry': 'weekly'}, 'expiry must be one of'),
+    ({'instruments': ['IDF'], 'group_by': ['TckrSymb']}, "needs 'metrics'"),
+    ({'instruments': ['STO'], 'metrics': {'TtlTradgVol': 'sum'}, 'put_call_ratio': 'OpnIntrst'}, "needs 'group_by'"),
+])
+def test_invalid_specs_are_rejected_before_the_read(spec, message, bhavcopy_zip):
+    with pytest.raises(ValueError, match=message):
+        validate_spec('bad', spec)
+    with pytest.raises(ValueError, match=message):
+        read_bhavcopy(bhavcopy_zip, analytics_specs={'bad': spec})
+
+
+def test_base_rows_keep_an_int64_volume(bhavcopy_zip):
+    data = read_bhavcopy(bhavcopy_zip, 'STF', 1000, analytics_specs=EXAMPLES)
+    assert data['TtlTradgVol'].dtype == 'int64'
+    # The option leg without a volume is kept by the specs and counts as zero
+    assert len(data) == len(ROWS) and data['TtlTradgVol'].sum() == 5273
+
+
+def test_index_futures_keep_monthly_expiries(outputs):
+    result = outputs['index_futures'].set_index('Symbol')
+    assert result.loc['NIFTY', ['Trade_volume', 'Open_interest', 'Change_in_OI']].tolist() == [150, 1500, 15]
+    assert result.loc['BANKNIFTY', ['Trade_volume', 'Open_interest', 'Change_in_OI']].tolist() == [30, 300, -3]
+    assert (result['Request_Date'] == '2025-03-05').all()
+
+
+def test_stock_option_oi_by_strike_uses_the_nearest_expiry(outputs):
+    result = outputs['stock_option_oi_by_strike']
+    assert result[['Symbol', 'Expiry_Date', 'Strike', 'Option_Type', 'Open_interest']].values.tolist() == [
+        ['RELIANCE', '2025-03-27', 1200.0, 'CE', 40],
+        ['RELIANCE', '2025-03-27', 1200.0, 'PE', 60],
+    ]
+    assert result['Trade_volume'].tolist() == [10, 0]
+
+
+def test_put_call_ratio_per_symbol(outputs):
+    result = outputs['option_put_call_ratio'].set_index('Symbol')
+    assert result.loc['RELIANCE', ['Put_Open_interest', 'Call_Open_interest']].tolist() == [60, 139]
+    assert result.loc['RELIANCE', 'Put_Call_Ratio'] == round(60 / 139, 4)
+    assert result.loc['NIFTY', 'Put_Call_Ratio'] == 2.0
+    assert result.loc['RELIANCE', 'Trade_volume'] == 13
+
+
+def test_specs_load_from_inline_json_or_a_file(monkeypatch, tmp_path):
+    specs = {'index_futures': EXAMPLES['index_futures']}
+    monkeypatch.setenv('FO_ANALYTICS_SPECS', json.dumps(specs))
+    assert config._env('ANALYTICS_SPECS', {}) == specs
+
+    path = tmp_path / 'specs.json'
+    path.write_text(json.dumps(specs))
+    monkeypatch.setenv('FO_ANALYTICS_SPECS', str(path))
+    assert config._env('ANALYTICS_SPECS', {}) == specs
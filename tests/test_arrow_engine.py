@@ -0,0 +1,90 @@
+import io
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import combine_code
+import config
+from benchmarks.synthetic import (VOLATILITY_COLUMN, expiries_for, make_bhavcopy_frame, make_secban_csv,
+                                  make_volatility_csv)
+from src import arrow_engine
+
+TRADE_DATE = datetime(2025, 3, 5)
+MONTHLY = expiries_for(TRADE_DATE)[0].strftime('%Y-%m-%d')
+
+# (symbol, XpryDt, volume): STF rows added to a small synthetic bhavcopy
+EDGE_ROWS = [
+    # Equal volumes and volatilities: average ranks for ties
+    ('TIEA', MONTHLY, 5000), ('TIEB', MONTHLY, 5000), ('TIEC', MONTHLY, 5000),
+    # One symbol twice: only the last joined row is kept
+    ('DUP', MONTHLY, 4000), ('DUP', MONTHLY, 6000),
+    # Missing or unparseable expiries are dropped
+    ('NOEXPIRY', '', 9000), ('BADEXPIRY', 'not-a-date', 9000), ('BADDAY', '2025-02-30', 9000),
+    ('BANNED', MONTHLY, 7000),
+]
+
+
+def zipped(frame):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(f"BhavCopy_NSE_FO_0_0_0_{TRADE_DATE:%Y%m%d}_F_0000.csv", frame.to_csv(index=False))
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope='module')
+def nse_files():
+    bhavcopy = make_bhavcopy_frame(TRADE_DATE, scale=0.05)
+    edge = pd.DataFrame([bhavcopy.iloc[0]] * len(EDGE_ROWS)).reset_index(drop=True)
+    edge['FinInstrmTp'] = 'STF'
+    edge['TckrSymb'], edge['XpryDt'], edge['TtlTradgVol'] = zip(*EDGE_ROWS)
+    bhavcopy = pd.concat([bhavcopy, edge], ignore_index=True)
+
+    volatility = pd.read_csv(io.BytesIO(make_volatility_csv(TRADE_DATE, scale=0.05)))
+    extra = pd.DataFrame([volatility.iloc[0]] * 7).reset_index(drop=True)
+    extra['Symbol'] = ['TIEA', 'TIEB', 'TIEC', 'DUP', 'NOEXPIRY', 'BADEXPIRY', 'BANNED']
+    extra[VOLATILITY_COLUMN] = [0.5, 0.5, 0.5, 0.6, 0.7, 0.7, 0.8]
+    volatility = pd.concat([volatility, extra, extra.iloc[[3]].assign(Symbol='BADDAY')], ignore_index=True)
+
+    secban = make_secban_csv(datetime(2025, 3, 6), scale=0.05, banned=20) + b"99,BANNED\n"
+    return zipped(bhavcopy), volatility.to_csv(index=False).encode(), secban
+
+
+def final_data(engine, files, monkeypatch):
+    monkeypatch.setattr(config, 'COMPUTE_ENGINE', engine)
+    bhavcopy_zip, volatility_csv, secban_csv = files
+    bhavcopy = combine_code.transform_data(combine_code.parse_file('bhavcopy', bhavcopy_zip), 'Bhavcopy')
+    volatility = combine_code.transform_data(combine_code.parse_file('volatility', volatility_csv), 'Volatility')
+    secban = combine_code.transform_data(combine_code.parse_file('secban', secban_csv), 'Secban')
+    data = combine_code.build_final_data(bhavcopy, volatility, secban, TRADE_DATE)
+    return data.drop(columns='Processed_Timestamp').reset_index(drop=True)
+
+
+def test_arrow_engine_matches_pandas(nse_files, monkeypatch):
+    expected = final_data('pandas', nse_files, monkeypatch)
+    actual = final_data('arrow', nse_files, monkeypatch)
+    pd.testing.assert_frame_equal(expected, actual)
+
+    # The edge cases really are in the data both engines agreed on
+    symbols = expected['Symbol'].astype(str)
+    ties = expected[symbols.str.startswith('TIE')]
+    assert len(ties) == 3 and ties['Percentile_Volume'].nunique() == 1 and ties['Percentile_Volatility'].nunique() == 1
+    assert expected.loc[symbols == 'DUP', 'Trade_volume'].tolist() == [6000]
+    assert not symbols.isin(['NOEXPIRY', 'BADEXPIRY', 'BADDAY', 'BANNED']).any()
+    assert symbols.is_unique
+
+
+def test_percentile_ranks_match_pandas_for_ties():
+    values = pd.Series([3.0, 1.0, 3.0, 2.0, 3.0, 1.0, 5.0])
+    expected = np.ceil(values.rank(pct=True) * 100).astype('int8').tolist()
+    assert arrow_engine.percentile_ranks(pa.array(values)).to_pylist() == expected
+
+
+def test_keep_last_keeps_the_last_row_of_each_key_in_order():
+    table = pa.table({'Symbol': ['A', 'B', 'A', 'C', 'B'], 'n': [1, 2, 3, 4, 5]})
+    assert arrow_engine.keep_last(table, 'Symbol').to_pydict() == {'Symbol': ['A', 'C', 'B'], 'n': [3, 4, 5]}
+    expected = table.to_pandas().drop_duplicates('Symbol', keep='last')
+    assert arrow_engine.keep_last(table, 'Symbol').to_pandas().equals(expected.reset_index(drop=True))
@@ -0,0 +1,84 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import config
+from src import async_downloader
+from src.raw_cache import RawFileCache
+
+DAY = datetime(2025, 3, 5)  # Wednesday, secban file dated the next trading day
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Backoff delays requested by fetch_file; the actual sleep is shortened"""
+    requested = []
+
+    def record(attempt, retry_after=None):
+        requested.append(original(attempt, retry_after))
+        return 0.01
+
+    original = async_downloader.backoff_delay
+    monkeypatch.setattr(async_downloader, 'backoff_delay', record)
+    monkeypatch.setattr(config, 'OFFLINE_MODE', False)
+    return requested
+
+
+def fetch(server, tmp_path):
+    urls = {file_type: server.url + f'/{file_type}/{{date}}' for file_type in ('bhavcopy', 'volatility', 'secban')}
+    return asyncio.run(async_downloader.fetch_all([DAY], urls=urls, cache=RawFileCache(str(tmp_path))))
+
+
+def test_success_is_returned_and_cached(stand_in_server, tmp_path, delays):
+    stand_in_server.routes = {
+        '/bhavcopy/20250305': [(200, b'bhavcopy-bytes', {})],
+        '/volatility/05032025': [(200, b'volatility-bytes', {})],
+        '/secban/06032025': [(200, b'secban-bytes', {})],
+    }
+    files = fetch(stand_in_server, tmp_path)['2025-03-05']
+
+    assert files == {'bhavcopy': b'bhavcopy-bytes', 'volatility': b'volatility-bytes', 'secban': b'secban-bytes'}
+    assert delays == []
+    assert RawFileCache(str(tmp_path)).get('secban', datetime(2025, 3, 6)) == b'secban-bytes'
+
+
+def test_404_is_not_retried(stand_in_server, tmp_path, delays):
+    stand_in_server.routes = {'/bhavcopy/20250305': [(200, b'bhavcopy-bytes', {})]}
+    files = fetch(stand_in_server, tmp_path)['2025-03-05']
+
+    assert files['bhavcopy'] == b'bhavcopy-bytes'
+    assert files['volatility'] is None and files['secban'] is None
+    assert stand_in_server.hits['/volatility/05032025'] == 1
+    assert stand_in_server.hits['/secban/06032025'] == 1
+    assert delays == []
+
+
+def test_429_and_5xx_are_retried_with_backoff(stand_in_server, tmp_path, delays, monkeypatch):
+    monkeypatch.setattr(config, 'DOWNLOAD_BACKOFF_BASE', 1.0)
+    monkeypatch.setattr(config, 'DOWNLOAD_MAX_RETRIES', 4)
+    stand_in_server.routes = {
+        '/bhavcopy/20250305': [(503, b'', {}), (502, b'', {}), (200, b'bhavcopy-bytes', {})],
+        '/volatility/05032025': [(429, b'', {'Retry-After': '7'}), (200, b'volatility-bytes', {})],
+        '/secban/06032025': [(200, b'secban-bytes', {})],
+    }
+    files = fetch(stand_in_server, tmp_path)['2025-03-05']
+
+    assert files['bhavcopy'] == b'bhavcopy-bytes' and files['volatility'] == b'volatility-bytes'
+    assert stand_in_server.hits['/bhavcopy/20250305'] == 3
+    assert stand_in_server.hits['/volatility/05032025'] == 2
+    # Retry-After is honoured; otherwise delays double per attempt (plus up to 10% jitter)
+    assert 7.0 in delays
+    backoff = sorted(delay for delay in delays if delay != 7.0)
+    assert len(backoff) == 2
+    assert 1.0 <= backoff[0] <= 1.1 and 2.0 <= backoff[1] <= 2.2
+
+
+def test_retries_give_up_after_max_retries(stand_in_server, tmp_path, delays, monkeypatch):
+    monkeypatch.setattr(config, 'DOWNLOAD_MAX_RETRIES', 2)
+    stand_in_server.routes = {'/bhavcopy/20250305': [(500, b'', {})]}
+    files = fetch(stand_in_server, tmp_path)['2025-03-05']
+
+    assert files['bhavcopy'] is None
+    assert stand_in_server.hits['/bhavcopy/20250305'] == 3
+    assert len(delays) == 2
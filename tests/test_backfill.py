@@ -0,0 +1,97 @@
+from collections import defaultdict
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from src import backfill
+from src.date_utils import TradingCalendar
+from src.frame_store import write_frame
+from src.pipeline import JOINED_FRAME, StageManifest
+from src.rolling_percentiles import RollingStateStore, add_rolling_percentiles, rebuild_rolling_state
+
+CALENDAR = TradingCalendar()
+DAYS = [str(day) for day in CALENDAR.trading_days('2025-03-03', '2025-03-14')]
+
+
+def day_frame(request_date, i):
+    return pd.DataFrame({
+        'Symbol': ['AAA', 'BBB'],
+        'Trade_volume': [100 + i * 7 % 5, 200 - i],
+        'Daily_Volatility': [0.01 * (i % 3 + 1), 0.02],
+        'Request_Date': pd.Timestamp(request_date)
+    })
+
+
+@pytest.fixture
+def month(tmp_path, monkeypatch):
+    """A manifest plus the frames collect_month hands to write_outputs"""
+    monkeypatch.setattr(config, 'INTERMEDIATE_PATH', str(tmp_path / 'intermediate'))
+    monkeypatch.setattr(config, 'ROLLING_STATE_PATH', str(tmp_path / 'rolling_state.npz'))
+    monkeypatch.setattr(config, 'ROLLING_WINDOWS', (3, 5))
+    monkeypatch.setattr(config, 'ROLLING_MIN_PERIODS', 2)
+    monkeypatch.setattr('src.rolling_percentiles.get_calendar', lambda: CALENDAR)
+    writes = []
+    monkeypatch.setattr(backfill, 'write_outputs',
+                        lambda manifest, data, year_month, db_method=None: writes.append(data))
+    manifest = StageManifest(str(tmp_path / 'manifest.sqlite'))
+    yield manifest, writes
+    manifest.close()
+
+
+def collect(manifest, futures=None, joined_dates=(), done_dates=(), store=None):
+    results = {}
+    backfill.collect_month('202503', futures or {}, defaultdict(float), defaultdict(int), results, manifest,
+                           joined_dates, done_dates, store)
+    return results
+
+
+def test_resumed_and_complete_dates_go_through_the_rolling_state(month):
+    manifest, writes = month
+    frames = [day_frame(day, i) for i, day in enumerate(DAYS)]
+    expected = add_rolling_percentiles(pd.concat(frames, ignore_index=True),
+                                       RollingStateStore(path=config.ROLLING_STATE_PATH, load=False))
+    for day, frame in zip(DAYS, frames):
+        write_frame(frame, day, JOINED_FRAME)
+
+    # The daily job already ran past the month, so the state file is ahead of it
+    add_rolling_percentiles(pd.concat(frames, ignore_index=True))
+    store = rebuild_rolling_state(str(np.datetime64(DAYS[0]) - 1))
+    results = collect(manifest, joined_dates=DAYS[4:], done_dates=DAYS[:4], store=store)
+
+    # Complete dates only advance the state; resumed dates are scored and written
+    assert sorted(results) == DAYS[4:]
+    written = pd.concat(writes).set_index(['Request_Date', 'Symbol']).sort_index()
+    expected = expected.set_index(['Request_Date', 'Symbol']).loc[written.index]
+    for column in ('TS_Percentile_Volume_5', 'ZScore_Volume_5', 'TS_Percentile_Volatility_3'):
+        assert written[column].notna().all()
+        pd.testing.assert_series_equal(written[column], expected[column])
+
+
+def test_a_crashed_worker_marks_its_stage_failed(month):
+    manifest, writes = month
+    manifest.mark_done(DAYS[0], 'downloaded')
+    crashed = Future()
+    crashed.set_exception(BrokenProcessPool('worker killed'))
+
+    results = collect(manifest, {crashed: DAYS[0]})
+    assert results == {DAYS[0]: None} and not writes
+    assert manifest.status(DAYS[0]) == {'downloaded': 'done', 'transformed': 'failed'}
+    assert 'transformed' in manifest.pending(DAYS[0])
+
+
+def test_run_backfill_returns_its_report(month, monkeypatch):
+    manifest, writes = month
+    monkeypatch.setattr(config, 'PIPELINE_MANIFEST_PATH', manifest.path)
+    monkeypatch.setattr(config, 'DB_ENABLED', False)
+    for day in DAYS[:5]:
+        for name in ('downloaded', 'transformed', 'joined', 'parquet'):
+            manifest.mark_done(day, name)
+
+    results, report = backfill.run_backfill(DAYS[0], DAYS[4], workers=1)
+    assert results == {} and not writes
+    assert report.startswith('Backfill processed 0 dates')
+    assert all(f"  {stage:<10}" in report for stage in backfill.STAGES)
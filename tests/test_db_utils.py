@@ -0,0 +1,444 @@
+import os
+import re
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import mysql.connector
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from src import db_utils
+from src.schema import PANDAS_DTYPES, apply_output_dtypes
+
+
+class RecordingCursor:
+    """
+    Records statements; LOAD DATA reads the temporary file before it is removed.
+    fetchall returns the rows a test puts in self.rows.
+    """
+    rowcount = 0
+
+    def __init__(self):
+        self.statements = []
+        self.loaded = None
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.statements.append((' '.join(query.split()), params))
+        if query.startswith('LOAD DATA'):
+            self.load_path = params[0]
+            with open(params[0]) as f:
+                self.loaded = f.read()
+
+    def executemany(self, query, seq_params):
+        self.statements.append((' '.join(query.split()), list(seq_params)))
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class RecordingPool:
+    def __init__(self):
+        self.cursor = RecordingCursor()
+        self.params = None
+
+    @contextmanager
+    def transaction(self):
+        yield self.cursor
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = RecordingPool()
+
+    def get_pool(db_params, **kwargs):
+        pool.params = db_params
+        return pool
+
+    monkeypatch.setattr(db_utils, 'get_pool', get_pool)
+    return pool
+
+
+def frame(rows):
+    """fo_market_analysis-shaped rows, as insert_fo_data hands them over"""
+    return pd.DataFrame({
+        'symbol': [f'SYM{i}' for i in range(rows)],
+        'request_date': pd.to_datetime(['2025-03-05'] * rows),
+        'expiry_date': pd.to_datetime(['2025-03-27'] * rows),
+        'processed_timestamp': pd.to_datetime(['2025-03-05 18:30:00'] * rows),
+        'daily_volatility': [0.0125] * rows,
+        'trade_volume': range(rows),
+        'percentile_volume': [50] * rows,
+        'percentile_volatility': [60] * rows,
+        'average_percentile': [55.0] * rows,
+        'average_percentile_desc': ['Moderate'] * rows
+    })
+
+
+COLUMNS = 10
+UPDATED = {'expiry_date', 'processed_timestamp', 'daily_volatility', 'trade_volume', 'percentile_volume',
+           'percentile_volatility', 'average_percentile', 'average_percentile_desc'}
+
+
+def test_batch_sends_staging_ddl_batches_and_one_merge(pool):
+    db_utils.bulk_insert_to_db(frame(12), 'fo_market_analysis', {'database': 'test'}, method='batch', batch_size=5)
+    statements = [query for query, _ in pool.cursor.statements]
+
+    assert statements[0] == 'DROP TEMPORARY TABLE IF EXISTS fo_market_analysis_stage'
+    assert statements[1] == ('CREATE TEMPORARY TABLE fo_market_analysis_stage AS SELECT '
+                             + ', '.join(frame(0).columns) + ' FROM fo_market_analysis LIMIT 0')
+
+    batches = [(query, params) for query, params in pool.cursor.statements
+               if query.startswith('INSERT INTO fo_market_analysis_stage')]
+    assert [len(params) // COLUMNS for _, params in batches] == [5, 5, 2]
+    assert [query.count('(' + ', '.join(['%s'] * COLUMNS) + ')') for query, _ in batches] == [5, 5, 2]
+    # Native driver values: dates as date, timestamps as datetime
+    assert batches[0][1][:4] == ['SYM0', date(2025, 3, 5), date(2025, 3, 27), datetime(2025, 3, 5, 18, 30)]
+
+    merges = [query for query in statements if query.startswith('INSERT INTO fo_market_analysis (')]
+    assert len(merges) == 1
+    assert 'SELECT symbol, request_date' in merges[0] and 'FROM fo_market_analysis_stage' in merges[0]
+    update = merges[0].split('ON DUPLICATE KEY UPDATE')[1]
+    assert set(re.findall(r'(\w+)=VALUES', update)) == UPDATED
+    assert statements[-2] == 'DROP TEMPORARY TABLE IF EXISTS fo_market_analysis_stage'
+    # fo_market_latest is maintained in the same transaction
+    assert statements[-1].startswith('INSERT INTO fo_market_latest')
+
+
+def test_batch_size_defaults_to_config(pool, monkeypatch):
+    monkeypatch.setattr(db_utils.config, 'DB_BATCH_SIZE', 4)
+    db_utils.bulk_insert_to_db(frame(9), 'other_table', {'database': 'test'}, method='batch')
+    batches = [params for query, params in pool.cursor.statements if query.startswith('INSERT INTO other_table_stage')]
+    assert [len(params) // COLUMNS for params in batches] == [4, 4, 1]
+
+
+def test_load_data_stages_a_tsv_and_enables_local_infile(pool):
+    df = frame(3)
+    df.loc[1, 'daily_volatility'] = None
+    db_utils.bulk_insert_to_db(df, 'other_table', {'database': 'test'}, method='load_data')
+
+    assert pool.params['allow_local_infile'] is True
+    load = next(query for query, _ in pool.cursor.statements if query.startswith('LOAD DATA'))
+    assert load.startswith('LOAD DATA LOCAL INFILE %s INTO TABLE other_table_stage')
+    lines = pool.cursor.loaded.splitlines()
+    assert len(lines) == 3 and lines[1].split('\t')[4] == '\\N'
+    assert not os.path.exists(pool.cursor.load_path)
+
+
+def test_unknown_method_is_rejected(pool):
+    with pytest.raises(ValueError, match='Unknown bulk insert method'):
+        db_utils.bulk_insert_to_db(frame(1), 'fo_market_analysis', {'database': 'test'}, method='copy')
+    assert pool.cursor.statements == []
+
+
+def statements(cursor, prefix):
+    return [(query, params) for query, params in cursor.statements if query.startswith(prefix)]
+
+
+def stored(df, changed=()):
+    """SELECT symbol, request_date, row_hash rows for df, with a different hash for the changed symbols"""
+    hashes = db_utils.row_hashes(df)
+    return [(symbol, request_date.date(), 0 if symbol in changed else row_hash)
+            for symbol, request_date, row_hash in zip(df['symbol'], df['request_date'], hashes)]
+
+
+@pytest.fixture
+def delta(pool):
+    """SYM0-SYM3 are stored; the new run changes SYM1, drops SYM3 and adds SYM4"""
+    previous = frame(4)
+    pool.cursor.rows = stored(previous, changed={'SYM1'})
+    df = frame(5).drop(index=3).reset_index(drop=True)
+    df['row_hash'] = db_utils.row_hashes(df)
+    return df
+
+
+def test_delta_classifies_inserted_changed_unchanged_and_deleted_rows(pool, delta):
+    counts = db_utils.delta_upsert(delta, 'fo_market_analysis', {'database': 'test'})
+    assert counts == {'inserted': 1, 'updated': 1, 'unchanged': 2, 'deleted': 1}
+
+    select = statements(pool.cursor, 'SELECT symbol, request_date, row_hash')
+    assert select == [('SELECT symbol, request_date, row_hash FROM fo_market_analysis WHERE request_date IN (%s)',
+                       [date(2025, 3, 5)])]
+
+
+@pytest.mark.parametrize('method', ['executemany', 'batch'])
+def test_delta_sends_only_changed_rows(pool, delta, method):
+    db_utils.delta_upsert(delta, 'fo_market_analysis', {'database': 'test'}, method=method)
+
+    if method == 'executemany':
+        (_, rows), = statements(pool.cursor, 'INSERT INTO fo_market_analysis (')
+        sent = [row[0] for row in rows]
+    else:
+        (_, params), = statements(pool.cursor, 'INSERT INTO fo_market_analysis_stage')
+        sent = params[::len(delta.columns)]
+    assert sent == ['SYM1', 'SYM4']
+    # The latest table gets the same rows (then SYM3's rebuild from the history)
+    _, latest = statements(pool.cursor, 'INSERT INTO fo_market_latest')[0]
+    assert [row[0] for row in latest] == ['SYM1', 'SYM4']
+
+
+def test_delta_deletes_dropped_rows_and_rebuilds_their_latest_row(pool, delta):
+    db_utils.delta_upsert(delta, 'fo_market_analysis', {'database': 'test'})
+
+    deletes = statements(pool.cursor, 'DELETE FROM')
+    assert deletes[0] == ('DELETE FROM fo_market_analysis WHERE symbol = %s AND request_date = %s',
+                          [('SYM3', '2025-03-05')])
+    # Only the deleted symbols fall back to their previous date
+    assert deletes[1] == ('DELETE FROM fo_market_latest WHERE symbol IN (%s)', ['SYM3'])
+    query, params = pool.cursor.statements[-1]
+    assert query.startswith('INSERT INTO fo_market_latest') and 'MAX(request_date)' in query
+    assert params == ['SYM3']
+
+
+def test_nothing_is_written_when_no_row_changed(pool):
+    df = frame(3)
+    df['row_hash'] = db_utils.row_hashes(df)
+    pool.cursor.rows = stored(df)
+
+    counts = db_utils.delta_upsert(df, 'fo_market_analysis', {'database': 'test'})
+    assert counts == {'inserted': 0, 'updated': 0, 'unchanged': 3, 'deleted': 0}
+    assert [query for query, _ in pool.cursor.statements if not query.startswith('SELECT')] == []
+
+
+def test_row_hash_is_stable_across_dtype_round_trips():
+    df = frame(3)
+    # As insert_fo_data hands it over: the compact output dtypes (int8 percentiles, categories)
+    output_names = {name.lower(): name for name in PANDAS_DTYPES}
+    compact = apply_output_dtypes(df.rename(columns=output_names)).rename(columns=str.lower)
+    # As read back from an Arrow IPC frame, with float noise and a new processing time
+    mapped = pa.Table.from_pandas(compact, preserve_index=False).to_pandas()
+    mapped['daily_volatility'] += 1e-9
+    mapped['processed_timestamp'] = pd.Timestamp('2025-03-06 09:00:00')
+
+    expected = db_utils.row_hashes(df).tolist()
+    assert db_utils.row_hashes(compact).tolist() == expected
+    assert db_utils.row_hashes(mapped).tolist() == expected
+
+    mapped.loc[1, 'trade_volume'] += 1
+    assert db_utils.row_hashes(mapped).tolist() != expected
+
+
+def latest_assignments(query):
+    return re.split(r',\s*(?=\w+=)', query.split('ON DUPLICATE KEY UPDATE')[1].strip())
+
+
+def upsert_latest(table, query, rows):
+    """
+    Apply update_latest's statement to {symbol: row} the way MySQL runs
+    ON DUPLICATE KEY UPDATE: assignments left to right, each seeing the
+    columns assigned before it
+    """
+    columns = re.search(r'INSERT INTO \w+ \((.*?)\) VALUES', query).group(1).split(', ')
+    assignments = latest_assignments(query)
+    for values in rows:
+        new = dict(zip(columns, values))
+        if new['symbol'] not in table:
+            table[new['symbol']] = new
+            continue
+        row = table[new['symbol']]
+        for assignment in assignments:
+            guarded = re.fullmatch(r'(\w+)=IF\(VALUES\(request_date\) >= request_date, VALUES\(\1\), \1\)',
+                                   assignment)
+            if guarded:
+                column = guarded.group(1)
+                row[column] = new[column] if new['request_date'] >= row['request_date'] else row[column]
+            else:
+                assert assignment == 'request_date=GREATEST(request_date, VALUES(request_date))'
+                row['request_date'] = max(row['request_date'], new['request_date'])
+    return table
+
+
+def dated(request_date, trade_volume, symbols=('SYM0',)):
+    df = frame(len(symbols))
+    df['symbol'] = list(symbols)
+    df['request_date'] = pd.Timestamp(request_date)
+    df['trade_volume'] = trade_volume
+    return df
+
+
+def test_update_latest_sends_each_symbols_newest_row(pool):
+    df = pd.concat([dated('2025-03-06', 20, ('SYM0', 'SYM1')), dated('2025-03-05', 10, ('SYM0', 'SYM1'))])
+    assert db_utils.update_latest(pool.cursor, df, 'fo_market_analysis') == 2
+
+    (query, rows), = pool.cursor.statements
+    assert query.startswith('INSERT INTO fo_market_latest (' + ', '.join(db_utils.LATEST_COLUMNS) + ')')
+    assert [(row[0], row[1], row[5]) for row in rows] == [('SYM0', date(2025, 3, 6), 20),
+                                                          ('SYM1', date(2025, 3, 6), 20)]
+    # request_date is assigned last, after every column compared against it
+    assignments = latest_assignments(query)
+    assert assignments[-1] == 'request_date=GREATEST(request_date, VALUES(request_date))'
+    assert len(assignments) == len(db_utils.LATEST_COLUMNS) - 1
+
+
+def test_an_older_date_never_overwrites_a_newer_latest_row(pool):
+    table = {}
+    for request_date, volume in [('2025-03-06', 20), ('2025-03-05', 10), ('2025-03-06', 25), ('2025-03-07', 30),
+                                 ('2025-03-04', 5)]:
+        pool.cursor.statements.clear()
+        db_utils.update_latest(pool.cursor, dated(request_date, volume), 'fo_market_analysis')
+        (query, rows), = pool.cursor.statements
+        upsert_latest(table, query, rows)
+        if request_date == '2025-03-05':
+            assert (table['SYM0']['request_date'], table['SYM0']['trade_volume']) == (date(2025, 3, 6), 20)
+        if request_date == '2025-03-06' and volume == 25:
+            # Reloading the same date replaces it
+            assert table['SYM0']['trade_volume'] == 25
+    assert (table['SYM0']['request_date'], table['SYM0']['trade_volume']) == (date(2025, 3, 7), 30)
+
+
+def test_tables_without_a_latest_table_are_left_alone(pool):
+    assert db_utils.update_latest(pool.cursor, frame(2), 'other_table') == 0
+    assert pool.cursor.statements == []
+
+
+def test_rebuild_latest_for_symbols_reads_their_newest_stored_date(pool):
+    pool.cursor.rowcount = 2
+    assert db_utils.rebuild_latest(pool.cursor, symbols=['SYM1', 'SYM0', 'SYM1']) == 2
+
+    (delete, delete_params), (insert, insert_params) = pool.cursor.statements
+    assert delete == 'DELETE FROM fo_market_latest WHERE symbol IN (%s, %s)'
+    assert insert.startswith('INSERT INTO fo_market_latest (' + ', '.join(db_utils.LATEST_COLUMNS) + ') SELECT h.symbol')
+    assert ('JOIN (SELECT symbol, MAX(request_date) AS request_date FROM fo_market_analysis '
+            'WHERE symbol IN (%s, %s) GROUP BY symbol) m') in insert
+    assert 'ON h.symbol = m.symbol AND h.request_date = m.request_date' in insert
+    assert delete_params == insert_params == ['SYM0', 'SYM1']
+
+
+def test_rebuild_latest_without_symbols_rebuilds_every_row(pool):
+    db_utils.rebuild_latest(pool.cursor)
+    (delete, delete_params), (insert, insert_params) = pool.cursor.statements
+    assert delete == 'DELETE FROM fo_market_latest' and delete_params == []
+    assert 'FROM fo_market_analysis GROUP BY symbol' in insert and insert_params == []
+
+    pool.cursor.statements.clear()
+    assert db_utils.rebuild_latest(pool.cursor, symbols=[]) == 0
+    assert pool.cursor.statements == []
+
+
+def test_deleting_a_symbols_newest_date_rebuilds_its_latest_row(pool):
+    # SYM0 was stored for 2025-03-06 (its newest date) and is banned in the reload
+    pool.cursor.rows = stored(dated('2025-03-06', 20, ('SYM0', 'SYM1')))
+    df = dated('2025-03-06', 20, ('SYM1',))
+    df['row_hash'] = db_utils.row_hashes(df)
+    db_utils.delta_upsert(df, 'fo_market_analysis', {'database': 'test'})
+
+    queries = [query for query, _ in pool.cursor.statements]
+    assert queries[-3:-1] == ['DELETE FROM fo_market_analysis WHERE symbol = %s AND request_date = %s',
+                              'DELETE FROM fo_market_latest WHERE symbol IN (%s)']
+    assert queries[-1].startswith('INSERT INTO fo_market_latest') and pool.cursor.statements[-1][1] == ['SYM0']
+    # SYM1 is unchanged, so its latest row is not touched
+    assert not any(query.startswith('INSERT INTO fo_market_latest') and 'VALUES' in query for query in queries)
+
+
+class FakeConnection:
+    """mysql.connector connection stand-in; ping fails once healthy is cleared"""
+
+    def __init__(self, number):
+        self.number = number
+        self.healthy = True
+        self.connected = True
+        self.closed = False
+        self.commits = self.rollbacks = 0
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self.healthy:
+            raise mysql.connector.InterfaceError('server has gone away')
+
+    def cursor(self):
+        return RecordingCursor()
+
+    def is_connected(self):
+        return self.connected
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection the pool opens, in order"""
+    opened = []
+
+    def connect(**params):
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+
+    monkeypatch.setattr(db_utils.mysql.connector, 'connect', connect)
+    return opened
+
+
+def test_checkout_times_out_when_every_connection_is_in_use(connections):
+    pool = db_utils.ConnectionPool({'database': 'test'}, pool_size=1, wait_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError, match='within 0.05s'):
+            with pool.connection():
+                pass
+    # The held connection went back and is reused
+    with pool.connection() as conn:
+        assert conn is connections[0]
+    assert len(connections) == 1
+
+
+def test_a_connection_failing_the_health_check_is_replaced(connections):
+    # Every checkout pings (idle time is always above a negative interval)
+    pool = db_utils.ConnectionPool({'database': 'test'}, pool_size=1, health_check_interval=-1)
+    with pool.connection():
+        pass
+    connections[0].healthy = False
+
+    with pool.connection() as conn:
+        assert conn is connections[1]
+    assert connections[0].closed
+    metrics = pool.metrics()
+    assert (metrics['created'], metrics['idle'], metrics['health_check_failures']) == (1, 1, 1)
+
+
+def test_connections_return_to_the_pool_after_an_exception(connections):
+    pool = db_utils.ConnectionPool({'database': 'test'}, pool_size=1)
+    with pytest.raises(ValueError):
+        with pool.transaction():
+            raise ValueError('bad row')
+    assert connections[0].rollbacks == 1 and connections[0].commits == 0
+    assert (pool.metrics()['in_use'], pool.metrics()['idle']) == (0, 1)
+
+    # A driver error on a live connection keeps it; on a dropped one it is discarded
+    with pytest.raises(mysql.connector.Error):
+        with pool.transaction():
+            raise mysql.connector.DatabaseError('deadlock')
+    assert pool.metrics()['created'] == 1 and not connections[0].closed
+    with pytest.raises(mysql.connector.Error):
+        with pool.transaction():
+            connections[0].connected = False
+            raise mysql.connector.OperationalError('lost connection')
+    assert connections[0].closed
+    assert (pool.metrics()['created'], pool.metrics()['in_use'], pool.metrics()['idle']) == (0, 0, 0)
+    with pool.connection() as conn:
+        assert conn is connections[1]
+
+
+def test_metrics_count_checkouts_and_queries(connections):
+    pool = db_utils.ConnectionPool({'database': 'test'}, pool_size=2)
+    with pool.transaction() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.executemany('INSERT INTO t VALUES (%s)', [(1,), (2,)])
+        with pool.connection():
+            assert (pool.metrics()['in_use'], pool.metrics()['created']) == (2, 2)
+
+    metrics = pool.metrics()
+    assert (metrics['pool_size'], metrics['created'], metrics['in_use'], metrics['idle']) == (2, 2, 0, 2)
+    assert metrics['queries'] == 2 and metrics['query']['count'] == 2
+    assert metrics['wait']['count'] == 2 and metrics['wait']['max_ms'] >= metrics['wait']['p50_ms'] >= 0
+    assert connections[0].commits == 1
+
+    pool.close()
+    assert all(conn.closed for conn in connections) and pool.metrics()['created'] == 0
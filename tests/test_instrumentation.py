@@ -0,0 +1,49 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import config
+from src.instrumentation import _profile_enabled, finish_run, stage, start_run
+
+
+@pytest.mark.parametrize('option, name, expected', [
+    (('all',), 'parse', True),
+    ('all', 'parse', True),
+    (('parse', 'join'), 'join', True),
+    (('parse',), 'join', False),
+    ('parse', 'parse', True),
+    ('parse_file', 'parse', False),
+    ((), 'parse', False),
+    (None, 'parse', False),
+])
+def test_profile_enabled(option, name, expected):
+    assert _profile_enabled(option, name) is expected
+
+
+def test_all_from_the_environment_profiles_every_stage(monkeypatch):
+    monkeypatch.setenv('FO_PROFILE_STAGES', 'all')
+    assert _profile_enabled(config._env('PROFILE_STAGES', ()), 'percentiles')
+
+
+def test_concurrent_runs_keep_their_own_spans(monkeypatch):
+    monkeypatch.setattr(config, 'METRICS_FORMATS', ())
+    barrier = threading.Barrier(2)
+    records = {}
+
+    def run(request_date):
+        start_run(request_date)
+        barrier.wait()  # Both runs are active before either records a span
+        with stage(f'join_{request_date}'):
+            barrier.wait()
+        records[request_date] = finish_run()
+
+    # As the daemon submits days: each executor job runs in its own copy of the context
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for request_date in ('2025-03-05', '2025-03-06'):
+            executor.submit(contextvars.copy_context().run, run, request_date)
+
+    assert sorted(records) == ['2025-03-05', '2025-03-06']
+    for request_date, spans in records.items():
+        assert [(span['request_date'], span['stage']) for span in spans] == [(request_date, f'join_{request_date}')]
@@ -0,0 +1,157 @@
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+import config
+from benchmarks.synthetic import make_bhavcopy_zip, make_secban_csv, make_volatility_csv
+from src import pipeline
+
+
+@pytest.fixture
+def opened(tmp_path, monkeypatch):
+    """StageManifests opened by the code under test"""
+    monkeypatch.setattr(config, 'PIPELINE_MANIFEST_PATH', str(tmp_path / 'manifest.sqlite'))
+    manifests = []
+
+    class TrackedManifest(pipeline.StageManifest):
+        def __init__(self, path=None):
+            super().__init__(path)
+            self.closed = False
+            manifests.append(self)
+
+        def close(self):
+            self.closed = True
+            super().close()
+
+    monkeypatch.setattr(pipeline, 'StageManifest', TrackedManifest)
+    return manifests
+
+
+def test_run_date_closes_the_manifest_it_opened(opened, monkeypatch):
+    monkeypatch.setattr(config, 'DB_ENABLED', False)
+    manifest = pipeline.StageManifest()
+    for name in pipeline.required_stages():
+        manifest.mark_done('2025-03-05', name)
+    manifest.close()
+
+    pipeline.run_date(datetime(2025, 3, 5))
+    assert len(opened) == 2 and opened[1].closed
+
+
+def test_run_date_closes_the_manifest_it_opened_on_error(opened, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('network down')
+
+    monkeypatch.setattr('src.async_downloader.fetch_raw_files', fail)
+    with pytest.raises(RuntimeError):
+        pipeline.run_date(datetime(2025, 3, 5))
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_run_date_leaves_a_passed_manifest_open(opened, monkeypatch):
+    monkeypatch.setattr(config, 'DB_ENABLED', False)
+    manifest = pipeline.StageManifest()
+    for name in pipeline.required_stages():
+        manifest.mark_done('2025-03-05', name)
+
+    pipeline.run_date(datetime(2025, 3, 5), manifest)
+    assert len(opened) == 1 and not manifest.closed
+    manifest.close()
+
+
+DAY = datetime(2025, 3, 5)
+
+
+@pytest.fixture
+def stubbed(tmp_path, monkeypatch):
+    """
+    run_date against synthetic NSE files, with a call counter on the download,
+    the join and both output stages (the database load fails once when asked to)
+    """
+    import combine_code
+
+    monkeypatch.setattr(config, 'PIPELINE_MANIFEST_PATH', str(tmp_path / 'manifest.sqlite'))
+    monkeypatch.setattr(config, 'INTERMEDIATE_PATH', str(tmp_path / 'intermediate'))
+    monkeypatch.setattr(config, 'ROLLING_STATE_PATH', str(tmp_path / 'rolling_state.npz'))
+    monkeypatch.setattr(config, 'DB_ENABLED', True)
+    raw_files = {'bhavcopy': make_bhavcopy_zip(DAY, scale=0.02), 'volatility': make_volatility_csv(DAY, scale=0.02),
+                 'secban': make_secban_csv(datetime(2025, 3, 6), scale=0.02, banned=2)}
+    calls = Counter()
+    failing = set()
+
+    def fetch_raw_files(days):
+        calls['fetch'] += 1
+        return {day.strftime('%Y-%m-%d'): dict(raw_files) for day in days}
+
+    def counted(name, func=None):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            if name in failing:
+                failing.discard(name)
+                raise RuntimeError(f'{name} unavailable')
+            return func(*args, **kwargs) if func else None
+        return wrapper
+
+    monkeypatch.setattr('src.async_downloader.fetch_raw_files', fetch_raw_files)
+    monkeypatch.setattr(combine_code, 'build_final_data', counted('join', combine_code.build_final_data))
+    monkeypatch.setattr(combine_code, 'write_file_outputs', counted('parquet'))
+    monkeypatch.setattr(combine_code, 'load_to_db', counted('db'))
+    return calls, failing
+
+
+def run(calls):
+    calls.clear()
+    final_data = pipeline.run_date(DAY)
+    manifest = pipeline.StageManifest()
+    status = manifest.status(DAY.strftime('%Y-%m-%d'))
+    manifest.close()
+    return final_data, status
+
+
+def test_finished_stages_are_skipped(stubbed):
+    calls, _ = stubbed
+    first, status = run(calls)
+    assert calls == {'fetch': 1, 'join': 1, 'parquet': 1, 'db': 1}
+    assert set(status.values()) == {'done'}
+
+    again, _ = run(calls)
+    assert not calls
+    # Served from the stored joined frame
+    assert list(again.columns) == list(first.columns)
+    assert again['Symbol'].astype(str).tolist() == first['Symbol'].astype(str).tolist()
+    assert again['Average_Percentile'].tolist() == first['Average_Percentile'].tolist()
+
+
+@pytest.mark.parametrize('failed', ['parquet', 'db'])
+def test_a_failed_output_stage_is_retried_alone(stubbed, failed):
+    calls, failing = stubbed
+    failing.add(failed)
+    _, status = run(calls)
+    assert status[failed] == 'failed'
+    assert all(value == 'done' for name, value in status.items() if name != failed)
+
+    _, status = run(calls)
+    assert calls == {failed: 1}
+    assert set(status.values()) == {'done'}
+
+
+@pytest.mark.parametrize('stages, resumed_calls', [
+    # From the transformed frames: joined again, nothing fetched
+    (['joined', 'parquet', 'db'], {'join': 1, 'parquet': 1, 'db': 1}),
+    # From the joined frame: only the outputs are written
+    (['parquet', 'db'], {'parquet': 1, 'db': 1}),
+])
+@pytest.mark.parametrize('engine', ['pandas', 'arrow'])
+def test_run_date_resumes_from_stored_frames(stubbed, stages, resumed_calls, engine, monkeypatch):
+    calls, _ = stubbed
+    monkeypatch.setattr(config, 'COMPUTE_ENGINE', engine)
+    first, _ = run(calls)
+    manifest = pipeline.StageManifest()
+    manifest.reset(DAY.strftime('%Y-%m-%d'), stages)
+    manifest.close()
+
+    resumed, status = run(calls)
+    assert calls == resumed_calls
+    assert set(status.values()) == {'done'}
+    assert sorted(resumed['Symbol']) == sorted(first['Symbol'])
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from src import query
+from src.dataset_writer import write_fragments
+from src.query import FragmentScanner, OutputHistory
+
+
+def output(request_date, symbols):
+    return pd.DataFrame({
+        'Symbol': symbols,
+        'Trade_volume': range(len(symbols)),
+        'Average_Percentile': 50,
+        'Request_Date': pd.Timestamp(request_date)
+    })
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    """Directories the scanner lists; mtimes are trusted at once so unchanged ones are skipped"""
+    monkeypatch.setattr(FragmentScanner, 'SETTLE_SECONDS', 0)
+    listed = []
+    real_list = FragmentScanner._list
+    monkeypatch.setattr(FragmentScanner, '_list', staticmethod(lambda dirpath: listed.append(dirpath)
+                                                               or real_list(dirpath)))
+    return listed
+
+
+def test_index_follows_added_replaced_and_removed_fragments(tmp_path, listings):
+    root = str(tmp_path)
+    write_fragments(pd.concat([output('2025-03-03', ['AAA', 'BBB']), output('2025-04-01', ['AAA'])]), root)
+    history = OutputHistory(root)
+    assert history.symbol_date_range('BBB') == ('2025-03-03', '2025-03-03')
+
+    # Nothing changed: no directory is listed again and no fragment is read
+    listings.clear()
+    history.refresh_index()
+    assert listings == []
+
+    # A new date only lists its month directory and the new directory
+    write_fragments(output('2025-03-04', ['BBB']), root)
+    listings.clear()
+    assert history.symbol_date_range('BBB') == ('2025-03-03', '2025-03-04')
+    assert sorted(os.path.relpath(path, root) for path in listings) == [
+        'year=2025/month=3', 'year=2025/month=3/request_date=2025-03-04']
+
+    # A replaced fragment is picked up from its date directory
+    write_fragments(output('2025-04-01', ['AAA', 'BBB']), root)
+    assert history.symbol_date_range('BBB') == ('2025-03-03', '2025-04-01')
+
+    # Removed dates leave the index
+    shutil.rmtree(tmp_path / 'year=2025' / 'month=4')
+    assert history.symbol_date_range('BBB') == ('2025-03-03', '2025-03-04')
+    assert history.symbol_date_range('AAA') == ('2025-03-03', '2025-03-03')
+
+
+def test_recent_directories_are_listed_again(tmp_path):
+    write_fragments(output('2025-03-03', ['AAA']), str(tmp_path))
+    scanner = FragmentScanner(str(tmp_path))
+    assert list(scanner.scan()) == ['2025-03-03']
+
+    # Written within the mtime resolution of the last listing, so not trusted yet
+    listed = []
+    scanner._list = lambda dirpath: listed.append(dirpath) or FragmentScanner._list(dirpath)
+    assert list(scanner.scan()) == ['2025-03-03'] and listed
+    assert query.fragment_paths(str(tmp_path)) == scanner.scan()
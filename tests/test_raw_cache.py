@@ -0,0 +1,43 @@
+import json
+import multiprocessing
+from datetime import datetime, timedelta
+
+from src.raw_cache import RawFileCache
+
+DAY = datetime(2025, 3, 3)
+
+
+def put_days(root, file_type, days):
+    """One worker: a cache opened before the others flush, flushed after every put"""
+    cache = RawFileCache(root)
+    for i in range(days):
+        cache.put(file_type, DAY + timedelta(days=i), f'{file_type}-{i}'.encode())
+        cache.flush()
+
+
+def test_flush_keeps_entries_flushed_by_another_cache(tmp_path):
+    first, second = RawFileCache(str(tmp_path)), RawFileCache(str(tmp_path))
+    first.put('bhavcopy', DAY, b'bhavcopy-bytes')
+    second.put('volatility', DAY, b'volatility-bytes')
+    first.flush()
+    second.flush()
+
+    reopened = RawFileCache(str(tmp_path))
+    assert reopened.get('bhavcopy', DAY) == b'bhavcopy-bytes'
+    assert reopened.get('volatility', DAY) == b'volatility-bytes'
+    # The flushing cache sees the merged manifest too
+    assert second.get('bhavcopy', DAY) == b'bhavcopy-bytes'
+
+
+def test_concurrent_processes_lose_no_entries(tmp_path):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=put_days, args=(str(tmp_path), file_type, 20))
+               for file_type in ('bhavcopy', 'volatility', 'secban', 'contract')]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    with open(tmp_path / 'manifest.json') as f:
+        assert len(json.load(f)) == 80
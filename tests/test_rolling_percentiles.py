@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+from src.date_utils import TradingCalendar
+from src.frame_store import write_frame
+from src.pipeline import JOINED_FRAME
+from src.rolling_percentiles import RollingStateStore, add_rolling_percentiles, rebuild_rolling_state
+
+# Weekdays only: 2025-03-03 is a Monday, so DAYS are consecutive trading days
+CALENDAR = TradingCalendar()
+DAYS = [str(day) for day in CALENDAR.trading_days('2025-03-03', '2025-04-30')]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'ROLLING_WINDOWS', (3, 5))
+    monkeypatch.setattr(config, 'ROLLING_MIN_PERIODS', 2)
+    return RollingStateStore(path=str(tmp_path / 'rolling_state.npz'), calendar=CALENDAR)
+
+
+def day_frame(request_date, values):
+    """values: {symbol: volume}; volatility is the volume / 1000"""
+    return pd.DataFrame({
+        'Symbol': list(values),
+        'Trade_volume': list(values.values()),
+        'Daily_Volatility': [value / 1000 for value in values.values()],
+        'Request_Date': pd.Timestamp(request_date)
+    })
+
+
+def window_values(store, symbol, metric='Trade_volume'):
+    """The symbol's slots from the newest trading day to the oldest"""
+    day = int(store.last_day[store.index[symbol]])
+    return store.values[metric][store.index[symbol], (day - np.arange(store.window)) % store.window]
+
+
+def test_push_then_overwrite_of_the_newest_day(store):
+    store.update(day_frame(DAYS[0], {'AAA': 10}), DAYS[0])
+    store.update(day_frame(DAYS[1], {'AAA': 20}), DAYS[1])
+    newest = store.last_day.copy()
+
+    # Re-running the newest date replaces its value instead of pushing another day
+    stats = store.update(day_frame(DAYS[1], {'AAA': 30}), DAYS[1])
+    assert (store.last_day == newest).all()
+    np.testing.assert_array_equal(window_values(store, 'AAA')[:3], [30, 10, np.nan])
+    assert stats['TS_Percentile_Volume_3'].tolist() == [100]
+
+
+def test_stale_date_gets_empty_values_and_leaves_the_state(store):
+    for i, value in enumerate([10, 20, 30, 40]):
+        store.update(day_frame(DAYS[i], {'AAA': value, 'BBB': value}), DAYS[i])
+    before = window_values(store, 'AAA').copy()
+
+    stats = store.update(day_frame(DAYS[1], {'AAA': 99, 'CCC': 5}), DAYS[1])
+    aaa, ccc = stats.iloc[0], stats.iloc[1]
+    assert aaa.isna().all()
+    np.testing.assert_array_equal(window_values(store, 'AAA'), before)
+    # A symbol first seen on that date has no later days, so it is written as usual
+    assert int(store.last_day[store.index['CCC']]) == int(CALENDAR.trading_index(np.datetime64(DAYS[1])))
+    assert pd.isna(ccc['TS_Percentile_Volume_3'])  # one observation, below min periods
+
+
+def test_window_wraps_and_skipped_days_stay_empty(store):
+    for i in range(8):
+        store.update(day_frame(DAYS[i], {'AAA': i + 1}), DAYS[i])
+    # Only the last 5 trading days survive the wrap-around
+    np.testing.assert_array_equal(window_values(store, 'AAA'), [8, 7, 6, 5, 4])
+
+    # AAA drops out for two trading days; its window covers trading days, not observations
+    stats = store.update(day_frame(DAYS[10], {'AAA': 100}), DAYS[10])
+    np.testing.assert_array_equal(window_values(store, 'AAA'), [100, np.nan, np.nan, 8, 7])
+    assert stats['TS_Percentile_Volume_3'].isna().all()  # one observation in the last 3 trading days
+    assert stats['TS_Percentile_Volume_5'].tolist() == [100]
+    assert stats['ZScore_Volume_5'].tolist() == [pytest.approx((100 - 115 / 3) / np.std([100, 8, 7], ddof=1),
+                                                                abs=1e-4)]
+
+    # Away for a whole window: nothing older is left
+    store.update(day_frame(DAYS[20], {'AAA': 1}), DAYS[20])
+    assert np.isnan(window_values(store, 'AAA')[1:]).all()
+
+
+def brute_force(panel, window):
+    """Percentile and z-score of each (day, symbol) cell against a pandas rolling window of trading days"""
+    rolling = panel.rolling(window, min_periods=config.ROLLING_MIN_PERIODS)
+    mean, std, count = rolling.mean(), rolling.std(), rolling.count()
+    at_or_below = pd.DataFrame(np.nan, index=panel.index, columns=panel.columns)
+    for i in range(len(panel)):
+        recent = panel.iloc[max(0, i - window + 1):i + 1]
+        at_or_below.iloc[i] = (recent <= panel.iloc[i]).sum()
+    percentile = np.ceil(at_or_below / count * 100).where(count >= config.ROLLING_MIN_PERIODS)
+    zscore = ((panel - mean) / std).where(std > 0).round(4)
+    return percentile.where(panel.notna()), zscore.where(panel.notna())
+
+
+def test_parity_with_pandas_rolling_over_trading_days(store):
+    rng = np.random.default_rng(7)
+    days = DAYS[:30]
+    panel = pd.DataFrame(rng.integers(1, 50, size=(len(days), 4)).astype(float),
+                         index=pd.to_datetime(days), columns=['AAA', 'BBB', 'CCC', 'DDD'])
+    # Symbols drop out on some days (volatility filter, ban list)
+    panel = panel.mask(rng.random(panel.shape) < 0.3)
+
+    frames = []
+    for request_date, row in panel.iterrows():
+        present = row.dropna()
+        frames.append(day_frame(request_date, present.to_dict()))
+    result = add_rolling_percentiles(pd.concat(frames, ignore_index=True), store)
+
+    for window in config.ROLLING_WINDOWS:
+        percentile, zscore = brute_force(panel, window)
+        expected = pd.DataFrame({
+            'percentile': percentile.stack(future_stack=True),
+            'zscore': zscore.stack(future_stack=True)
+        }).dropna(how='all', subset=['percentile']).reset_index()
+        actual = result.set_index(['Request_Date', 'Symbol'])
+        for _, cell in expected.iterrows():
+            row = actual.loc[(cell['level_0'], cell['level_1'])]
+            assert row[f'TS_Percentile_Volume_{window}'] == cell['percentile']
+            assert row[f'ZScore_Volume_{window}'] == pytest.approx(cell['zscore'], nan_ok=True)
+        # Cells below min periods are empty in both
+        scored = result[f'TS_Percentile_Volume_{window}'].notna().sum()
+        assert scored == len(expected)
+
+
+def test_rebuild_replays_stored_frames_in_date_order(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'INTERMEDIATE_PATH', str(tmp_path / 'intermediate'))
+    monkeypatch.setattr(config, 'ROLLING_STATE_PATH', str(tmp_path / 'rebuilt.npz'))
+    monkeypatch.setattr('src.rolling_percentiles.get_calendar', lambda: CALENDAR)
+    frames = [day_frame(DAYS[i], {'AAA': i + 1, 'BBB': 10 * (i + 1)}) for i in range(7)]
+    for request_date, frame in zip(DAYS, frames):
+        write_frame(frame, request_date, JOINED_FRAME)
+        store.update(frame, request_date)
+
+    rebuilt = rebuild_rolling_state(DAYS[6])
+    for symbol in ('AAA', 'BBB'):
+        np.testing.assert_array_equal(window_values(rebuilt, symbol), window_values(store, symbol))
+
+    # A rebuild up to an earlier date lets that date be scored again
+    rebuilt = rebuild_rolling_state(DAYS[3])
+    stats = rebuilt.update(frames[4], DAYS[4])
+    assert stats['TS_Percentile_Volume_5'].notna().all()
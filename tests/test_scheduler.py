@@ -0,0 +1,103 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import combine_code
+import config
+from benchmarks.synthetic import make_bhavcopy_zip, make_secban_csv, make_volatility_csv
+from src import scheduler
+from src.async_downloader import create_session
+from src.pipeline import SECBAN_MARKER, StageManifest
+
+
+@pytest.fixture
+def daemon(stand_in_server, tmp_path, monkeypatch):
+    """Scheduler settings for a run that lasts seconds, against the stand-in server"""
+    monkeypatch.setattr(config, 'OFFLINE_MODE', False)
+    monkeypatch.setattr(config, 'RAW_CACHE_PATH', str(tmp_path / 'raw_cache'))
+    # process_for_date opens its own manifest at this path
+    monkeypatch.setattr(config, 'PIPELINE_MANIFEST_PATH', str(tmp_path / 'manifest.sqlite'))
+    monkeypatch.setattr(config, 'SCHEDULER_POLL_MIN', 0.1)
+    monkeypatch.setattr(config, 'SCHEDULER_POLL_MAX', 0.2)
+    monkeypatch.setattr(config, 'SCHEDULER_SECBAN_GRACE', 0.3)
+    monkeypatch.setattr(config, 'NSE_URLS', {file_type: stand_in_server.url + f'/{file_type}/{{date}}'
+                                             for file_type in ('bhavcopy', 'volatility', 'secban')})
+    deadline = datetime.now() + timedelta(seconds=3)
+    monkeypatch.setattr(scheduler, 'at_time', lambda day, hhmm: deadline)
+
+    runs = []
+    process_for_date = combine_code.process_for_date
+
+    def record(date_str, force=False):
+        final_data = process_for_date(date_str, force)
+        runs.append(set(final_data['Symbol'].astype(str)))
+        return final_data
+
+    monkeypatch.setattr(combine_code, 'process_for_date', record)
+    manifest = StageManifest()
+    yield stand_in_server, manifest, runs
+    manifest.close()
+
+
+def publish(server, day, secban_after=None):
+    """Serve day's bhavcopy and volatility; secban 404s for secban_after polls (forever if None)"""
+    next_day = day + timedelta(days=1)
+    secban = make_secban_csv(next_day, scale=0.2, banned=20)
+    server.routes = {
+        f'/bhavcopy/{day:%Y%m%d}': [(200, make_bhavcopy_zip(day, 0.2), {})],
+        f'/volatility/{day:%d%m%Y}': [(200, make_volatility_csv(day, 0.2), {})],
+        f'/secban/{next_day:%d%m%Y}': ([(404, b'', {})] * secban_after + [(200, secban, {})]
+                                       if secban_after is not None else [(404, b'', {})]),
+    }
+    # Symbols the pipeline's own secban transform bans
+    return set(combine_code.transform_data(combine_code.parse_file('secban', secban), 'Secban')['Symbol'])
+
+
+def run_day(manifest, day):
+    async def main():
+        session = create_session()
+        try:
+            return await scheduler.run_day(session, day, manifest)
+        finally:
+            await session.close()
+    return asyncio.run(main())
+
+
+def test_late_secban_reruns_the_day_without_banned_symbols(daemon):
+    server, manifest, runs = daemon
+    day = datetime(2025, 3, 5)
+    banned = publish(server, day, secban_after=8)
+
+    final_data = run_day(manifest, day)
+
+    assert len(runs) == 2
+    assert runs[0] & banned, 'the first pass was written without the ban list'
+    assert not runs[1] & banned and runs[1] == runs[0] - banned
+    assert set(final_data['Symbol'].astype(str)) == runs[1]
+    status = manifest.status('2025-03-05')
+    assert status[SECBAN_MARKER] == 'done' and not manifest.pending('2025-03-05')
+
+
+def test_secban_within_grace_runs_the_day_once(daemon):
+    server, manifest, runs = daemon
+    day = datetime(2025, 3, 12)
+    banned = publish(server, day, secban_after=0)
+
+    run_day(manifest, day)
+
+    assert len(runs) == 1 and not runs[0] & banned
+    assert manifest.status('2025-03-12')[SECBAN_MARKER] == 'done'
+
+
+def test_secban_missing_until_deadline_is_recorded(daemon):
+    server, manifest, runs = daemon
+    day = datetime(2025, 3, 19)
+    banned = publish(server, day, secban_after=None)
+
+    final_data = run_day(manifest, day)
+
+    assert len(runs) == 1 and runs[0] & banned
+    assert final_data is not None
+    assert manifest.status('2025-03-19')[SECBAN_MARKER] == 'failed'
+    assert not manifest.pending('2025-03-19')
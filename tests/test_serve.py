@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src.dataset_writer import write_fragments
+from src.serve import RankingCache, route
+
+DATES = [(datetime(2025, 3, 3) + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(6)]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    for i, request_date in enumerate(DATES):
+        write_fragments(pd.DataFrame({
+            'Symbol': ['AAA', 'BBB'],
+            'Trade_volume': [1000 + i, 2000 + i],
+            'Daily_Volatility': [0.01, 0.02],
+            'Percentile_Volume': [50, 100],
+            'Percentile_Volatility': [50, 100],
+            'Average_Percentile': [50, 100],
+            'Average_Percentile_Desc': ['Moderate', 'Very High'],
+            'Expiry_Date': pd.Timestamp('2025-03-27'),
+            'Processed_Timestamp': pd.Timestamp('2025-03-03 18:00'),
+            'Request_Date': pd.Timestamp(request_date)
+        }), str(tmp_path))
+    cache = RankingCache(str(tmp_path), max_dates=3)
+    cache.refresh()
+    return cache
+
+
+def rankings(cache, **params):
+    status, etag, content_type, produce, headers = route(cache, '/rankings', {k: [v] for k, v in params.items()})
+    return status, produce()
+
+
+def test_range_larger_than_the_cache_is_rejected(cache):
+    with pytest.raises(ValueError, match='at most 3'):
+        rankings(cache)
+    with pytest.raises(ValueError, match='at most 3'):
+        rankings(cache, start=DATES[1])
+
+
+def test_range_reads_do_not_evict_cached_dates(cache):
+    cache.warm()
+    hot = cache.dates()[-3:]
+    assert list(cache._entries) == hot
+
+    status, body = rankings(cache, start=DATES[0], end=DATES[2])
+    assert status == 200 and body.count(b'"Symbol"') == 6
+    assert list(cache._entries) == hot
+
+
+def test_range_within_the_cache_is_served(cache):
+    status, body = rankings(cache, start=DATES[3], symbol='BBB')
+    assert status == 200 and body.count(b'"BBB"') == 3 and b'"AAA"' not in body
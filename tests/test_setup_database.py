@@ -0,0 +1,128 @@
+from datetime import date
+
+import pytest
+
+from src import setup_database
+
+
+class PartitionCursor:
+    """
+    Records statements and answers the information_schema reads of the
+    partition manager from the partitions, archive tables and latest rows a
+    test sets up
+    """
+
+    def __init__(self, partitions, archives=(), latest_symbols=()):
+        # partitions: (name, 'YYYY-MM-DD' bound or None for MAXVALUE, rows)
+        self.partitions = partitions
+        self.archives = set(archives)
+        self.latest_symbols = list(latest_symbols)
+        self.statements = []
+        self.result = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        query = ' '.join(query.split())
+        self.statements.append((query, params))
+        if 'information_schema.PARTITIONS' in query:
+            self.result = [(name, 'RANGE COLUMNS', f"'{bound}'" if bound else 'MAXVALUE', rows, 0, 0)
+                           for name, bound, rows in self.partitions]
+        elif 'information_schema.TABLES' in query:
+            self.result = [(1 if params[1] in self.archives else 0,)]
+        elif query.startswith('SELECT symbol FROM fo_market_latest'):
+            self.result = [(symbol,) for symbol in self.latest_symbols]
+        else:
+            self.result = []
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0]
+
+    def changes(self):
+        """Statements that alter the schema or data (reads left out)"""
+        return [query for query, _ in self.statements if not query.startswith(('SELECT', 'SET'))]
+
+
+def yearly(*years, p_max_rows=0):
+    return [(f'p_{year}', f'{year + 1}-01-01', 100) for year in years] + [('p_max', None, p_max_rows)]
+
+
+def test_year_rollover_splits_new_years_out_of_p_max():
+    cursor = PartitionCursor(yearly(2024, 2025, p_max_rows=5))
+    names = setup_database.ensure_partitions(cursor, 'year', ahead=2, today=date(2025, 12, 31))
+
+    # The current year plus two ahead must be covered: through 2027
+    assert names == ['p_2026', 'p_2027']
+    assert cursor.changes() == [
+        "ALTER TABLE fo_market_analysis REORGANIZE PARTITION p_max INTO ("
+        "PARTITION p_2026 VALUES LESS THAN ('2027-01-01'), "
+        "PARTITION p_2027 VALUES LESS THAN ('2028-01-01'), "
+        "PARTITION p_max VALUES LESS THAN (MAXVALUE))"
+    ]
+
+    # A day later the new year needs one more partition
+    cursor = PartitionCursor(yearly(2024, 2025, 2026, 2027))
+    assert setup_database.ensure_partitions(cursor, 'year', ahead=2, today=date(2026, 1, 1)) == ['p_2028']
+
+
+def test_month_rollover_crosses_the_year_boundary():
+    partitions = [('p_202511', '2025-12-01', 10), ('p_202512', '2026-01-01', 10), ('p_max', None, 0)]
+    cursor = PartitionCursor(partitions)
+    assert setup_database.ensure_partitions(cursor, 'month', ahead=1, today=date(2025, 12, 15)) == ['p_202601']
+    assert "PARTITION p_202601 VALUES LESS THAN ('2026-02-01')" in cursor.changes()[0]
+
+
+def test_covered_periods_are_left_alone():
+    cursor = PartitionCursor(yearly(2025, 2026, 2027))
+    assert setup_database.ensure_partitions(cursor, 'year', ahead=2, today=date(2025, 6, 1)) == []
+    assert cursor.changes() == []
+
+
+@pytest.mark.parametrize('partitions, today, months, expired', [
+    # Cutoff 2024-06-01: May 2024 ends on it and expires, June 2024 still has younger rows
+    ([('p_202404', '2024-05-01', 1), ('p_202405', '2024-06-01', 1), ('p_202406', '2024-07-01', 1),
+      ('p_max', None, 0)], date(2025, 6, 15), 12, ['p_202404', 'p_202405']),
+    # Cutoff 2024-06-01: 2024 holds rows on both sides of it and stays
+    (yearly(2023, 2024, 2025), date(2025, 6, 15), 12, ['p_2023']),
+    # Cutoff 2025-01-01, a bound exactly on it
+    (yearly(2023, 2024, 2025), date(2025, 7, 1), 6, ['p_2023', 'p_2024']),
+])
+def test_retention_expires_only_partitions_entirely_before_the_cutoff(partitions, today, months, expired):
+    cursor = PartitionCursor(partitions)
+    assert setup_database.apply_retention(cursor, months, 'drop', today) == expired
+    assert cursor.changes() == [f'ALTER TABLE fo_market_analysis DROP PARTITION {name}' for name in expired]
+
+
+def test_no_retention_keeps_every_partition():
+    cursor = PartitionCursor(yearly(2000))
+    assert setup_database.apply_retention(cursor, 0, 'archive', date(2025, 6, 15)) == []
+    assert cursor.statements == []
+
+
+def test_archive_exchanges_each_expired_partition_before_dropping_it():
+    cursor = PartitionCursor(yearly(2022, 2023, 2024, 2025), latest_symbols=['OLDSYM'])
+    assert setup_database.apply_retention(cursor, 12, 'archive', date(2025, 6, 15)) == ['p_2022', 'p_2023']
+
+    changes = cursor.changes()
+    for name in ('p_2022', 'p_2023'):
+        archive = f'fo_market_analysis_archive_{name}'
+        steps = [f'CREATE TABLE {archive} LIKE fo_market_analysis',
+                 f'ALTER TABLE {archive} REMOVE PARTITIONING',
+                 f'ALTER TABLE fo_market_analysis EXCHANGE PARTITION {name} WITH TABLE {archive}',
+                 f'ALTER TABLE fo_market_analysis DROP PARTITION {name}']
+        start = changes.index(steps[0])
+        assert changes[start:start + 4] == steps
+    assert not any('p_2024' in query for query in changes)
+
+    # Symbols whose latest row was archived fall back to their newest remaining date
+    latest = [(query, params) for query, params in cursor.statements if 'fo_market_latest' in query]
+    assert latest[0] == ('SELECT symbol FROM fo_market_latest WHERE request_date < %s', (date(2024, 1, 1),))
+    assert latest[1] == ('DELETE FROM fo_market_latest WHERE symbol IN (%s)', ['OLDSYM'])
+
+
+def test_an_existing_archive_table_keeps_its_partition():
+    cursor = PartitionCursor(yearly(2022, 2023, 2025), archives=['fo_market_analysis_archive_p_2022'])
+    assert setup_database.apply_retention(cursor, 12, 'archive', date(2025, 6, 15)) == ['p_2023']
+    assert not any('p_2022' in query for query in cursor.changes())